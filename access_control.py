@@ -1,9 +1,10 @@
 # access_control.py
 import logging
+from functools import lru_cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 import storage
-from config import REQUIRED_CHANNEL, REQUIRED_GROUP, show_menu, is_owner
+from config import REQUIRED_CHANNEL, REQUIRED_GROUP, show_menu, is_owner, already_showing, is_not_modified
 
 logger = logging.getLogger(__name__)
 
@@ -36,16 +37,38 @@ async def _check_join(bot, user_id: int) -> tuple[bool, bool]:
     return joined_channel, joined_group
 
 # ===== UI =====
-async def _show_join_gate(target, joined_channel=False, joined_group=False, edit=False):
-    """Pesan kalau belum join channel/group."""
+# keyboard & teks gate/paywall statis → dibangun sekali saat import
+_JOIN_GATE_KB = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📢 Join Channel", url=f"https://t.me/{REQUIRED_CHANNEL.lstrip('@')}"),
+        InlineKeyboardButton("💬 Join Group", url=f"https://t.me/{REQUIRED_GROUP.lstrip('@')}")
+    ],
+    [InlineKeyboardButton("🔁 Cek Lagi", callback_data="ac_check")]
+])
+
+_PAYWALL_TEXT = (
+    "🔒 *Akses diperlukan*\n"
+    "━━━━━━━━━━━━━━━━━━━━━━━\n"
+    "⏳ *Trial/Akses kamu sudah habis.*\n"
+    "👤 *Hubungi owner:* @langrisown\n"
+    "━━━━━━━━━━━━━━━━━━━━━━━\n"
+    f"🛡️ Wajib join Channel: {REQUIRED_CHANNEL}\n"
+    f"🛡️ Wajib join Group: {REQUIRED_GROUP}\n"
+)
+_PAYWALL_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("👤 Owner", url="https://t.me/langrisown")],
+    [InlineKeyboardButton("🏠 Home", callback_data="nav_home")]
+])
+
+@lru_cache(maxsize=4)
+def _join_gate_text(joined_channel: bool, joined_group: bool) -> str:
     if joined_channel and not joined_group:
         status = "✅ Sudah join channel\n❌ Belum join group"
     elif joined_group and not joined_channel:
         status = "✅ Sudah join group\n❌ Belum join channel"
     else:
         status = "❌ Belum join channel & group"
-
-    text = (
+    return (
         "⚠️ Untuk menggunakan bot ini kamu harus join komunitas:\n\n"
         f"{status}\n\n"
         f"📢 Channel: {REQUIRED_CHANNEL}\n"
@@ -53,44 +76,33 @@ async def _show_join_gate(target, joined_channel=False, joined_group=False, edit
         "Setelah join, klik tombol 🔁 *Cek Lagi*."
     )
 
-    kb = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("📢 Join Channel", url=f"https://t.me/{REQUIRED_CHANNEL.lstrip('@')}"),
-            InlineKeyboardButton("💬 Join Group", url=f"https://t.me/{REQUIRED_GROUP.lstrip('@')}")
-        ],
-        [InlineKeyboardButton("🔁 Cek Lagi", callback_data="ac_check")]
-    ])
-
+async def _show_join_gate(target, joined_channel=False, joined_group=False, edit=False):
+    """Pesan kalau belum join channel/group."""
+    text = _join_gate_text(bool(joined_channel), bool(joined_group))
     try:
         if edit and hasattr(target, "edit_message_text"):
-            await target.edit_message_text(text, reply_markup=kb, parse_mode="Markdown")
+            # klik "Cek Lagi" berulang tanpa perubahan → tidak perlu edit
+            if already_showing(target.message, text, _JOIN_GATE_KB):
+                return
+            await target.edit_message_text(text, reply_markup=_JOIN_GATE_KB, parse_mode="Markdown")
         elif hasattr(target, "reply_text"):
-            await target.reply_text(text, reply_markup=kb, parse_mode="Markdown")
+            await target.reply_text(text, reply_markup=_JOIN_GATE_KB, parse_mode="Markdown")
     except Exception as e:
-        logger.warning(f"_show_join_gate error: {e}")
+        if not is_not_modified(e):
+            logger.warning(f"_show_join_gate error: {e}")
 
 async def _show_paywall(target):
     """Pesan kalau akses habis → hubungi owner."""
-    text = (
-        "🔒 *Akses diperlukan*\n"
-        "━━━━━━━━━━━━━━━━━━━━━━━\n"
-        "⏳ *Trial/Akses kamu sudah habis.*\n"
-        "👤 *Hubungi owner:* @langrisown\n"
-        "━━━━━━━━━━━━━━━━━━━━━━━\n"
-        f"🛡️ Wajib join Channel: {REQUIRED_CHANNEL}\n"
-        f"🛡️ Wajib join Group: {REQUIRED_GROUP}\n"
-    )
-    kb = InlineKeyboardMarkup([
-        [InlineKeyboardButton("👤 Owner", url="https://t.me/langrisown")],
-        [InlineKeyboardButton("🏠 Home", callback_data="nav_home")]
-    ])
     try:
         if hasattr(target, "edit_message_text"):
-            await target.edit_message_text(text, reply_markup=kb, parse_mode="Markdown")
+            if already_showing(target.message, _PAYWALL_TEXT, _PAYWALL_KB):
+                return
+            await target.edit_message_text(_PAYWALL_TEXT, reply_markup=_PAYWALL_KB, parse_mode="Markdown")
         else:
-            await target.reply_text(text, reply_markup=kb, parse_mode="Markdown")
+            await target.reply_text(_PAYWALL_TEXT, reply_markup=_PAYWALL_KB, parse_mode="Markdown")
     except Exception as e:
-        logger.warning(f"_show_paywall error: {e}")
+        if not is_not_modified(e):
+            logger.warning(f"_show_paywall error: {e}")
 
 # ===== Public API =====
 async def ensure_access_start(update, context) -> bool:
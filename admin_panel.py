@@ -1,17 +1,19 @@
 # admin_panel.py
 import logging
-import io
 import os
 import asyncio
+import tempfile
+import contextlib
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 
-import xlsxwriter
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from config import TIMEZONE, is_owner
 import storage
+import db_backup
+import file_cache
 
 logger = logging.getLogger(__name__)
 
@@ -90,6 +92,40 @@ def _fmt_ts(ts: Optional[int]) -> str:
     dt = datetime.fromtimestamp(ts, tz=_tz())
     return dt.strftime("%d-%m-%Y %H:%M")
 
+# tanggal "created" tetap di metadata export Excel
+_EXPORT_CREATED = datetime(2000, 1, 1)
+_EXPORT_PLAN_LABEL = {"permanent": "Permanent", "1hari": "1 Hari", "1minggu": "1 Minggu", "1bulan": "1 Bulan"}
+
+def _export_subscribers_xlsx() -> Tuple[str, int]:
+    """
+    Tulis semua subscriber ke .xlsx sementara (jalan di worker thread).
+    Status dihitung di SQL (1 query), baris ditulis streaming (constant_memory) → memori tetap kecil.
+    Return (path, jumlah baris); path wajib dihapus pemanggil.
+    """
+    import xlsxwriter  # berat; dimuat saat export pertama, bukan saat bot start
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=".xlsx")
+    os.close(fd)
+    tz = _tz()
+    n = 0
+    try:
+        wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+        # metadata tetap → isi sama menghasilkan byte sama (bisa pakai cache file_id)
+        wb.set_properties({"created": _EXPORT_CREATED})
+        ws = wb.add_worksheet("Users")
+        ws.write_row(0, 0, ["User ID", "Nama", "Paket", "Expired", "Status"])
+        for n, (uid, name, plan, exp, status) in enumerate(storage.iter_subscribers_with_status(), start=1):
+            if plan == "permanent":
+                exp_val = "PERMANENT"
+            else:
+                exp_val = datetime.fromtimestamp(exp, tz=tz).strftime("%d-%m-%Y %H:%M") if exp else "-"
+            ws.write_row(n, 0, [uid, name or "-", _EXPORT_PLAN_LABEL.get(plan, plan), exp_val, status])
+        wb.close()
+    except Exception:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+        raise
+    return path, n
+
 # ==============================
 # State flags
 # ==============================
@@ -102,6 +138,32 @@ KEY_ADMIN_BROADCAST_WAIT = "admin_broadcast_wait"
 KEY_ADMIN_IMPORT_WAIT    = "admin_import_wait"
 KEY_ADMIN_SEARCH_WAIT    = "admin_search_wait"
 
+def _ingest_summary(cmd: str, out_dir: Optional[str], rep: dict, limit: int = 20) -> str:
+    """Ringkasan teks hasil local_ingest.run_ingest."""
+    lines = [f"✅ Ingest {cmd.upper()} selesai"]
+    if cmd == "count":
+        for it in rep["items"][:limit]:
+            extra = f" · {it['tels']} nomor" if it["type"] == "vcf" else ""
+            lines.append(f"• {it['filename']} — {it['count']} {'kontak' if it['type'] == 'vcf' else 'nomor'}{extra}")
+        lines.append(f"TXT total: {rep['total_txt']} · VCF total: {rep['total_vcf']} kontak · {rep['total_vcf_tel']} nomor")
+        return "\n".join(lines)
+    files = rep.get("files", [])
+    for f in files[:limit]:
+        n = f.get("contacts", f.get("units", f.get("lines", 0)))
+        lines.append(f"• {f['filename']} — {n}")
+    if len(files) > limit:
+        lines.append(f"dan {len(files) - limit} file lain")
+    if rep.get("empty"):
+        lines.append(f"⚠️ Tanpa nomor valid (dilewati): {', '.join(rep['empty'][:limit])}")
+    if cmd == "merge":
+        lines.append(f"📁 Output: {rep['filename']} · {rep['total']} {'kontak' if rep['type'] == 'vcf' else 'baris'}")
+    elif "contacts" in rep:
+        lines.append(f"📞 Total kontak: {rep['contacts']}")
+    elif "total" in rep:
+        lines.append(f"📄 Total unit: {rep['total']}")
+    lines.append(f"📂 Folder: {out_dir}")
+    return "\n".join(lines)
+
 # ==============================
 # Handler Class
 # ==============================
@@ -135,11 +197,17 @@ class AdminPanelHandler:
 
         # === Export DB ===
         if data == CB_ADMIN_EXPORT_DB:
+            path = None
             try:
-                with open(storage.DB_PATH, "rb") as f:
-                    return await q.message.reply_document(InputFile(f, "users.db"), caption="📂 Export DB sukses")
+                # prefix export terpisah → tidak memangkas backup harian
+                path = await db_backup.create_snapshot(compress=False, prefix=db_backup.EXPORT_PREFIX)
+                return await file_cache.reply_cached(q.message, path, "users.db", caption="📂 Export DB sukses")
             except Exception as e:
                 return await q.edit_message_text(f"❌ Gagal export DB: {e}")
+            finally:
+                if path:
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
 
         # === Hapus user ===
         if data == CB_ADMIN_DELETE:
@@ -149,25 +217,21 @@ class AdminPanelHandler:
 
         if data in (CB_ADMIN_DELETE_ALL, CB_ADMIN_DELETE_PERM, CB_ADMIN_DELETE_DAY,
                     CB_ADMIN_DELETE_WEEK, CB_ADMIN_DELETE_MONTH):
-            rows = storage.get_all_subscribers()
-            for uid, _, plan, _ in rows:
-                if data == CB_ADMIN_DELETE_ALL:
-                    storage.delete_user(uid)
-                elif data == CB_ADMIN_DELETE_PERM and plan == "permanent":
-                    storage.delete_user(uid)
-                elif data == CB_ADMIN_DELETE_DAY and plan == "1hari":
-                    storage.delete_user(uid)
-                elif data == CB_ADMIN_DELETE_WEEK and plan == "1minggu":
-                    storage.delete_user(uid)
-                elif data == CB_ADMIN_DELETE_MONTH and plan == "1bulan":
-                    storage.delete_user(uid)
-            return await q.edit_message_text("✅ Penghapusan selesai.", reply_markup=_admin_menu_kb())
+            plan = {
+                CB_ADMIN_DELETE_ALL: None,
+                CB_ADMIN_DELETE_PERM: "permanent",
+                CB_ADMIN_DELETE_DAY: "1hari",
+                CB_ADMIN_DELETE_WEEK: "1minggu",
+                CB_ADMIN_DELETE_MONTH: "1bulan",
+            }[data]
+            deleted = storage.delete_by_plan(plan)
+            return await q.edit_message_text(f"✅ Penghapusan selesai. {deleted} user dihapus.", reply_markup=_admin_menu_kb())
 
         # === Broadcast ===
         if data == CB_ADMIN_BROADCAST:
             context.user_data[KEY_ADMIN_PENDING_ACTION] = "broadcast"
             context.user_data[KEY_ADMIN_BROADCAST_WAIT] = True
-            return await q.edit_message_text("📢 Ketik pesan broadcast yang ingin dikirim ke semua user:",
+            return await q.edit_message_text("📢 Ketik pesan broadcast (atau kirim dokumen + caption) untuk semua user:",
                                              parse_mode="Markdown")
 
         # === Cari user ===
@@ -231,12 +295,10 @@ class AdminPanelHandler:
 
         # === Ringkasan ===
         if data == CB_ADMIN_SUMMARY:
-            rows = storage.get_all_subscribers()
-            total = len(rows)
-            perm = sum(1 for _, _, p, _ in rows if p == "permanent")
-            d1 = sum(1 for _, _, p, _ in rows if p == "1hari")
-            w1 = sum(1 for _, _, p, _ in rows if p == "1minggu")
-            m1 = sum(1 for _, _, p, _ in rows if p == "1bulan")
+            counts = storage.count_by_plan()
+            total = counts["total"]
+            perm, d1 = counts["permanent"], counts["1hari"]
+            w1, m1 = counts["1minggu"], counts["1bulan"]
             msg = (f"📊 *Ringkasan User*\n"
                    f"• Total: {total}\n"
                    f"• Permanent: {perm}\n"
@@ -247,30 +309,19 @@ class AdminPanelHandler:
 
         # === Export Excel ===
         if data == CB_ADMIN_EXPORT:
-            rows = storage.get_all_subscribers()
-            if not rows:
-                return await q.edit_message_text("Tidak ada user.", reply_markup=_admin_menu_kb())
-            output = io.BytesIO()
-            wb = xlsxwriter.Workbook(output, {'in_memory': True})
-            ws = wb.add_worksheet("Users")
-            headers = ["User ID", "Nama", "Paket", "Expired", "Status"]
-            for c, h in enumerate(headers):
-                ws.write(0, c, h)
-            for r, (uid, name, plan, exp) in enumerate(rows, start=1):
-                status = storage.get_user_status(uid)
-                pkg_map = {"permanent": "Permanent","1hari": "1 Hari",
-                           "1minggu": "1 Minggu","1bulan": "1 Bulan"}
-                pkg = pkg_map.get(plan, plan)
-                exp_val = "PERMANENT" if plan == "permanent" else _fmt_ts(exp)
-                ws.write(r, 0, uid)
-                ws.write(r, 1, name or "-")
-                ws.write(r, 2, pkg)
-                ws.write(r, 3, exp_val)
-                ws.write(r, 4, status["type"])
-            wb.close()
-            output.seek(0)
-            return await q.message.reply_document(InputFile(output, "subscribers.xlsx"),
-                                                  caption="📂 Export data user")
+            try:
+                path, n = await asyncio.to_thread(_export_subscribers_xlsx)
+            except Exception as e:
+                logger.error(f"[Admin] export gagal: {e}")
+                return await q.edit_message_text(f"❌ Gagal export: {e}", reply_markup=_admin_menu_kb())
+            try:
+                if not n:
+                    return await q.edit_message_text("Tidak ada user.", reply_markup=_admin_menu_kb())
+                return await file_cache.reply_cached(q.message, path, "subscribers.xlsx",
+                                                     caption=f"📂 Export data user ({n})")
+            finally:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
 
     # ------------------------------------------------
     # Handle Document (Import DB)
@@ -280,6 +331,8 @@ class AdminPanelHandler:
             return
 
         pending = context.user_data.get(KEY_ADMIN_PENDING_ACTION)
+        if pending == "broadcast" and context.user_data.get(KEY_ADMIN_BROADCAST_WAIT):
+            return await self.handle_broadcast_document(update, context)
         if pending != "importdb" or not context.user_data.get(KEY_ADMIN_IMPORT_WAIT):
             return await update.message.reply_text("❌ Silakan pilih menu Import DB terlebih dahulu.")
 
@@ -290,13 +343,64 @@ class AdminPanelHandler:
                 return await update.message.reply_text("❌ File harus `.db`")
             tg_file = await update.get_bot().get_file(doc.file_id)
             data = await tg_file.download_as_bytearray()
-            with open(storage.DB_PATH, "wb") as f:
-                f.write(data)
-            return await update.message.reply_text("✅ Import DB sukses. Restart bot untuk menerapkan perubahan.")
+            await db_backup.import_db_bytes(data)
+            return await update.message.reply_text("✅ Import DB sukses. Data baru langsung aktif.")
+        except db_backup.InvalidDatabase as e:
+            return await update.message.reply_text(f"❌ File DB tidak valid: {e}\nDB lama tidak diubah.")
         except Exception as e:
             logger.error(f"Gagal import DB: {e}")
             return await update.message.reply_text(f"❌ Gagal import DB: {e}")
 
+    # ------------------------------------------------
+    # Broadcast (teks / lampiran)
+    # ------------------------------------------------
+    async def _broadcast(self, send_one):
+        """Kirim ke semua user via `send_one(user_id)`. Return (berhasil, gagal)."""
+        success, fail = 0, 0
+        for u in storage.get_all_users():
+            try:
+                await send_one(u["user_id"])
+                success += 1
+            except Exception as e:
+                logger.warning(f"Broadcast gagal ke {u['user_id']}: {e}")
+                fail += 1
+            await asyncio.sleep(0.05)
+        return success, fail
+
+    async def handle_broadcast_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Broadcast lampiran: file sudah ada di server Telegram → kirim ulang pakai file_id (tanpa upload)."""
+        context.user_data[KEY_ADMIN_BROADCAST_WAIT] = False
+        doc = update.message.document
+        if not doc:
+            return await update.message.reply_text("❌ Kirim teks atau dokumen untuk broadcast.")
+        bot = update.get_bot()
+        caption = update.message.caption
+        success, fail = await self._broadcast(
+            lambda uid: bot.send_document(chat_id=uid, document=doc.file_id, caption=caption)
+        )
+        return await update.message.reply_text(f"📢 Broadcast selesai.\n✅ {success} | ❌ {fail}")
+
+    # ------------------------------------------------
+    # Local ingest (/ingest): file besar langsung dari disk server
+    # ------------------------------------------------
+    async def handle_ingest_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not is_owner(update.effective_user.id):
+            return await update.message.reply_text("❌ Akses ditolak. Hanya owner yang bisa /ingest.")
+        import local_ingest  # engine + fitur split/merge dimuat saat dipakai
+        text = (update.message.text or "").partition(" ")[2].strip()
+        if not text:
+            return await update.message.reply_text(local_ingest.USAGE)
+
+        status = await update.message.reply_text("🔄 Memproses file lokal…")
+        try:
+            cmd, out_dir, report = await asyncio.to_thread(local_ingest.run_ingest, text)
+        except local_ingest.IngestError as e:
+            return await status.edit_text(f"❌ {e}")
+        except Exception as e:
+            logger.error(f"Ingest gagal: {e}")
+            return await status.edit_text(f"❌ Ingest gagal: {e}")
+        await status.edit_text(_ingest_summary(cmd, out_dir, report))
+
     # ------------------------------------------------
     # Handle Text (Cari, Tambah, Hapus, Broadcast)
     # ------------------------------------------------
@@ -309,7 +413,6 @@ class AdminPanelHandler:
         # === Cari user ===
         if pending == "search" and context.user_data.get(KEY_ADMIN_SEARCH_WAIT):
             context.user_data[KEY_ADMIN_SEARCH_WAIT] = False
-            rows = storage.get_all_subscribers()
             if txt.isdigit():
                 uid = int(txt)
                 detail = storage.get_user_detail(uid)
@@ -322,31 +425,25 @@ class AdminPanelHandler:
                         f"Status: {detail['type']}\n"
                         f"Expired: {_fmt_ts(detail['expires_at'])}")
             else:
-                for uid, name, _, _ in rows:
-                    if name and name.lower() == txt.lower():
-                        detail = storage.get_user_detail(uid)
-                        return await update.message.reply_text(
-                            f"👤 User ditemukan:\n"
-                            f"ID: {detail['user_id']}\n"
-                            f"Nama: {detail['name'] or '-'}\n"
-                            f"Plan: {detail['plan']}\n"
-                            f"Status: {detail['type']}\n"
-                            f"Expired: {_fmt_ts(detail['expires_at'])}")
+                rows = storage.find_by_name(txt)
+                if rows:
+                    detail = storage.get_user_detail(rows[0]["user_id"])
+                    return await update.message.reply_text(
+                        f"👤 User ditemukan:\n"
+                        f"ID: {detail['user_id']}\n"
+                        f"Nama: {detail['name'] or '-'}\n"
+                        f"Plan: {detail['plan']}\n"
+                        f"Status: {detail['type']}\n"
+                        f"Expired: {_fmt_ts(detail['expires_at'])}")
             return await update.message.reply_text("❗ User tidak ditemukan.")
 
         # === Broadcast ===
         if pending == "broadcast" and context.user_data.get(KEY_ADMIN_BROADCAST_WAIT):
             context.user_data[KEY_ADMIN_BROADCAST_WAIT] = False
-            users = storage.get_all_users()
-            success, fail = 0, 0
-            for u in users:
-                try:
-                    await update.get_bot().send_message(chat_id=u["user_id"], text=txt)
-                    success += 1
-                except Exception as e:
-                    logger.warning(f"Broadcast gagal ke {u['user_id']}: {e}")
-                    fail += 1
-                await asyncio.sleep(0.05)
+            bot = update.get_bot()
+            success, fail = await self._broadcast(
+                lambda uid: bot.send_message(chat_id=uid, text=txt)
+            )
             return await update.message.reply_text(f"📢 Broadcast selesai.\n✅ {success} | ❌ {fail}")
 
         # === Tambah user flow ===
@@ -367,15 +464,15 @@ class AdminPanelHandler:
 
         # === Hapus user by ID/nama ===
         if pending == "delete":
-            rows = storage.get_all_subscribers()
             if txt.isdigit():
                 uid = int(txt)
                 storage.delete_user(uid)
                 return await update.message.reply_text(f"✅ User {uid} dihapus.")
-            for uid, name, _, _ in rows:
-                if name and name.lower() == txt.lower():
-                    storage.delete_user(uid)
-                    return await update.message.reply_text(f"✅ User {uid} ({name}) dihapus.")
+            rows = storage.find_by_name(txt)
+            if rows:
+                storage.delete_many([r["user_id"] for r in rows])
+                ids = ", ".join(str(r["user_id"]) for r in rows)
+                return await update.message.reply_text(f"✅ User {ids} ({rows[0]['name']}) dihapus.")
             return await update.message.reply_text("❗ User tidak ditemukan.")
 
     # ------------------------------------------------
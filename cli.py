@@ -0,0 +1,253 @@
+# cli.py
+"""
+CLI headless: engine konversi bot tanpa Telegram (batch / benchmark).
+
+  python -m cli count "data/*.txt" data/a.vcf
+  python -m cli txt2vcf v1 "Admin, kontak1, dedup" "data/*.txt" -o out
+  python -m cli txt2vcf v2 "Admin, kontak, 50, 10, 5" data/a.txt -o out
+  python -m cli vcf2txt "data/*.vcf" [--merge gabungan] -o out
+  python -m cli merge "data/*.vcf" --name hasil [--dedup name_phone] -o out
+  python -m cli split data/a.vcf --mode size --value 100 [--base kontak1] -o out
+  python -m cli addctc "data/*.vcf" --numbers baru.txt [--name Admin] -o out
+  python -m cli removectc "data/*.vcf" --numbers hapus.txt -o out
+  python -m cli editname "data/*.vcf" --name Admin [--global] -o out
+
+Input boleh glob (termasuk **). Job per file dijalankan paralel di process pool
+(--jobs, default jumlah core). Ringkasan + stats dicetak sebagai JSON ke stdout.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import local_ingest
+from local_ingest import IngestError, dedupe_name, split_params
+from features.vcf_to_txt import VCFToTxtHandler
+from features.add_ctc_vcf import _analyze_file, _build_outputs, _parse_numbers
+from features.remove_ctc_vcf import _filter_vcf, _parse_targets
+from features.edit_ctc_name import EditCtcNameHandler
+from features.split_files import SPLIT_BY_COUNT, SPLIT_BY_SIZE, SPLIT_BY_BYTES
+from features.merge_files import DEDUP_PHONE, DEDUP_NAME_PHONE
+
+
+# =========================
+# Helpers
+# =========================
+def expand_inputs(patterns: list) -> list:
+    """Pola glob / path → daftar file (urut per pola, tanpa duplikat)."""
+    out = []
+    for pat in patterns:
+        hits = sorted(glob.glob(pat, recursive=True)) if glob.has_magic(pat) else [pat]
+        for p in hits:
+            if not os.path.isfile(p):
+                raise IngestError(f"File tidak ditemukan: {p}")
+            out.append(os.path.abspath(p))
+    out = list(dict.fromkeys(out))
+    if not out:
+        raise IngestError("Tidak ada file input.")
+    return out
+
+def _pmap(fn, jobs: list, workers: int) -> list:
+    """fn(*job) untuk tiap job; >1 job & >1 worker → process pool (urutan hasil tetap)."""
+    if workers <= 1 or len(jobs) <= 1:
+        return [fn(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(fn, *zip(*jobs)))
+
+def _read_text(path: str) -> str:
+    with open(path, "rb") as f:
+        return f.read().decode("utf-8", errors="ignore")
+
+def _write(out_dir: str, name: str, data: bytes) -> None:
+    with open(os.path.join(out_dir, name), "wb") as f:
+        f.write(data)
+
+def _out_names(paths: list, rename=None) -> list:
+    """Nama output = nama input (opsional diubah); nama kembar diberi akhiran _1, _2, …"""
+    used = set()
+    return [dedupe_name(rename(os.path.basename(p)) if rename else os.path.basename(p), used) for p in paths]
+
+
+# =========================
+# Job per file (top-level → bisa di-pickle ke process pool)
+# =========================
+def _job_count(path: str) -> dict:
+    return local_ingest.count_files([path])["items"][0]
+
+def _job_vcf2txt(path: str, out_dir: str, name: str) -> dict:
+    with open(path, "rb") as f:
+        txt, n = VCFToTxtHandler._parse_vcf(f.read())
+    if out_dir:
+        _write(out_dir, name, txt.encode("utf-8"))
+        return {"filename": name, "numbers": n}
+    return {"filename": name, "numbers": n, "text": txt}
+
+def _job_addctc(path: str, out_dir: str, name: str, queue: list, named: dict) -> dict:
+    v = _analyze_file(name, _read_text(path))
+    (_, data), = _build_outputs([v], queue, named)
+    _write(out_dir, name, data)
+    return {"filename": name, "before": v["cards"], "added": len(queue)}
+
+def _job_removectc(path: str, out_dir: str, name: str, targets: set) -> dict:
+    out, total, removed = _filter_vcf(_read_text(path), targets)
+    _write(out_dir, name, out)
+    return {"filename": name, "before": total, "removed": removed, "after": total - removed}
+
+def _job_cardcount(path: str) -> int:
+    return EditCtcNameHandler._count_cards(_read_text(path))
+
+def _job_editname(path: str, out_dir: str, name: str, base_name: str, start: int) -> dict:
+    out, nxt = EditCtcNameHandler._rename_stream(_read_text(path), base_name, start)
+    _write(out_dir, name, out)
+    return {"filename": name, "first": start, "contacts": nxt - start}
+
+
+# =========================
+# Subcommand
+# =========================
+def cmd_count(args, paths):
+    items = _pmap(_job_count, [(p,) for p in paths], args.jobs)
+    return {
+        "items": items,
+        "total_txt": sum(i["count"] for i in items if i["type"] == "txt"),
+        "total_vcf": sum(i["count"] for i in items if i["type"] == "vcf"),
+        "total_vcf_tel": sum(i["tels"] for i in items if i["type"] == "vcf"),
+    }
+
+def cmd_txt2vcf(args, paths):
+    return local_ingest.dispatch(args.version, split_params(args.params), paths, args.out)
+
+def cmd_vcf2txt(args, paths):
+    names = _out_names(paths, lambda n: n.replace(".vcf", ".txt"))
+    if not args.merge:
+        files = _pmap(_job_vcf2txt, [(p, args.out, n) for p, n in zip(paths, names)], args.jobs)
+        return {"files": files, "total": sum(f["numbers"] for f in files)}
+    # gabung: parse paralel, sambung sesuai urutan input (sama dengan mode gabung di bot)
+    parsed = _pmap(_job_vcf2txt, [(p, None, n) for p, n in zip(paths, names)], args.jobs)
+    fname = args.merge if args.merge.lower().endswith(".txt") else args.merge + ".txt"
+    _write(args.out, fname, "\n".join(f["text"] for f in parsed if f["numbers"]).encode("utf-8"))
+    return {"filename": fname, "files": [{k: f[k] for k in ("filename", "numbers")} for f in parsed],
+            "total": sum(f["numbers"] for f in parsed)}
+
+def cmd_merge(args, paths):
+    return local_ingest.dispatch("merge", [args.name, args.dedup], paths, args.out)
+
+def cmd_split(args, paths):
+    params = [args.mode, str(args.value)] + ([args.base] if args.base else [])
+    return local_ingest.dispatch("split", params, paths, args.out)
+
+def cmd_addctc(args, paths):
+    queue = _parse_numbers(_read_text(args.numbers))
+    if not queue:
+        raise IngestError("Tidak ada nomor valid di --numbers.")
+    # Nama Khusus: "nama 1..N" (selalu mulai dari 1), sama seperti tombol di bot
+    named = {ph: f"{args.name} {i + 1}" for i, ph in enumerate(queue)} if args.name else {}
+    names = _out_names(paths)
+    files = _pmap(_job_addctc, [(p, args.out, n, queue, named) for p, n in zip(paths, names)], args.jobs)
+    return {"files": files, "added_per_file": len(queue)}
+
+def cmd_removectc(args, paths):
+    targets = _parse_targets(_read_text(args.numbers))
+    if not targets:
+        raise IngestError("Tidak ada nomor valid di --numbers.")
+    names = _out_names(paths)
+    files = _pmap(_job_removectc, [(p, args.out, n, targets) for p, n in zip(paths, names)], args.jobs)
+    return {"files": files, "targets": len(targets), "removed": sum(f["removed"] for f in files)}
+
+def cmd_editname(args, paths):
+    # index awal tiap file dari jumlah kartu (aturan _rename_stream) → semua file bisa diproses bersamaan
+    starts = [1] * len(paths)
+    if args.global_numbering:
+        counts = _pmap(_job_cardcount, [(p,) for p in paths], args.jobs)
+        running = 1
+        for i, c in enumerate(counts):
+            starts[i], running = running, running + c
+    names = _out_names(paths)
+    files = _pmap(_job_editname, [(p, args.out, n, args.name, st) for p, n, st in zip(paths, names, starts)], args.jobs)
+    return {"files": files, "contacts": sum(f["contacts"] for f in files)}
+
+
+# =========================
+# Parser & entry
+# =========================
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m cli", description="Engine konversi TXT/VCF tanpa Telegram.")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    def add(name, fn, help_text, out=True):
+        p = sub.add_parser(name, help=help_text)
+        p.set_defaults(func=fn)
+        p.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="proses paralel (default: jumlah core)")
+        p.add_argument("--pretty", action="store_true", help="JSON ter-indentasi")
+        if out:
+            p.add_argument("-o", "--out", default="out", help="folder output (default: out)")
+        return p
+
+    p = add("count", cmd_count, "hitung baris TXT / kontak VCF", out=False)
+    p.add_argument("inputs", nargs="+")
+
+    p = add("txt2vcf", cmd_txt2vcf, "TXT → VCF (V1 / V2)")
+    p.add_argument("version", choices=["v1", "v2"])
+    p.add_argument("params", help='v1: "nama[, nama_dasar1][, dedup]" · v2: "nama, file, per_file, jumlah_file, start"')
+    p.add_argument("inputs", nargs="+")
+
+    p = add("vcf2txt", cmd_vcf2txt, "VCF → TXT")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--merge", metavar="NAMA", help="gabung semua ke 1 TXT")
+
+    p = add("merge", cmd_merge, "gabung TXT/VCF (dedup)")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--name", required=True, help="nama file output")
+    p.add_argument("--dedup", choices=[DEDUP_PHONE, DEDUP_NAME_PHONE], default=DEDUP_PHONE)
+
+    p = add("split", cmd_split, "split TXT/VCF")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--mode", choices=[SPLIT_BY_COUNT, SPLIT_BY_SIZE, SPLIT_BY_BYTES], default=SPLIT_BY_COUNT)
+    p.add_argument("--value", type=int, required=True, help="jumlah file / unit per file / KB per file")
+    p.add_argument("--base", help="nama dasar berakhiran angka")
+
+    p = add("addctc", cmd_addctc, "tambah kontak ke VCF")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--numbers", required=True, help="TXT daftar nomor (1 baris = 1 nomor)")
+    p.add_argument("--name", help="nama dasar kontak baru (default: lanjut urutan file)")
+
+    p = add("removectc", cmd_removectc, "hapus kontak dari VCF")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--numbers", required=True, help="TXT daftar nomor target")
+
+    p = add("editname", cmd_editname, "ganti nama kontak VCF")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--name", required=True, help="nama kontak dasar")
+    p.add_argument("--global", dest="global_numbering", action="store_true", help="penomoran global lintas file")
+    return ap
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    started = time.perf_counter()
+    paths = []
+    try:
+        paths = expand_inputs(args.inputs)
+        if getattr(args, "out", None):
+            os.makedirs(args.out, exist_ok=True)
+        report = args.func(args, paths)
+        ok, code = True, 0
+    except (IngestError, OSError) as e:
+        report, ok, code = {"error": str(e)}, False, 1
+    result = {
+        "command": args.command,
+        "ok": ok,
+        "inputs": len(paths),
+        "jobs": args.jobs,
+        "out": getattr(args, "out", None),
+        "elapsed_sec": round(time.perf_counter() - started, 3),
+        **report,
+    }
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2 if args.pretty else None)
+    sys.stdout.write("\n")
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,7 @@
 import os
+import re
+import html
+from functools import lru_cache
 from dotenv import load_dotenv
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
@@ -8,9 +11,8 @@ load_dotenv()
 # =========================
 # Bot Configuration
 # =========================
+# wajib untuk bot (dicek di main.py); CLI headless tidak butuh token
 BOT_TOKEN = os.getenv("BOT_TOKEN")
-if not BOT_TOKEN:
-    raise ValueError("BOT_TOKEN environment variable is required!")
 
 # =========================
 # OWNER & ADMIN SETTINGS
@@ -222,28 +224,72 @@ INSTRUCTIONS = {
         "441231231232\n"
         "712312312313\n"
         "```\n\n"
-        "⚠️ Baris-1 = nama file, Baris-2 *KOSONG* (pemisah)."
+        "⚠️ Baris-1 = nama file, Baris-2 *KOSONG* (pemisah).\n"
+        "📎 Format yang sama juga bisa dikirim sebagai file *.txt*."
     ),
 }
 
 # =========================
 # Menu helper
 # =========================
+# markup menu dibangun sekali saat import; objek PTB immutable → aman dipakai ulang
+MENU_MARKUPS = {k: InlineKeyboardMarkup(m["buttons"]) for k, m in MENUS.items() if "buttons" in m}
+
+_MD_MARKS = str.maketrans("", "", "*_`")
+_HTML_TAG = re.compile(r"<[^>]+>")
+
+@lru_cache(maxsize=256)
+def _menu_text(menu_key, kw_items):
+    text = MENUS[menu_key]["text"]
+    return text.format(**dict(kw_items)) if kw_items else text
+
+def menu_text(menu_key, **kwargs):
+    """Teks menu terformat, di-memo per (menu, kwargs)."""
+    try:
+        return _menu_text(menu_key, tuple(sorted(kwargs.items())))
+    except TypeError:   # kwargs tidak hashable → format langsung
+        return MENUS[menu_key]["text"].format(**kwargs)
+
+@lru_cache(maxsize=256)
+def _plain(text, parse_mode):
+    """Perkiraan teks yang tampil di Telegram (markup dibuang) untuk dibandingkan dengan message.text."""
+    if parse_mode == "HTML":
+        return html.unescape(_HTML_TAG.sub("", text)).strip()
+    return text.translate(_MD_MARKS).strip()
+
+def already_showing(message, text, reply_markup=None, parse_mode="Markdown") -> bool:
+    """
+    True kalau `message` sudah menampilkan teks + keyboard yang sama → edit bisa dilewati
+    (hemat 1 round trip yang pasti gagal "message is not modified").
+    Perbandingan konservatif: ragu → False (tetap edit).
+    """
+    current = getattr(message, "text", None)
+    if not current:
+        return False
+    return message.reply_markup == reply_markup and current.strip() == _plain(text, parse_mode)
+
+def is_not_modified(e: Exception) -> bool:
+    return "message is not modified" in str(e).lower()
+
 async def show_menu(message_target, menu_key, edit=False, **kwargs):
     menu = MENUS.get(menu_key)
     if not menu:
         return
 
-    text = menu["text"].format(**kwargs) if kwargs else menu["text"]
-    reply_markup = InlineKeyboardMarkup(menu["buttons"]) if "buttons" in menu else None
+    text = menu_text(menu_key, **kwargs) if kwargs else menu["text"]
+    reply_markup = MENU_MARKUPS.get(menu_key)
 
     try:
         if edit:
             if hasattr(message_target, "edit_message_text"):
+                if already_showing(message_target.message, text, reply_markup):
+                    return
                 await message_target.edit_message_text(
                     text, reply_markup=reply_markup, parse_mode="Markdown"
                 )
             elif hasattr(message_target, "edit_text"):
+                if already_showing(message_target, text, reply_markup):
+                    return
                 await message_target.edit_text(
                     text, reply_markup=reply_markup, parse_mode="Markdown"
                 )
@@ -256,7 +302,8 @@ async def show_menu(message_target, menu_key, edit=False, **kwargs):
                 text, reply_markup=reply_markup, parse_mode="Markdown"
             )
     except Exception as e:
-        print(f"Error showing menu: {e}")
+        if not is_not_modified(e):
+            print(f"Error showing menu: {e}")
 
 def get_instruction(key):
     return INSTRUCTIONS.get(key, "Instruksi tidak ditemukan.")
@@ -267,3 +314,41 @@ def get_instruction(key):
 MAX_FILES_V2 = 10
 UPLOAD_TIMEOUT = 3.0
 SLEEP_BETWEEN_FILES = 0.3
+MERGE_SPOOL_MAX = 8 * 1024 * 1024   # output merge di RAM sampai N byte, sisanya ke file temp
+MERGE_VCF_DEDUP = "phone"           # default dedup merge VCF: "phone" / "name_phone"
+
+# =========================
+# Output pipeline (render → upload)
+# =========================
+UPLOAD_WORKERS = 1        # worker upload paralel (urutan kirim tetap dijaga)
+UPLOAD_QUEUE_SIZE = 2     # file hasil render yang boleh antre menunggu upload
+UPLOAD_RETRIES = 2        # percobaan ulang per file (timeout / flood control)
+FILE_CACHE_MAX = 256      # maks entri cache file_id (hash isi → file_id) di memori
+
+# =========================
+# Local ingest (/ingest owner: file besar langsung dari disk server)
+# =========================
+LOCAL_INGEST_DIR = os.getenv("LOCAL_INGEST_DIR", "ingest")        # folder input yang boleh dibaca
+LOCAL_OUTPUT_DIR = os.getenv("LOCAL_OUTPUT_DIR", "ingest_out")    # hasil ditulis per run ke subfolder
+LOCAL_CHUNK_LINES = 10_000   # nomor per langkah normalize/render (memori per langkah tetap kecil)
+
+# =========================
+# Startup
+# =========================
+# handler fitur di-import lazy; N detik setelah start semua dimuat di background
+# supaya klik pertama tidak menanggung biaya import (0 = tidak preload)
+HANDLER_PRELOAD_DELAY = 30
+
+# =========================
+# Session GC (user_data / chat_data)
+# =========================
+SESSION_IDLE_TTL = 60 * 60               # detik; sesi idle lebih lama dari ini dibuang
+SESSION_MAX_BYTES = 50 * 1024 * 1024     # budget perkiraan ukuran sesi per user/chat
+SESSION_GC_INTERVAL = 10 * 60            # detik antar putaran GC
+
+# =========================
+# Backup DB
+# =========================
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")   # folder snapshot lokal
+BACKUP_KEEP = 7                                   # simpan N snapshot terakhir
+BACKUP_COMPRESS = True                            # gzip snapshot harian
@@ -0,0 +1,179 @@
+# db_backup.py
+import os
+import gzip
+import glob
+import shutil
+import sqlite3
+import asyncio
+import logging
+import datetime
+from typing import Iterable, Optional, Tuple
+
+import storage
+import file_cache
+from config import BACKUP_DIR, BACKUP_KEEP
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "SNAPSHOT_PREFIX", "EXPORT_PREFIX", "make_snapshot", "create_snapshot", "send_snapshot",
+    "InvalidDatabase", "validate_db", "import_db_bytes",
+]
+
+SNAPSHOT_PREFIX = "users_"    # backup harian / sebelum import → ikut retensi BACKUP_KEEP
+EXPORT_PREFIX = "export_"     # export manual admin → tidak ikut retensi, dihapus setelah dikirim
+
+
+# =========================
+# Snapshot (sqlite online-backup API)
+# =========================
+def _prune(keep: int) -> None:
+    """Simpan hanya `keep` snapshot terbaru di BACKUP_DIR (file .tmp yang sedang ditulis tidak disentuh)."""
+    if keep <= 0:
+        return
+    files = sorted(
+        (f for f in glob.glob(os.path.join(BACKUP_DIR, f"{SNAPSHOT_PREFIX}*.db*")) if not f.endswith(".tmp")),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for old in files[keep:]:
+        try:
+            os.remove(old)
+        except OSError as e:
+            logger.warning(f"[Backup] gagal hapus {old}: {e}")
+
+def make_snapshot(compress: bool = False, keep: int = BACKUP_KEEP, prefix: str = SNAPSHOT_PREFIX) -> str:
+    """
+    Salin DB secara konsisten via sqlite3.Connection.backup (aman walau ada writer).
+    Tulis ke file temp lalu rename → file di BACKUP_DIR tidak pernah setengah jadi.
+    Retensi hanya berlaku untuk prefix SNAPSHOT_PREFIX (export manual tidak memangkas backup).
+    Return path snapshot (.db atau .db.gz).
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    final = os.path.join(BACKUP_DIR, f"{prefix}{stamp}.db")
+    tmp = final + ".tmp"
+
+    src = sqlite3.connect(storage.DB_PATH)
+    dst = sqlite3.connect(tmp)
+    try:
+        with dst:
+            src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+    if compress:
+        gz_tmp = final + ".gz.tmp"
+        with open(tmp, "rb") as fin, gzip.open(gz_tmp, "wb", compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout)
+        os.remove(tmp)
+        final += ".gz"
+        tmp = gz_tmp
+
+    os.replace(tmp, final)
+    if prefix == SNAPSHOT_PREFIX:
+        _prune(keep)
+    return final
+
+async def create_snapshot(compress: bool = False, keep: int = BACKUP_KEEP, prefix: str = SNAPSHOT_PREFIX) -> str:
+    """Versi async: jalankan make_snapshot di worker thread (tidak blok event loop)."""
+    return await asyncio.to_thread(make_snapshot, compress, keep, prefix)
+
+
+# =========================
+# Kirim snapshot (upload sekali, sisanya pakai file_id)
+# =========================
+async def send_snapshot(
+    bot,
+    chat_ids: Iterable[int],
+    path: str,
+    filename: Optional[str] = None,
+    caption: Optional[str] = None,
+) -> Tuple[int, int]:
+    """
+    Kirim snapshot ke beberapa chat lewat file_cache:
+    upload pertama pakai file asli, berikutnya (dan snapshot identik lain kali)
+    pakai file_id hasil upload tsb. Return (berhasil, gagal).
+    """
+    filename = filename or os.path.basename(path)
+    ok, fail = 0, 0
+
+    for cid in chat_ids:
+        try:
+            await file_cache.send_cached(bot, cid, path, filename, caption=caption)
+            ok += 1
+        except Exception as e:
+            logger.warning(f"[Backup] gagal kirim ke {cid}: {e}")
+            fail += 1
+    return ok, fail
+
+
+# =========================
+# Import DB (validasi + swap tanpa restart)
+# =========================
+REQUIRED_SCHEMA = {
+    "subscriptions": {"user_id", "name", "plan", "expires_at"},
+    "users": {"user_id", "trial_end", "paid_until"},
+}
+
+class InvalidDatabase(ValueError):
+    """File DB upload tidak valid (rusak / skema tidak cocok)."""
+
+def validate_db(path: str) -> None:
+    """Cek integrity_check + tabel/kolom wajib. Raise InvalidDatabase jika gagal."""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        raise InvalidDatabase(f"tidak bisa dibuka: {e}")
+    try:
+        try:
+            res = conn.execute("PRAGMA integrity_check").fetchone()
+        except sqlite3.DatabaseError as e:
+            raise InvalidDatabase(f"bukan file SQLite: {e}")
+        if not res or res[0] != "ok":
+            raise InvalidDatabase(f"integrity_check: {res[0] if res else '-'}")
+
+        for table, cols in REQUIRED_SCHEMA.items():
+            found = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+            if not found:
+                raise InvalidDatabase(f"tabel `{table}` tidak ada")
+            missing = cols - found
+            if missing:
+                raise InvalidDatabase(f"kolom hilang di `{table}`: {', '.join(sorted(missing))}")
+    finally:
+        conn.close()
+
+def _import_db_file(data: bytes) -> str:
+    """
+    Tulis upload ke file temp → validasi → snapshot DB lama → salin ke DB live
+    via backup API (atomik dari sisi pembaca, koneksi lain tetap jalan).
+    Return path snapshot DB lama (untuk rollback manual).
+    """
+    db_dir = os.path.dirname(os.path.abspath(storage.DB_PATH))
+    tmp = os.path.join(db_dir, f".import_{os.getpid()}_{int(datetime.datetime.now().timestamp())}.db")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        validate_db(tmp)
+
+        before = make_snapshot(compress=True)
+
+        src = sqlite3.connect(tmp)
+        dst = sqlite3.connect(storage.DB_PATH)
+        try:
+            with dst:
+                src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    storage.reload()
+    return before
+
+async def import_db_bytes(data: bytes) -> str:
+    """Versi async dari _import_db_file (jalan di worker thread)."""
+    return await asyncio.to_thread(_import_db_file, bytes(data))
@@ -1,86 +1,95 @@
 # features/add_ctc_vcf.py
 import io
 import re
+import time
+import asyncio
 from telegram import InputFile, InlineKeyboardButton, InlineKeyboardMarkup
+from config import UPLOAD_TIMEOUT
+from utils import build_zip, normalize_many
 
 # =========================
 # Helpers: normalisasi nomor
 # =========================
-def _fallback_clean(s: str) -> str:
-    return re.sub(r"[^\d+]", "", (s or "").strip())
-
-try:
-    # jika punya utils, pakai
-    from utils import clean_phone_number as _clean_phone, normalize_phone as _norm_phone
-    def _normalize_phone(raw: str) -> str:
-        return _norm_phone(_clean_phone(raw))
-except Exception:
-    # fallback sederhana
-    def _normalize_phone(raw: str) -> str:
-        s = _fallback_clean(raw)
-        if not s:
-            return ""
-        return s if s.startswith("+") else "+" + s
+def _parse_numbers(raw: str) -> list:
+    """1 baris = 1 nomor → list nomor ter-normalisasi (+digit), baris tanpa digit dibuang."""
+    nums, _ = normalize_many((raw or "").splitlines())
+    return nums
 
 # =========================
 # Helpers: VCF
 # =========================
-def _parse_blocks(content: str):
-    blocks, cur = [], []
-    for line in (content or "").splitlines():
-        up = line.strip().upper()
-        if up == "BEGIN:VCARD":
-            cur = [line]
-        elif up == "END:VCARD":
-            cur.append(line)
-            blocks.append(cur[:])
-            cur = []
-        elif cur:
-            cur.append(line)
-    return blocks
-
-def _dump(blocks):
-    out = []
-    for b in blocks:
-        out.extend(b)
-        if not b or b[-1].strip().upper() != "END:VCARD":
-            out.append("END:VCARD")
-        out.append("")
-    return "\n".join(out).strip() + "\n"
-
 def _extract_first_fn(text: str):
     for ln in (text or "").splitlines():
         if ln.upper().startswith("FN:"):
             return ln[3:].strip()
     return None
 
-def _all_fns_from_blocks(blocks) -> list[str]:
-    fns = []
-    for b in blocks:
-        for ln in b:
-            if ln.upper().startswith("FN:"):
-                fns.append(ln[3:].strip())
-                break
-    return fns
+def _count_cards(text: str) -> int:
+    return (text or "").upper().count("BEGIN:VCARD")
 
 _NUM_PAT = re.compile(r"^(.*?)(?:\s*[-_ ]\s*)?(\d+)$")
 
-def _analyze_sequence(fns: list[str]) -> tuple[str | None, int | None]:
+def _tail_sequence(text: str) -> tuple[str | None, int | None]:
     """
-    Deteksi pola 'BASENAME <angka>' dari daftar FN.
-    Return (basename, next_index). Ambil indeks terbesar + 1.
-    Dipakai untuk opsi SELESAI (tanpa nama khusus).
+    Deteksi pola 'BASENAME <angka>' dari FN kartu TERAKHIR (scan mundur dari akhir file).
+    Berhenti di FN bernomor pertama yang ditemukan → tidak regex semua FN.
+    Return (basename, next_index). Dipakai untuk opsi SELESAI (tanpa nama khusus).
     """
-    best_base, best_max = None, None
-    for name in fns:
-        m = _NUM_PAT.match(name)
-        if not m:
-            continue
-        base = m.group(1).strip()
-        idx = int(m.group(2))
-        if best_max is None or idx > best_max:
-            best_base, best_max = base, idx
-    return (best_base, (best_max + 1) if best_max is not None else None)
+    text = text or ""
+    pos = len(text)
+    while pos > 0:
+        start = text.rfind("\n", 0, pos) + 1
+        ln = text[start:pos].strip()
+        if ln[:3].upper() == "FN:":
+            m = _NUM_PAT.match(ln[3:].strip())
+            if m:
+                return m.group(1).strip(), int(m.group(2)) + 1
+        pos = start - 1
+    return None, None
+
+def _append_cards(text: str, cards: list) -> str:
+    """Tempel kartu baru di akhir isi asli (tanpa parse/rebuild kartu lama)."""
+    parts = [(text or "").rstrip("\r\n"), "\n"]
+    for name, phone in cards:
+        parts.append("\n")
+        parts.append("\n".join(_make_vcard(name, phone)))
+        parts.append("\n")
+    out = "".join(parts)
+    return out.lstrip("\n")
+
+def _analyze_file(fname: str, text: str) -> dict:
+    seq_base, seq_next = _tail_sequence(text)
+    return {
+        "fname": fname,
+        "text": text,
+        "cards": _count_cards(text),
+        "default_fn": _extract_first_fn(text),  # fallback
+        "seq_base": seq_base,                   # basis penomoran (jika ada)
+        "seq_next": seq_next,                   # index awal berikutnya (jika ada)
+    }
+
+def _names_for(v: dict, queue: list, named: dict) -> list:
+    """Nama kontak untuk tiap nomor baru pada 1 file."""
+    if named:
+        return [named[ph] for ph in queue]
+    out, running = [], v.get("seq_next")
+    seq_base, default_fn = v.get("seq_base"), v.get("default_fn")
+    for ph in queue:
+        if seq_base and running is not None:
+            out.append(f"{seq_base} {running}")
+            running += 1
+        else:
+            out.append(default_fn or ph)
+    return out
+
+def _build_outputs(files: list, queue: list, named: dict) -> list:
+    """Jalan di worker thread. Return [(fname, bytes), ...]."""
+    outs = []
+    for v in files:
+        names = _names_for(v, queue, named)
+        out_txt = _append_cards(v["text"], list(zip(names, queue)))
+        outs.append((v["fname"], out_txt.encode("utf-8")))
+    return outs
 
 def _make_vcard(name: str, phone: str) -> list[str]:
     return [
@@ -108,14 +117,15 @@ def _kb_actions() -> InlineKeyboardMarkup:
 class AddCtcVcfHandler:
     """
     Flow:
-      1) start_mode: minta upload 1 VCF
-      2) handle_document: terima VCF → minta daftar nomor (multi-baris)
+      1) start_mode: minta upload 1 atau beberapa VCF
+      2) handle_document: terima VCF (debounce UPLOAD_TIMEOUT) → minta daftar nomor (multi-baris)
       3) handle_text: terima nomor → tampilkan tombol (Nama Khusus / Selesai) + preview
       4) Klik Nama Khusus → bot minta *nama dasar* SEKALI (tanpa menampilkan nomor)
          - User mengetik, semua nomor dinamai: "NamaDasar 1..N" (selalu mulai dari 1)
-      5) Klik Selesai (tanpa Nama Khusus) → nama mengikuti urutan lama (basename + lanjut index),
-         jika tidak ada pola → pakai FN pertama; jika masih tidak ada → pakai nomornya.
-      6) Kirim file (nama sama persis seperti input), lalu kirim info ringkas.
+      5) Klik Selesai (tanpa Nama Khusus) → nama mengikuti urutan lama tiap file
+         (basename + lanjut index dari kartu terakhir), jika tidak ada pola → pakai FN pertama;
+         jika masih tidak ada → pakai nomornya.
+      6) Kirim file (nama sama persis seperti input; >1 file → 1 ZIP), lalu kirim info ringkas.
     """
 
     async def start_mode(self, query, context):
@@ -124,15 +134,18 @@ class AddCtcVcfHandler:
             "waiting_for_add_vcf_file": True,
             "waiting_for_phone_to_add": False,
             "waiting_for_batch_name": False,  # mode input nama dasar sekali
-            "add_vcf": {},          # {'fname','text','blocks','default_fn','seq_base','seq_next'}
+            "add_vcf_files": [],    # [{'fname','text','cards','default_fn','seq_base','seq_next'}]
+            "add_last_ts": 0.0,
+            "add_finalize_task": None,
             "add_queue": [],        # list[str] nomor baru
             "add_named": {},        # {phone: name} (jika Nama Khusus dipakai)
         })
         text = (
             "➕ *ADD CTC VCF*\n"
             "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            "📎 Upload *1 file .vcf* terlebih dahulu.\n"
-            "Lalu kirim *daftar nomor* (multi-baris, 1 baris = 1 nomor)."
+            "📎 Upload *1 atau beberapa file .vcf* terlebih dahulu.\n"
+            "Lalu kirim *daftar nomor* (multi-baris, 1 baris = 1 nomor).\n"
+            "Nomor yang sama ditambahkan ke *semua* file."
         )
         await query.edit_message_text(text, parse_mode="Markdown")
 
@@ -150,23 +163,37 @@ class AddCtcVcfHandler:
         data = await tg.download_as_bytearray()
         text = data.decode("utf-8", errors="ignore")
 
-        blocks = _parse_blocks(text)
-        fns = _all_fns_from_blocks(blocks)
-        seq_base, seq_next = _analyze_sequence(fns)
-
-        context.user_data["add_vcf"] = {
-            "fname": doc.file_name,
-            "text": text,
-            "blocks": blocks,
-            "default_fn": _extract_first_fn(text),  # fallback
-            "seq_base": seq_base,                   # basis penomoran (jika ada)
-            "seq_next": seq_next,                   # index awal berikutnya (jika ada)
-        }
+        context.user_data.setdefault("add_vcf_files", []).append(_analyze_file(doc.file_name, text))
+        context.user_data["add_last_ts"] = time.time()
+        self._schedule_finalize(update, context)
+
+    def _schedule_finalize(self, update, context):
+        old = context.user_data.get("add_finalize_task")
+        if old and not old.done():
+            old.cancel()
+
+        async def waiter():
+            try:
+                await asyncio.sleep(UPLOAD_TIMEOUT)
+                last = context.user_data.get("add_last_ts", 0.0)
+                if time.time() - last >= UPLOAD_TIMEOUT - 0.05:
+                    await self._ask_numbers(update, context)
+            except asyncio.CancelledError:
+                pass
+
+        context.user_data["add_finalize_task"] = asyncio.create_task(waiter())
+
+    async def _ask_numbers(self, update, context):
+        files = context.user_data.get("add_vcf_files", [])
+        if not files:
+            return
         context.user_data["waiting_for_add_vcf_file"] = False
         context.user_data["waiting_for_phone_to_add"] = True
+        context.user_data.pop("add_finalize_task", None)
 
+        head = f"📁 *{len(files)} file VCF* diterima.\n" if len(files) > 1 else ""
         await update.message.reply_text(
-            "📞 Kirim *nomor telepon* (multi-baris).",
+            f"{head}📞 Kirim *nomor telepon* (multi-baris).",
             parse_mode="Markdown",
         )
 
@@ -175,7 +202,7 @@ class AddCtcVcfHandler:
         # (1) Input daftar nomor
         if context.user_data.get("waiting_for_phone_to_add"):
             raw = update.message.text or ""
-            nums = [_normalize_phone(x) for x in raw.splitlines() if _normalize_phone(x)]
+            nums = _parse_numbers(raw)
             if not nums:
                 await update.message.reply_text("❌ Tidak ada nomor valid. Kirim lagi.")
                 return
@@ -183,28 +210,22 @@ class AddCtcVcfHandler:
             context.user_data["add_queue"] = nums
             context.user_data["waiting_for_phone_to_add"] = False
 
-            # Preview default (tanpa Nama Khusus) sekadar gambaran
-            v = context.user_data.get("add_vcf", {})
-            seq_base, seq_next = v.get("seq_base"), v.get("seq_next")
-            default_name = v.get("default_fn") or "Contact"
-
-            preview_pairs, running = [], seq_next
-            for ph in nums:
-                if seq_base and running is not None:
-                    nm = f"{seq_base} {running}"
-                    running += 1
-                else:
-                    nm = default_name
-                preview_pairs.append((nm, ph))
+            # Preview default (tanpa Nama Khusus) sekadar gambaran — pakai file pertama
+            files = context.user_data.get("add_vcf_files", [])
+            v = files[0] if files else {}
+            names = _names_for({**v, "default_fn": v.get("default_fn") or "Contact"}, nums, {})
+            preview_pairs = list(zip(names, nums))
 
             if len(preview_pairs) > 10:
                 preview_pairs = preview_pairs[:9] + [("…", nums[-1])]
             preview_lines = "\n".join([f"• {nm} → {ph}" for nm, ph in preview_pairs])
 
+            file_line = f"• *File:* **{len(files)}** (urutan nama per file)\n" if len(files) > 1 else ""
             text = (
                 "🗒️ *Antrean dibuat*\n"
                 "━━━━━━━━━━━━━━━━━━━━━━━\n"
                 f"• *Total nomor:* **{len(nums)}**\n"
+                f"{file_line}"
                 f"• *Preview (maks 10):*\n{preview_lines}\n"
                 "━━━━━━━━━━━━━━━━━━━━━━━\n"
                 "Pilih aksi:"
@@ -261,59 +282,44 @@ class AddCtcVcfHandler:
 
     # ===== Finalize =====
     async def _finalize(self, target, context):
-        vcf = context.user_data.get("add_vcf", {})
+        files = context.user_data.get("add_vcf_files", [])
         queue = context.user_data.get("add_queue", [])
         named = context.user_data.get("add_named", {})  # jika Nama Khusus dipakai
-        if not vcf or not queue:
+        if not files or not queue:
             msg = getattr(target, "edit_message_text", None) or getattr(target, "reply_text", None)
             if msg:
                 await msg("❌ Tidak ada data untuk diproses.")
             context.user_data.clear()
             return
 
-        base_blocks = vcf.get("blocks", [])
-        default_fn = vcf.get("default_fn")
-        seq_base, seq_next = vcf.get("seq_base"), vcf.get("seq_next")
-
-        new_blocks = []
-
-        if named:
-            # Sudah ada nama batch "Base 1..N"
-            for ph in queue:
-                new_blocks.append(_make_vcard(named[ph], ph))
-        else:
-            # Tanpa nama khusus: lanjut urutan lama / FN pertama / nomor
-            running = seq_next
-            for ph in queue:
-                if seq_base and running is not None:
-                    nm = f"{seq_base} {running}"
-                    running += 1
-                else:
-                    nm = default_fn or ph
-                new_blocks.append(_make_vcard(nm, ph))
-
-        out_txt = _dump(base_blocks + new_blocks)
-
-        # Nama file output SAMA seperti input
-        out_name = vcf.get("fname", "contacts.vcf")
+        outputs = await asyncio.to_thread(_build_outputs, files, queue, named)
 
-        bio = io.BytesIO(out_txt.encode("utf-8"))
-        bio.name = out_name
-
-        # 1) kirim file dulu (tanpa caption)
+        # 1) kirim file dulu (tanpa caption) — nama file output SAMA seperti input
         msg_target = target.message if hasattr(target, "message") else target
+        if len(outputs) == 1:
+            out_name, data = outputs[0]
+            bio = io.BytesIO(data)
+            bio.name = out_name
+        else:
+            out_name = "add_ctc.zip"
+            bio = io.BytesIO(build_zip(outputs))
+            bio.name = out_name
         await msg_target.reply_document(InputFile(bio))
 
         # 2) lalu info ringkas
-        info = (
-            "✅ *ADD CTC VCF selesai*\n"
-            "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            f"📁 *File:* `{out_name}`\n"
-            f"📊 *Ditambah:* **{len(queue)}** kontak\n"
-            "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            "Ketik */start* untuk kembali ke menu utama."
-        )
-        await msg_target.reply_text(info, parse_mode="Markdown")
+        lines = [
+            "✅ *ADD CTC VCF selesai*",
+            "━━━━━━━━━━━━━━━━━━━━━━━",
+            f"📁 *File:* `{out_name}`",
+        ]
+        if len(files) > 1:
+            lines.append(f"🗂️ *Jumlah file:* {len(files)}")
+        lines.extend([
+            f"📊 *Ditambah:* **{len(queue)}** kontak" + (" / file" if len(files) > 1 else ""),
+            "━━━━━━━━━━━━━━━━━━━━━━━",
+            "Ketik */start* untuk kembali ke menu utama.",
+        ])
+        await msg_target.reply_text("\n".join(lines), parse_mode="Markdown")
 
         # bersih
         context.user_data.clear()
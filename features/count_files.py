@@ -4,7 +4,7 @@ import time
 import logging
 import contextlib
 from config import UPLOAD_TIMEOUT
-from utils import read_file_content, parse_vcf_content
+from utils import count_nonblank_lines, count_vcf_bytes
 
 logger = logging.getLogger(__name__)
 
@@ -51,22 +51,19 @@ class CountFilesHandler:
         try:
             tg_file = await context.bot.get_file(doc.file_id)
             file_content = await tg_file.download_as_bytearray()
-            text = read_file_content(file_content)
-            if text is None:
-                await update.message.reply_text(f"❌ Tidak bisa membaca `{fname}`", parse_mode='Markdown')
-                return
 
-            # Hitung isi file
+            # Hitung langsung dari bytes (tanpa decode / parse per kontak)
             if lower.endswith('.txt'):
-                count = sum(1 for ln in text.splitlines() if ln.strip())
+                count = count_nonblank_lines(file_content)
+                tels = count
                 ftype = 'txt'
             else:
-                count = len(parse_vcf_content(text))
+                count, tels = count_vcf_bytes(file_content)
                 ftype = 'vcf'
 
             # Simpan
             context.user_data.setdefault('count_items', []).append(
-                {'filename': fname, 'type': ftype, 'count': count}
+                {'filename': fname, 'type': ftype, 'count': count, 'tels': tels}
             )
             context.user_data['last_upload_time'] = time.time()
 
@@ -108,16 +105,19 @@ class CountFilesHandler:
             # Bangun ringkasan
             total_txt = sum(i['count'] for i in items if i['type'] == 'txt')
             total_vcf = sum(i['count'] for i in items if i['type'] == 'vcf')
+            total_vcf_tel = sum(i.get('tels', 0) for i in items if i['type'] == 'vcf')
             total_all = total_txt + total_vcf
 
             lines = ["📊 *RINGKASAN COUNT*", "━━━━━━━━━━━━━━━━━━━━━━━"]
             for it in items:
-                unit = "nomor" if it['type'] == 'txt' else "kontak"
-                lines.append(f"• `{it['filename']}` — {it['count']} {unit}")
+                if it['type'] == 'txt':
+                    lines.append(f"• `{it['filename']}` — {it['count']} nomor")
+                else:
+                    lines.append(f"• `{it['filename']}` — {it['count']} kontak · {it.get('tels', 0)} nomor")
             lines.extend([
                 "━━━━━━━━━━━━━━━━━━━━━━━",
                 f"TXT total: *{total_txt}* nomor",
-                f"VCF total: *{total_vcf}* kontak",
+                f"VCF total: *{total_vcf}* kontak · *{total_vcf_tel}* nomor",
                 f"📊 TOTAL semua: *{total_all}*",
                 "━━━━━━━━━━━━━━━━━━━━━━━",
                 "Gunakan /start untuk memulai baru."
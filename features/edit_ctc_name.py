@@ -2,12 +2,22 @@
 import asyncio
 import io
 import time
-from telegram import InputFile
+from telegram import InputFile, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import BadRequest
 from config import UPLOAD_TIMEOUT, SLEEP_BETWEEN_FILES
 
 SESSION_BUCKET = "edit_ctc_sessions"  # simpan sesi per-pesan di chat_data
 
+CB_NUM_FILE = "editctc_num_file"
+CB_NUM_GLOBAL = "editctc_num_global"
+
+
+def _numbering_kb() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("🔢 Per File", callback_data=CB_NUM_FILE),
+        InlineKeyboardButton("🌐 Global", callback_data=CB_NUM_GLOBAL),
+    ]])
+
 
 class EditCtcNameHandler:
     """
@@ -17,64 +27,67 @@ class EditCtcNameHandler:
       2) handle_document -> simpan file; tampilkan "Ringkasan Upload" yang live
       3) Idle UPLOAD_TIMEOUT -> pesan ringkasan di-edit jadi 'Selesai', lalu
          bot KIRIM PESAN BARU minta *nama kontak dasar*
-      4) handle_text -> ubah FN: setiap vcard & kirim ulang file dg nama asli,
-         lalu kirim ringkasan.
+         (tombol Per File / Global memilih mode penomoran)
+      4) handle_text -> ubah FN: setiap vcard (rewriter streaming, semua file diproses
+         bersamaan di worker) & kirim ulang file dg nama asli, lalu kirim ringkasan.
     """
 
     # ========= Helpers VCF =========
     @staticmethod
-    def _parse_blocks(content: str):
-        blocks, cur = [], []
-        for line in (content or "").splitlines():
-            up = line.strip().upper()
+    def _count_cards(content: str) -> int:
+        """
+        Jumlah kartu yang akan dinomori _rename_stream (aturan baris yang sama):
+        baris BEGIN:VCARD membuka kartu, END:VCARD menutup kartu yang terbuka.
+        Teks BEGIN:VCARD di dalam field / kartu tanpa END:VCARD tidak dihitung.
+        """
+        n, open_card = 0, False
+        for ln in io.StringIO(content or ""):
+            up = ln.strip().upper()
             if up == "BEGIN:VCARD":
-                cur = [line]
-            elif up == "END:VCARD":
-                cur.append(line)
-                blocks.append(cur[:])
-                cur = []
-            elif cur:
-                cur.append(line)
-        return blocks
+                open_card = True
+            elif up == "END:VCARD" and open_card:
+                n += 1
+                open_card = False
+        return n
 
     @staticmethod
-    def _rename_blocks(blocks, base_name: str):
+    def _rename_stream(content: str, base_name: str, start: int = 1):
         """
+        Rewriter 1x pass: baca per baris (io.StringIO), tahan hanya kartu yang sedang
+        dibaca, kartu selesai langsung ditulis ke buffer bytes.
         Ganti/selipkan FN: <base_name> <i>
         - Jika FN: ada → ganti pertama saja
         - Jika FN: tidak ada → selipkan setelah VERSION:
+        Return (output_bytes, index_berikutnya).
         """
-        out, i = [], 1
-        for b in blocks:
-            nb, replaced = [], False
-            for ln in b:
-                up = ln.upper()
-                if up.startswith("FN:") and not replaced:
-                    nb.append(f"FN:{base_name} {i}")
-                    replaced = True
-                else:
-                    nb.append(ln)
-            if not replaced:
-                nb2, inserted = [], False
-                for ln in nb:
-                    nb2.append(ln)
-                    if not inserted and ln.upper().startswith("VERSION:"):
-                        nb2.append(f"FN:{base_name} {i}")
-                        inserted = True
-                nb = nb2
-            out.append(nb)
-            i += 1
-        return out
-
-    @staticmethod
-    def _dump(blocks):
-        out = []
-        for b in blocks:
-            out.extend(b)
-            if b and b[-1].strip().upper() != "END:VCARD":
-                out.append("END:VCARD")
-            out.append("")  # pemisah antar vcard
-        return "\n".join(out).strip() + "\n"
+        out = io.BytesIO()
+        cur, has_fn, i = None, False, start
+        for ln in io.StringIO(content or ""):
+            ln = ln.rstrip("\r\n")
+            up = ln.strip().upper()
+            if up == "BEGIN:VCARD":
+                cur, has_fn = [ln], False
+            elif cur is None:
+                continue
+            elif up == "END:VCARD":
+                if not has_fn:
+                    for pos, x in enumerate(cur):
+                        if x.upper().startswith("VERSION:"):
+                            cur.insert(pos + 1, f"FN:{base_name} {i}")
+                            break
+                cur.append(ln)
+                if out.tell():
+                    out.write(b"\n")  # baris kosong pemisah antar vcard
+                out.write("\n".join(cur).encode("utf-8"))
+                out.write(b"\n")
+                cur = None
+                i += 1
+            elif not has_fn and ln.upper().startswith("FN:"):
+                cur.append(f"FN:{base_name} {i}")
+                has_fn = True
+            else:
+                cur.append(ln)
+        return out.getvalue() or b"\n", i
 
     # ========= Builder Ringkasan =========
     def _build_status_line(self, final: bool) -> str:
@@ -141,14 +154,13 @@ class EditCtcNameHandler:
         context.user_data.clear()
         context.user_data.update({
             "waiting_for_edit_vcf_files": True,
-            # simpan juga bentuk dict utk ringkasan (filename, contacts)
-            "edit_files": [],          # [(filename, raw_text)]
             "edit_files_dict": [],     # [{"filename","text","contacts"}]
             "edit_last_ts": 0.0,
             "edit_preview_msg_id": None,
             "edit_chat_id": None,
             "edit_finalize_task": None,
             "waiting_for_edit_name": False,
+            "edit_numbering": "file",  # "file" = 1..N per file, "global" = lanjut lintas file
             "edit_session_msg_id": None,
         })
 
@@ -177,12 +189,10 @@ class EditCtcNameHandler:
             await update.message.reply_text(f"❌ Gagal membaca `{doc.file_name}`", parse_mode="Markdown")
             return
 
-        # hitung kontak = jumlah blok vcard
-        blocks = self._parse_blocks(raw)
-        contacts = len(blocks)
+        # hitung kontak = jumlah kartu yang nanti dinomori (offset mode Global)
+        contacts = await asyncio.to_thread(self._count_cards, raw)
 
         # simpan
-        context.user_data["edit_files"].append((doc.file_name, raw))
         context.user_data["edit_files_dict"].append({
             "filename": doc.file_name,
             "text": raw,
@@ -226,14 +236,35 @@ class EditCtcNameHandler:
         chat_id = context.user_data.get("edit_chat_id") or update.effective_chat.id
         await context.bot.send_message(
             chat_id=chat_id,
-            text="📝 *Ketik nama dasar kontak*.\n_Contoh: Admin, HHD, Kontak Baru_",
-            parse_mode="Markdown"
+            text=self._name_prompt_text(context),
+            parse_mode="Markdown",
+            reply_markup=_numbering_kb(),
         )
 
         task = context.user_data.pop("edit_finalize_task", None)
         if task and not task.done():
             task.cancel()
 
+    def _name_prompt_text(self, context) -> str:
+        mode = context.user_data.get("edit_numbering", "file")
+        label = "per file (1..N tiap file)" if mode == "file" else "global (lanjut lintas file)"
+        return (
+            "📝 *Ketik nama dasar kontak*.\n_Contoh: Admin, HHD, Kontak Baru_\n\n"
+            f"🔢 Penomoran: *{label}*"
+        )
+
+    async def handle_callback(self, query, context):
+        if not context.user_data.get("waiting_for_edit_name"):
+            return
+        context.user_data["edit_numbering"] = "global" if query.data == CB_NUM_GLOBAL else "file"
+        try:
+            await query.edit_message_text(
+                self._name_prompt_text(context), parse_mode="Markdown", reply_markup=_numbering_kb()
+            )
+        except BadRequest as e:
+            if "message is not modified" not in str(e).lower():
+                raise
+
     # ========= Text handler (apply name) =========
     async def handle_text(self, update, context):
         if not context.user_data.get("waiting_for_edit_name"):
@@ -250,14 +281,24 @@ class EditCtcNameHandler:
         session = sessions.get(msg_id, {})
         files_dict = session.get("files") or context.user_data.get("edit_files_dict", [])
 
-        ok_count, total_contacts = 0, sum(f["contacts"] for f in files_dict)
+        ok_count = 0
 
+        # index awal tiap file sudah diketahui dari jumlah kartu → semua file
+        # bisa diproses bersamaan di worker thread
+        global_mode = context.user_data.get("edit_numbering") == "global"
+        starts, running = [], 1
         for f in files_dict:
-            blocks = self._parse_blocks(f["text"])
-            renamed = self._rename_blocks(blocks, new_name)
-            out_txt = self._dump(renamed)
+            starts.append(running if global_mode else 1)
+            running += f["contacts"]
+
+        results = await asyncio.gather(*[
+            asyncio.to_thread(self._rename_stream, f["text"], new_name, st)
+            for f, st in zip(files_dict, starts)
+        ])
 
-            bio = io.BytesIO(out_txt.encode("utf-8"))
+        total_contacts = sum(nxt - st for (_, nxt), st in zip(results, starts))
+        for f, (out_data, _) in zip(files_dict, results):
+            bio = io.BytesIO(out_data)
             bio.name = f["filename"]  # nama file asli
             await update.message.reply_document(InputFile(bio))
             ok_count += 1
@@ -277,7 +318,7 @@ class EditCtcNameHandler:
         # bersihkan state + sesi
         for k in [
             "waiting_for_edit_vcf_files", "waiting_for_edit_name",
-            "edit_files", "edit_files_dict", "edit_preview_msg_id",
+            "edit_files_dict", "edit_preview_msg_id", "edit_numbering",
             "edit_chat_id", "edit_finalize_task", "edit_last_ts",
             "edit_session_msg_id",
         ]:
@@ -1,13 +1,156 @@
 # features/merge_files.py
-import io
+import os
 import time
+import logging
+import shutil
 import asyncio
-from telegram import InputFile
+import hashlib
+import tempfile
+import contextlib
+import re
+from telegram import InputFile, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import BadRequest
-from config import UPLOAD_TIMEOUT, SLEEP_BETWEEN_FILES
+from config import UPLOAD_TIMEOUT, MERGE_SPOOL_MAX, MERGE_VCF_DEDUP
+from utils import count_nonblank_lines, count_vcf_bytes, clean_name_for_vcf, iter_buffer_lines
+
+logger = logging.getLogger(__name__)
 
 SESSION_BUCKET = "merge_files_sessions"  # simpan sesi per pesan di chat_data
 
+# ukuran digest per baris untuk set dedup (cukup unik, hemat memori vs simpan teks baris)
+DIGEST_SIZE = 12
+
+# mode dedup VCF: "phone" = nomor saja, "name_phone" = nama + nomor
+DEDUP_PHONE = "phone"
+DEDUP_NAME_PHONE = "name_phone"
+_DEDUP_LABEL = {DEDUP_PHONE: "Nomor saja", DEDUP_NAME_PHONE: "Nama + Nomor"}
+
+# TEL / itemN.TEL dan FN di awal baris kartu (bytes)
+_TEL_LINE = re.compile(rb"^(?:[^:.]+\.)?TEL[^:]*:(.*)$", re.IGNORECASE)
+_FN_LINE = re.compile(rb"^FN[^:]*:(.*)$", re.IGNORECASE)
+_NON_DIGIT = re.compile(rb"\D+")
+
+
+# =========================
+# Parse per file (jalan di background selama jendela upload)
+# =========================
+def write_unique_lines(data, seen: set, out) -> int:
+    """
+    Tulis baris non-kosong yang digest-nya belum ada di `seen` ke `out` (file biner).
+    Baris dibaca per baris langsung dari bytes/mmap, tanpa decode/splitlines seluruh file.
+    Return jumlah baris yang ditulis.
+    """
+    n = 0
+    blake = hashlib.blake2b
+    for line in iter_buffer_lines(data):
+        line = line.rstrip(b"\r\n")
+        if not line.strip():
+            continue
+        d = blake(line, digest_size=DIGEST_SIZE).digest()
+        if d in seen:
+            continue
+        seen.add(d)
+        out.write(line)
+        out.write(b"\n")
+        n += 1
+    return n
+
+def _card_key(tels: list, name: bytes, mode: str) -> bytes:
+    """Kunci dedup kartu: digit TEL (urut, tanpa duplikat) [+ nama dinormalisasi]."""
+    key = b"|".join(sorted(set(tels)))
+    if mode == DEDUP_NAME_PHONE:
+        nm = clean_name_for_vcf(name.decode("utf-8", errors="ignore")).casefold()
+        key = nm.encode("utf-8") + b"\x00" + key
+    return hashlib.blake2b(key, digest_size=DIGEST_SIZE).digest()
+
+def write_unique_cards(data, seen: set, out, mode: str) -> dict:
+    """
+    Merge VCF per kartu (bukan per baris): 1x pass per baris, kartu BEGIN..END
+    ditulis apa adanya ke `out` (file biner) jika kunci TEL-nya (lihat _card_key) belum ada di `seen`.
+    Kartu tanpa TEL / tidak tertutup END dihitung invalid.
+    Return {"lines": kartu_ditulis, "cards", "dups", "invalid"}.
+    """
+    stats = {"lines": 0, "cards": 0, "dups": 0, "invalid": 0}
+    card = None
+    tels, name = [], b""
+    for line in iter_buffer_lines(data):
+        line = line.rstrip(b"\r\n")
+        bare = line.strip()
+        up = bare.upper()
+        if up == b"BEGIN:VCARD":
+            if card is not None:
+                stats["invalid"] += 1     # kartu sebelumnya tidak ditutup
+            card, tels, name = [line], [], b""
+            continue
+        if card is None:
+            continue
+        card.append(line)
+        if up == b"END:VCARD":
+            stats["cards"] += 1
+            if not tels:
+                stats["invalid"] += 1
+            else:
+                d = _card_key(tels, name, mode)
+                if d in seen:
+                    stats["dups"] += 1
+                else:
+                    seen.add(d)
+                    out.write(b"\n".join(card))
+                    out.write(b"\n")
+                    stats["lines"] += 1
+            card = None
+            continue
+        m = _TEL_LINE.match(bare)
+        if m:
+            digits = _NON_DIGIT.sub(b"", m.group(1))
+            if digits:
+                tels.append(digits)
+            continue
+        if not name:
+            m = _FN_LINE.match(bare)
+            if m:
+                name = m.group(1).strip()
+    if card is not None:
+        stats["invalid"] += 1
+    return stats
+
+def _write_artifact(data, seen: set, path: str, ftype: str, mode: str) -> dict:
+    """Artefak per file di disk: baris/kartu unik file ini saja."""
+    with open(path, "wb") as out:
+        if ftype == "vcf":
+            return write_unique_cards(data, seen, out, mode)
+        return {"lines": write_unique_lines(data, seen, out)}
+
+async def _ingest(prev, data: bytes, seen: set, path: str, ftype: str = "txt", mode: str = DEDUP_PHONE) -> dict:
+    """
+    Proses 1 file di worker thread segera setelah di-upload. Dedup lintas file
+    mengikuti urutan upload (tunggu job file sebelumnya selesai dulu).
+    Return {"path", "lines", ...stats VCF}.
+    """
+    if prev is not None:
+        try:
+            # shield: pembatalan job ini tidak ikut membatalkan job sebelumnya
+            await asyncio.shield(prev)
+        except asyncio.CancelledError:
+            # job sebelumnya dibatalkan (mis. session GC) → tetap lanjut;
+            # raise hanya kalau task ini sendiri yang sedang dibatalkan
+            cur = asyncio.current_task()
+            if not prev.cancelled() or (cur is not None and getattr(cur, "cancelling", lambda: 0)()):
+                raise
+        except Exception:
+            pass
+    stats = await asyncio.to_thread(_write_artifact, data, seen, path, ftype, mode)
+    return {"path": path, **stats}
+
+def _concat_to_spool(paths: list):
+    """Sambung artefak per file ke SpooledTemporaryFile (di RAM sampai MERGE_SPOOL_MAX, lalu disk)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=MERGE_SPOOL_MAX)
+    for p in paths:
+        with open(p, "rb") as src:
+            shutil.copyfileobj(src, spool)
+    spool.seek(0)
+    return spool
+
 
 class MergeFilesHandler:
     """
@@ -16,6 +159,8 @@ class MergeFilesHandler:
       status: sedang membaca -> selesai.
     - Setelah selesai, bot MENGIRIM PESAN BARU untuk meminta nama file output.
     - Data file disalin ke chat_data[SESSION_BUCKET][message_id] agar aman.
+    - Isi file tidak disimpan di sesi: tiap file langsung diproses ke artefak
+      di folder temp (baris unik), sesi hanya memegang nama/jumlah/job.
     """
 
     # =========================
@@ -28,7 +173,12 @@ class MergeFilesHandler:
             context.user_data.clear()
             context.user_data.update({
                 f"waiting_for_merge_{ftype}_files": True,
-                f"merge_{ftype}_files": [],            # list[{"filename","content","count"}]
+                f"merge_{ftype}_files": [],            # list[{"filename","count","job"}]
+                f"merge_{ftype}_seen": set(),          # digest baris yang sudah masuk (dedup lintas file)
+                # folder artefak; juga dipegang entri sesi chat_data (lihat _show_preview) →
+                # tetap ada walau user_data di-reset, terhapus saat merge selesai / sesi di-GC
+                f"merge_{ftype}_tmp": tempfile.TemporaryDirectory(prefix="merge_"),
+                f"merge_{ftype}_tail": None,           # job file terakhir (rantai urutan)
                 f"merge_{ftype}_last_ts": 0.0,
                 f"merge_{ftype}_finalize_task": None,
                 f"waiting_for_merge_{ftype}_filename": False,
@@ -40,11 +190,47 @@ class MergeFilesHandler:
                 # untuk handle input nama
                 f"merge_{ftype}_session_msg_id": None,
             })
+            if ftype == "vcf":
+                context.user_data["merge_vcf_dedup"] = MERGE_VCF_DEDUP
             await query.edit_message_text(
-                f"📂 Upload file *.{ftype}* yang ingin digabung.\n"
-                "Kamu bisa upload lebih dari satu.",
-                parse_mode="Markdown"
+                self._upload_prompt(ftype, context),
+                parse_mode="Markdown",
+                reply_markup=self._dedup_kb(context) if ftype == "vcf" else None,
+            )
+
+        elif query.data == "merge_vcf_dedup":
+            if context.user_data.get("merge_vcf_files"):
+                await query.message.reply_text("⚠️ Mode dedup terkunci setelah file pertama masuk.")
+                return
+            cur = context.user_data.get("merge_vcf_dedup", MERGE_VCF_DEDUP)
+            context.user_data["merge_vcf_dedup"] = DEDUP_NAME_PHONE if cur == DEDUP_PHONE else DEDUP_PHONE
+            with contextlib.suppress(BadRequest):
+                await query.edit_message_text(
+                    self._upload_prompt("vcf", context),
+                    parse_mode="Markdown",
+                    reply_markup=self._dedup_kb(context),
+                )
+
+    @staticmethod
+    def _upload_prompt(ftype: str, context) -> str:
+        text = (
+            f"📂 Upload file *.{ftype}* yang ingin digabung.\n"
+            "Kamu bisa upload lebih dari satu."
+        )
+        if ftype == "vcf":
+            mode = context.user_data.get("merge_vcf_dedup", MERGE_VCF_DEDUP)
+            text += (
+                "\n\n♻️ Kontak ganda dibuang per *kartu* berdasarkan nomor.\n"
+                f"Mode dedup: *{_DEDUP_LABEL.get(mode, mode)}* (ubah sebelum upload)."
             )
+        return text
+
+    @staticmethod
+    def _dedup_kb(context):
+        mode = context.user_data.get("merge_vcf_dedup", MERGE_VCF_DEDUP)
+        return InlineKeyboardMarkup([[InlineKeyboardButton(
+            f"♻️ Dedup: {_DEDUP_LABEL.get(mode, mode)}", callback_data="merge_vcf_dedup"
+        )]])
 
     # =========================
     # Terima file
@@ -65,21 +251,31 @@ class MergeFilesHandler:
 
         try:
             tg = await context.bot.get_file(doc.file_id)
-            data = await tg.download_as_bytearray()
-            content = data.decode("utf-8", errors="ignore")
+            data = bytes(await tg.download_as_bytearray())
         except Exception:
             await update.message.reply_text(f"❌ Gagal membaca `{doc.file_name}`", parse_mode="Markdown")
             return
 
-        # hitung jumlah baris non-kosong (netral untuk TXT/VCF)
-        count = self._count_lines(content)
+        # hitung langsung di bytes: baris non-kosong (TXT) / kartu (VCF)
+        count = count_vcf_bytes(data)[0] if ftype == "vcf" else count_nonblank_lines(data)
+
+        # parse + dedup mulai sekarang di background, tidak menunggu tombol/nama file
+        tail_key = f"merge_{ftype}_tail"
+        seen = context.user_data.setdefault(f"merge_{ftype}_seen", set())
+        tmp = context.user_data.get(f"merge_{ftype}_tmp")
+        if tmp is None:
+            tmp = context.user_data[f"merge_{ftype}_tmp"] = tempfile.TemporaryDirectory(prefix="merge_")
+        path = os.path.join(tmp.name, f"{len(context.user_data[f'merge_{ftype}_files']):05d}.part")
+        mode = context.user_data.get("merge_vcf_dedup", MERGE_VCF_DEDUP)
+        job = asyncio.create_task(_ingest(context.user_data.get(tail_key), data, seen, path, ftype, mode))
+        context.user_data[tail_key] = job
 
         files_key = f"merge_{ftype}_files"
         last_ts_key = f"merge_{ftype}_last_ts"
         context.user_data[files_key].append({
             "filename": doc.file_name,
-            "content": content,
-            "count": count
+            "count": count,
+            "job": job,
         })
         context.user_data[last_ts_key] = time.time()
 
@@ -105,14 +301,15 @@ class MergeFilesHandler:
         display_limit = 15
         display_files = files[-display_limit:] if file_count > display_limit else files
         start_idx = file_count - len(display_files) + 1
+        unit = "kontak" if ftype == "vcf" else "nomor"
         for idx, f in enumerate(display_files, start=start_idx):
-            body += f"{idx}. `{f['filename']}` — 🧾 {f['count']} nomor\n"
+            body += f"{idx}. `{f['filename']}` — 🧾 {f['count']} {unit}\n"
 
         # final TIDAK menambahkan instruksi; instruksi dikirim sebagai PESAN BARU
         status = f"{self._build_status_line(final)}\n\n"
 
         footer = "━━━━━━━━━━━━━━━━━━━━━━━\n" \
-                 f"🧮 *Total:* {file_count} file · {total_lines} nomor"
+                 f"🧮 *Total:* {file_count} file · {total_lines} {unit}"
 
         return header + body + status + footer
 
@@ -166,6 +363,8 @@ class MergeFilesHandler:
         bucket[msg_id] = {
             "ftype": ftype,
             "files": [dict(f) for f in files],  # shallow copy agar aman
+            # umur folder artefak ikut entri sesi ini, bukan hanya user_data
+            "tmp": context.user_data.get(f"merge_{ftype}_tmp"),
             "ts": time.time(),
         }
         # simpan msg_id untuk dipakai saat user mengetik nama file
@@ -239,29 +438,42 @@ class MergeFilesHandler:
             await update.message.reply_text("❌ Tidak ada file untuk digabung.")
             return
 
-        merged_lines = []
-        for f in files:
-            merged_lines.extend((f["content"] or "").splitlines())
-
-        # hapus duplikat tapi pertahankan urutan
-        merged_lines = list(dict.fromkeys(ln for ln in merged_lines))
-
-        out_txt = "\n".join(merged_lines)
-        bio = io.BytesIO(out_txt.encode("utf-8"))
-        bio.name = fname
-        await update.message.reply_document(InputFile(bio))
-
-        await update.message.reply_text(
-            "✅ *Merge selesai!*\n"
-            "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            f"📁 *File gabungan:* {fname}\n"
-            f"📄 *Total nomor unik:* {len(merged_lines)}\n"
-            "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            "Gunakan /start untuk kembali ke menu utama.",
-            parse_mode="Markdown"
-        )
+        try:
+            # artefak per file sudah disiapkan saat upload → tinggal disambung (streaming)
+            results = await asyncio.gather(*(f["job"] for f in files), return_exceptions=True)
+            failed = [r for r in results if isinstance(r, BaseException)]
+            if failed:
+                logger.warning(f"[Merge] {len(failed)} job file gagal/dibatalkan: {failed[0]!r}")
+                await update.message.reply_text(
+                    f"❌ {len(failed)} file gagal diproses. Ulangi merge dari /start."
+                )
+                return
+            parts = results
+            total_lines = sum(p["lines"] for p in parts)
+            try:
+                spool = await asyncio.to_thread(_concat_to_spool, [p["path"] for p in parts])
+            except OSError as e:
+                logger.warning(f"[Merge] artefak hilang: {e}")
+                await update.message.reply_text("❌ Data upload sudah kedaluwarsa. Ulangi merge dari /start.")
+                return
+            try:
+                # spool yang masih di RAM tidak punya .name (InputFile gagal) → kirim isinya;
+                # PTB toh membaca seluruh file saat upload
+                data = await asyncio.to_thread(spool.read)
+                await update.message.reply_document(InputFile(data, filename=fname))
+            finally:
+                spool.close()
+
+            await update.message.reply_text(
+                self._build_summary(fname, ftype, files, parts, total_lines, context),
+                parse_mode="Markdown"
+            )
+        finally:
+            self._clear_state(context, ftype, sessions, msg_id, session)
 
-        # clear state + sesi
+    @staticmethod
+    def _clear_state(context, ftype, sessions, msg_id, session):
+        """Bersihkan state + sesi dan hapus folder artefak (selesai atau gagal)."""
         for k in [
             f"merge_{ftype}_files",
             f"waiting_for_merge_{ftype}_filename",
@@ -271,15 +483,39 @@ class MergeFilesHandler:
             f"merge_{ftype}_last_ts",
             f"merge_{ftype}_preview_msg_id",
             f"merge_{ftype}_chat_id",
+            f"merge_{ftype}_seen",
+            f"merge_{ftype}_tail",
+            f"merge_{ftype}_dedup",
         ]:
             context.user_data.pop(k, None)
-        if msg_id in sessions:
-            sessions.pop(msg_id, None)
+        for tmp in (context.user_data.pop(f"merge_{ftype}_tmp", None), session.get("tmp")):
+            if tmp is not None:
+                with contextlib.suppress(Exception):
+                    tmp.cleanup()   # aman dipanggil 2x untuk objek yang sama
+        sessions.pop(msg_id, None)
 
-    # =========================
-    # Helpers
-    # =========================
     @staticmethod
-    def _count_lines(content: str) -> int:
-        """Jumlah baris non-kosong untuk ringkasan."""
-        return sum(1 for ln in (content or "").splitlines() if ln.strip())
+    def _build_summary(fname, ftype, files, parts, total, context) -> str:
+        lines = [
+            "✅ *Merge selesai!*",
+            "━━━━━━━━━━━━━━━━━━━━━━━",
+            f"📁 *File gabungan:* {fname}",
+        ]
+        if ftype != "vcf":
+            lines.append(f"📄 *Total nomor unik:* {total}")
+        else:
+            mode = context.user_data.get("merge_vcf_dedup", MERGE_VCF_DEDUP)
+            lines.append(f"👥 *Total kontak unik:* {total}")
+            lines.append(f"♻️ *Dedup:* {_DEDUP_LABEL.get(mode, mode)}")
+            lines.append("━━━━━━━━━━━━━━━━━━━━━━━")
+            display_limit = 20
+            for f, p in list(zip(files, parts))[:display_limit]:
+                extra = f" · ⚠️ {p['invalid']} invalid" if p.get("invalid") else ""
+                lines.append(f"• `{f['filename']}` — ✅ {p['lines']}/{p['cards']} · ♻️ {p['dups']}{extra}")
+            if len(files) > display_limit:
+                lines.append(f"_dan {len(files) - display_limit} file lain_")
+        lines.extend([
+            "━━━━━━━━━━━━━━━━━━━━━━━",
+            "Gunakan /start untuk kembali ke menu utama.",
+        ])
+        return "\n".join(lines)
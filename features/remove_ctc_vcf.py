@@ -1,57 +1,94 @@
 # features/remove_ctc_vcf.py
 from telegram import InputFile
-import io, re
+import io, re, time, asyncio
+from config import UPLOAD_TIMEOUT, SLEEP_BETWEEN_FILES
+from utils import build_zip
 
-def _digits(s:str)->str: return re.sub(r"\D+","",s or "")
+_NON_DIGIT = re.compile(r"\D+")
 
-def _parse_vcards(text:str):
-    blocks, block=[],[]
-    for ln in text.splitlines():
-        up=ln.strip().upper()
-        if up=="BEGIN:VCARD": block=[ln]
-        elif up=="END:VCARD":
-            block.append(ln); blocks.append(block[:]); block=[]
-        elif block: block.append(ln)
-    return blocks
-
-def _block_tels(block):
-    out=[]
-    for ln in block:
-        if ln.upper().startswith("TEL"):
-            part=ln.split(":",1)
-            if len(part)==2: out.append(part[1].strip())
+def _digits(s:str)->str: return _NON_DIGIT.sub("",s or "")
+
+def _parse_targets(raw:str)->set:
+    """Daftar nomor (1 baris = 1 nomor) → set digit, dibangun sekali per batch."""
+    out=set()
+    for s in (raw or "").splitlines():
+        d=_digits(s)
+        if d: out.add(d)
     return out
 
-def _dump(blocks):
-    out=[]
-    for b in blocks:
-        out.extend(b)
-        if b[-1].strip().upper()!="END:VCARD": out.append("END:VCARD")
-        out.append("")
-    return "\n".join(out).strip()+"\n"
+def _filter_vcf(text:str, targets:set):
+    """
+    1x pass per baris (io.StringIO, tanpa list semua baris): hanya kartu yang sedang
+    dibaca yang ditahan; kartu yang TEL-nya tidak ada di `targets` langsung ditulis
+    ke buffer output. Return (isi_baru_bytes, jumlah_kartu, dihapus).
+    """
+    out=io.BytesIO(); block=None; hit=False; total=0; removed=0
+    for ln in io.StringIO(text or ""):
+        ln=ln.rstrip("\r\n")
+        up=ln.strip().upper()
+        if up=="BEGIN:VCARD":
+            block=[ln]; hit=False
+        elif block is None:
+            continue
+        elif up=="END:VCARD":
+            block.append(ln); total+=1
+            if hit: removed+=1
+            else:
+                if out.tell(): out.write(b"\n")   # baris kosong pemisah antar kartu
+                out.write("\n".join(block).encode("utf-8")); out.write(b"\n")
+            block=None
+        else:
+            block.append(ln)
+            if not hit and ln[:3].upper()=="TEL":
+                part=ln.split(":",1)
+                if len(part)==2 and _digits(part[1]) in targets: hit=True
+    return out.getvalue() or b"\n", total, removed
+
+def _process_batch(files:list, targets:set, make_zip:bool):
+    """Jalan di worker thread. Return (results, zip_bytes|None)."""
+    results=[]
+    for f in files:
+        out,total,removed=_filter_vcf(f["text"],targets)
+        results.append({"fname":f["fname"],"data":out,
+                        "before":total,"removed":removed,"after":total-removed})
+    zbytes=build_zip([(r["fname"],r["data"]) for r in results]) if make_zip else None
+    return results, zbytes
 
 class RemoveCtcVcfHandler:
     """
     Flow:
-      1) start_mode → minta 1 VCF
-      2) handle_document (VCF) → simpan blocks, minta daftar nomor target (multi-baris)
-      3) handle_text → hapus kontak yang mengandung nomor target (dibandingkan pakai digit saja)
-      4) KIRIM FILE DULU (tanpa caption), LALU INFO/summary DI PESAN TERPISAH
+      1) start_mode → minta 1 atau beberapa VCF
+      2) handle_document (VCF) → simpan teks; setelah idle UPLOAD_TIMEOUT minta daftar nomor target
+      3) handle_text / handle_document (TXT) → hapus kontak yang mengandung nomor target
+         (dibandingkan pakai digit saja) di semua file, diproses di worker thread
+      4) KIRIM FILE DULU (tanpa caption; ZIP jika file banyak), LALU INFO/summary DI PESAN TERPISAH
     """
 
     async def start_mode(self, query, context):
         context.user_data.clear()
         context.user_data.update({
             "waiting_for_remove_vcf_file": True,
-            "rem": {}
+            "rem": {"files":[]},
+            "rem_last_ts": 0.0,
+            "rem_finalize_task": None,
         })
         await query.edit_message_text(
-            "📎 Upload *1 file VCF* untuk dihapus kontaknya.\n"
-            "Lalu kirim *daftar nomor* (1 baris = 1 nomor).",
+            "📎 Upload *1 atau beberapa file VCF* untuk dihapus kontaknya.\n"
+            "Lalu kirim *daftar nomor* (1 baris = 1 nomor) atau file *.txt*.",
             parse_mode="Markdown"
         )
 
     async def handle_document(self, update, context):
+        # daftar nomor target dalam bentuk file .txt
+        if context.user_data.get("waiting_for_phone_to_remove"):
+            doc = update.message.document
+            if not doc or not doc.file_name.lower().endswith(".txt"):
+                await update.message.reply_text("❌ Kirim daftar nomor sebagai teks atau file .txt"); return
+            tg_file = await context.bot.get_file(doc.file_id)
+            data = await tg_file.download_as_bytearray()
+            await self._apply(update, context, data.decode("utf-8", errors="ignore"))
+            return
+
         if not context.user_data.get("waiting_for_remove_vcf_file"):
             return
         doc = update.message.document
@@ -61,14 +98,38 @@ class RemoveCtcVcfHandler:
         tg_file = await context.bot.get_file(doc.file_id)
         data = await tg_file.download_as_bytearray()
         text = data.decode("utf-8", errors="ignore")
-        blocks = _parse_vcards(text)
 
-        context.user_data["rem"] = {"blocks":blocks,"before":len(blocks),"fname":doc.file_name}
+        context.user_data["rem"]["files"].append({"fname":doc.file_name,"text":text})
+        context.user_data["rem_last_ts"] = time.time()
+        self._schedule_finalize(update, context)
+
+    def _schedule_finalize(self, update, context):
+        old = context.user_data.get("rem_finalize_task")
+        if old and not old.done():
+            old.cancel()
+
+        async def waiter():
+            try:
+                await asyncio.sleep(UPLOAD_TIMEOUT)
+                last = context.user_data.get("rem_last_ts", 0.0)
+                if time.time() - last >= UPLOAD_TIMEOUT - 0.05:
+                    await self._ask_targets(update, context)
+            except asyncio.CancelledError:
+                pass
+
+        context.user_data["rem_finalize_task"] = asyncio.create_task(waiter())
+
+    async def _ask_targets(self, update, context):
+        files = context.user_data.get("rem", {}).get("files", [])
+        if not files:
+            return
         context.user_data["waiting_for_remove_vcf_file"] = False
         context.user_data["waiting_for_phone_to_remove"] = True
+        context.user_data.pop("rem_finalize_task", None)
 
         await update.message.reply_text(
-            "✍️ Kirim *nomor telepon* yang ingin dihapus (multi-baris).\n"
+            f"📁 *{len(files)} file VCF* diterima.\n"
+            "✍️ Kirim *nomor telepon* yang ingin dihapus (multi-baris) atau file *.txt*.\n"
             "Perbandingan memakai *angka saja* (spasi/simbol diabaikan).",
             parse_mode="Markdown"
         )
@@ -76,40 +137,60 @@ class RemoveCtcVcfHandler:
     async def handle_text(self, update, context):
         if not context.user_data.get("waiting_for_phone_to_remove"):
             return
-        raw = update.message.text or ""
-        targets = [_digits(s.strip()) for s in raw.splitlines() if _digits(s.strip())]
-        if not targets:
-            await update.message.reply_text("❌ Tidak ada nomor valid. Kirim lagi."); return
+        await self._apply(update, context, update.message.text or "")
 
-        data = context.user_data["rem"]
-        blocks = data["blocks"]
-        target = set(targets)
-        kept=[]; removed=0
-        for b in blocks:
-            tels = [_digits(t) for t in _block_tels(b)]
-            if any(t in target for t in tels): removed += 1
-            else: kept.append(b)
+    async def _apply(self, update, context, raw:str):
+        target = _parse_targets(raw)
+        if not target:
+            await update.message.reply_text("❌ Tidak ada nomor valid. Kirim lagi."); return
 
-        out = _dump(kept)
-        before = data["before"]; after = len(kept)
-        out_name = data["fname"]
+        files = context.user_data.get("rem", {}).get("files", [])
+        if not files:
+            await update.message.reply_text("❌ Tidak ada file VCF. Gunakan /start."); return
+        context.user_data["waiting_for_phone_to_remove"] = False
 
-        bio=io.BytesIO(out.encode("utf-8")); bio.name=out_name
+        make_zip = len(files) > 1   # sama dengan ADD CTC: >1 file → 1 ZIP
+        results, zbytes = await asyncio.to_thread(_process_batch, files, target, make_zip)
 
         # 1) Kirim FILE terlebih dahulu (TANPA caption)
-        await update.message.reply_document(InputFile(bio))
+        if zbytes is not None:
+            bio=io.BytesIO(zbytes); bio.name="remove_ctc.zip"
+            await update.message.reply_document(InputFile(bio))
+        else:
+            for r in results:
+                bio=io.BytesIO(r["data"]); bio.name=r["fname"]
+                await update.message.reply_document(InputFile(bio))
+                if len(results) > 1:
+                    await asyncio.sleep(SLEEP_BETWEEN_FILES)
 
         # 2) Kirim INFO/summary sebagai pesan teks terpisah
-        info = (
-            "🗑️ *REMOVE CTC VCF selesai*\n"
-            "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            f"📄 *File:* `{out_name}`\n"
-            f"👥 *Sebelum:* **{before}** kontak\n"
-            f"➖ *Dihapus:* **{removed}** kontak\n"
-            f"👤 *Sesudah:* **{after}** kontak\n"
-            "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            "Ketik */start* untuk kembali ke menu utama."
-        )
+        if len(results) == 1:
+            r = results[0]
+            info = (
+                "🗑️ *REMOVE CTC VCF selesai*\n"
+                "━━━━━━━━━━━━━━━━━━━━━━━\n"
+                f"📄 *File:* `{r['fname']}`\n"
+                f"👥 *Sebelum:* **{r['before']}** kontak\n"
+                f"➖ *Dihapus:* **{r['removed']}** kontak\n"
+                f"👤 *Sesudah:* **{r['after']}** kontak\n"
+                "━━━━━━━━━━━━━━━━━━━━━━━\n"
+                "Ketik */start* untuk kembali ke menu utama."
+            )
+        else:
+            lines = ["🗑️ *REMOVE CTC VCF selesai*", "━━━━━━━━━━━━━━━━━━━━━━━"]
+            display_limit = 30
+            for r in results[:display_limit]:
+                lines.append(f"• `{r['fname']}` — ➖ {r['removed']} · 👤 {r['after']}/{r['before']}")
+            if len(results) > display_limit:
+                lines.append(f"_dan {len(results) - display_limit} file lain_")
+            lines.extend([
+                "━━━━━━━━━━━━━━━━━━━━━━━",
+                f"📁 *File:* {len(results)} · 🎯 *Target:* {len(target)} nomor",
+                f"➖ *Total dihapus:* **{sum(r['removed'] for r in results)}** kontak",
+                "━━━━━━━━━━━━━━━━━━━━━━━",
+                "Ketik */start* untuk kembali ke menu utama.",
+            ])
+            info = "\n".join(lines)
         await update.message.reply_text(info, parse_mode="Markdown")
 
         context.user_data.clear()
@@ -1,34 +1,167 @@
 # features/split_files.py
-import io
 import time
 import asyncio
 import math
 import re
-from telegram import InputFile, InlineKeyboardButton, InlineKeyboardMarkup
-from config import UPLOAD_TIMEOUT, SLEEP_BETWEEN_FILES
-from utils import read_file_content, clean_phone_number, normalize_phone
+from array import array
+from bisect import bisect_right
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from config import UPLOAD_TIMEOUT
+from output_pipeline import run_output_pipeline, reply_document_sender, format_failures
+
+# mode split
+SPLIT_BY_COUNT = "count"   # jumlah file output
+SPLIT_BY_SIZE = "size"     # jumlah kontak/baris per file
+SPLIT_BY_BYTES = "bytes"   # ukuran maks per file (KB)
+
+_MODE_PROMPT = {
+    SPLIT_BY_COUNT: "🧮 Masukkan *jumlah file* untuk split:",
+    SPLIT_BY_SIZE: "👥 Masukkan *jumlah kontak/baris per file*:",
+    SPLIT_BY_BYTES: "💾 Masukkan *ukuran maks per file* (KB):",
+}
+
+
+# =========================
+# Engine: offset index + slice (tanpa rebuild isi)
+# =========================
+def index_units(data: bytes, ftype: str) -> array:
+    """
+    Offset awal tiap unit (baris non-kosong untuk TXT, kartu BEGIN:VCARD untuk VCF)
+    + sentinel len(data) di akhir. Unit k = data[off[k]:off[k+1]].
+    """
+    if hasattr(data, "readline"):
+        return _index_lines(data, ftype)
+    offs = array("q")
+    n = len(data)
+    if ftype == "vcf":
+        up = data.upper()
+        pos = up.find(b"BEGIN:VCARD")
+        while pos != -1:
+            line_start = up.rfind(b"\n", 0, pos) + 1
+            if not up[line_start:pos].strip():
+                offs.append(line_start)
+            pos = up.find(b"BEGIN:VCARD", pos + 11)
+    else:
+        pos = 0
+        while pos < n:
+            nl = data.find(b"\n", pos)
+            end = n if nl == -1 else nl
+            if data[pos:end].strip():
+                offs.append(pos)
+            pos = end + 1
+    offs.append(n)
+    return offs
+
+def _index_lines(buf, ftype: str) -> array:
+    """index_units untuk mmap: 1x iterasi baris (tanpa salinan .upper() seluruh file)."""
+    offs = array("q")
+    pos = 0
+    buf.seek(0)
+    for line in iter(buf.readline, b""):
+        bare = line.strip()
+        if (bare[:11].upper() == b"BEGIN:VCARD") if ftype == "vcf" else bare:
+            offs.append(pos)
+        pos += len(line)
+    offs.append(pos)
+    return offs
+
+def plan_parts(sizes: array, mode: str, value: int) -> list:
+    """
+    Tentukan batas part dalam index unit global.
+    sizes = kumulatif byte per unit (len = total_unit + 1).
+    Return [(awal, akhir), ...] (akhir eksklusif).
+    """
+    total = len(sizes) - 1
+    if total <= 0 or value <= 0:
+        return []
+    if mode == SPLIT_BY_COUNT:
+        per = math.ceil(total / value)
+        return [(a, min(a + per, total)) for a in range(0, total, per)]
+    if mode == SPLIT_BY_SIZE:
+        return [(a, min(a + value, total)) for a in range(0, total, value)]
+
+    # SPLIT_BY_BYTES: ambil unit sebanyak mungkin selama ≤ value byte (min 1 unit)
+    parts, a = [], 0
+    while a < total:
+        b = bisect_right(sizes, sizes[a] + value) - 1
+        b = min(max(b, a + 1), total)
+        parts.append((a, b))
+        a = b
+    return parts
+
+class SplitIndex:
+    """Index unit lintas beberapa file (urut upload) → part = list memoryview slice."""
+
+    def __init__(self, files: list):
+        self.files = files                 # [{"data": bytes, "offs": array}]
+        self.file_start = [0]              # index unit global awal tiap file
+        self.cum = array("q", [0])         # kumulatif byte per unit global
+        for f in files:
+            offs = f["offs"]
+            for k in range(len(offs) - 1):
+                self.cum.append(self.cum[-1] + offs[k + 1] - offs[k])
+            self.file_start.append(self.file_start[-1] + len(offs) - 1)
+
+    @property
+    def total(self) -> int:
+        return len(self.cum) - 1
+
+    def segments(self, a: int, b: int) -> list:
+        """Slice memoryview (zero-copy) untuk unit global [a, b)."""
+        segs = []
+        for fi, f in enumerate(self.files):
+            fs, fe = self.file_start[fi], self.file_start[fi + 1]
+            lo, hi = max(a, fs), min(b, fe)
+            if lo >= hi:
+                continue
+            offs = f["offs"]
+            segs.append(memoryview(f["data"])[offs[lo - fs]:offs[hi - fs]])
+        return segs
+
+def split_output_name(i: int, ftype: str, fname: str, base_name: str | None = None) -> str:
+    """Nama part ke-i (0-based): `{fname}_{i+1}` atau pola nama dasar berakhiran angka."""
+    if base_name:
+        m = re.search(r'(.+?)(\d+)$', base_name)
+        if m:
+            return f"{m.group(1)}{int(m.group(2)) + i}.{ftype}"
+        return f"{base_name}{i+1}.{ftype}"
+    return f"{fname}_{i+1}.{ftype}"
+
+def join_segments(segs: list) -> bytes:
+    """Gabung slice jadi 1 buffer upload; pastikan tiap slice diakhiri newline."""
+    out = []
+    for s in segs:
+        out.append(s)
+        if len(s) and s[-1:] != b"\n":
+            out.append(b"\n")
+    return b"".join(out)
+
 
 class SplitFilesHandler:
     """
     SPLIT TXT/VCF
+    - Upload 1 atau beberapa file (jenis sama) → index offset unit sekali.
+    - Pilih mode: jumlah file / kontak per file / ukuran per file.
+    - Isi tiap part = potongan byte asli (vCard dipertahankan apa adanya).
     """
 
     async def start_mode(self, query, context):
         context.user_data.clear()
         context.user_data.update({
             "waiting_for_split_files": True,
-            "split_files": [],  
+            "split_files": [],          # [{"filename","type","data","offs"}]
             "split_last_ts": 0.0,
             "split_finalize_task": None,
             "waiting_for_split_count": False,
             "waiting_for_split_name": False,
-            "split_target_count": 0,
+            "split_mode": SPLIT_BY_COUNT,
+            "split_value": 0,
             "split_preview_msg": None,
         })
         await query.edit_message_text(
             "✂️ *SPLIT TXT/VCF*\n"
             "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            "📂 Upload 1 file *.txt* atau *.vcf*.",
+            "📂 Upload 1 atau beberapa file *.txt* atau *.vcf* (jenis sama).",
             parse_mode="Markdown"
         )
 
@@ -43,45 +176,50 @@ class SplitFilesHandler:
             await update.message.reply_text("❌ Hanya menerima file .txt atau .vcf")
             return
 
+        ftype = "txt" if fname.endswith(".txt") else "vcf"
+        files = context.user_data.setdefault("split_files", [])
+        if files and files[0]["type"] != ftype:
+            await update.message.reply_text(f"❌ Semua file harus .{files[0]['type']}")
+            return
+
         tg_file = await context.bot.get_file(doc.file_id)
-        data = await tg_file.download_as_bytearray()
-        text = read_file_content(data)
-        if not text:
+        data = bytes(await tg_file.download_as_bytearray())
+        if not data.strip():
             await update.message.reply_text("❌ Tidak bisa membaca file.")
             return
 
-        if fname.endswith(".txt"):
-            items = [ln.strip() for ln in text.splitlines() if ln.strip()]
-            ftype = "txt"
-        else:
-            items = []
-            vcards = re.findall(r'BEGIN:VCARD.*?END:VCARD', text, re.DOTALL | re.IGNORECASE)
-            for v in vcards:
-                for m in re.findall(r'TEL[^:]*:([^\r\n]+)', v, re.IGNORECASE):
-                    cleaned = clean_phone_number(m)
-                    if cleaned:
-                        items.append(normalize_phone(cleaned))
-            ftype = "vcf"
-
-        context.user_data["split_files"] = [{
+        offs = await asyncio.to_thread(index_units, data, ftype)
+        files.append({
             "filename": doc.file_name,
             "type": ftype,
-            "items": items,
-        }]
+            "data": data,
+            "offs": offs,
+        })
         context.user_data["split_last_ts"] = time.time()
 
         await self._show_preview(update, context, final=False)
         self._schedule_finalize(update, context)
 
+    @staticmethod
+    def _total(files) -> int:
+        return sum(len(f["offs"]) - 1 for f in files)
+
+    @staticmethod
+    def _unit(files) -> str:
+        return "kontak" if files and files[0]["type"] == "vcf" else "nomor"
+
     def _build_preview_text(self, files, final: bool) -> str:
-        total = sum(len(f["items"]) for f in files)
-        fname = files[0]["filename"] if files else "-"
+        total = self._total(files)
+        if len(files) == 1:
+            file_line = f"📂 File: `{files[0]['filename']}`\n"
+        else:
+            file_line = f"📂 File: {len(files)} file\n"
         status = "✅ *Selesai membaca file.*" if final else "🔄 *Sedang membaca file…*"
         return (
             "📤 *Ringkasan Upload*\n"
             "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            f"📂 File: `{fname}`\n"
-            f"📄 Total: {total} nomor\n\n"
+            f"{file_line}"
+            f"📄 Total: {total} {self._unit(files)}\n\n"
             f"{status}"
         )
 
@@ -108,10 +246,13 @@ class SplitFilesHandler:
             old.cancel()
 
         async def waiter():
-            await asyncio.sleep(UPLOAD_TIMEOUT)
-            last = context.user_data.get("split_last_ts", 0.0)
-            if time.time() - last >= UPLOAD_TIMEOUT - 0.05:
-                await self._finalize(update, context)
+            try:
+                await asyncio.sleep(UPLOAD_TIMEOUT)
+                last = context.user_data.get("split_last_ts", 0.0)
+                if time.time() - last >= UPLOAD_TIMEOUT - 0.05:
+                    await self._finalize(update, context)
+            except asyncio.CancelledError:
+                pass
 
         context.user_data["split_finalize_task"] = asyncio.create_task(waiter())
 
@@ -120,15 +261,20 @@ class SplitFilesHandler:
         if not files:
             return
         context.user_data["waiting_for_split_files"] = False
-        context.user_data["waiting_for_split_count"] = True
 
         await self._show_preview(update, context, final=True)
 
-        total = sum(len(f["items"]) for f in files)
+        total = self._total(files)
+        kb = InlineKeyboardMarkup([
+            [InlineKeyboardButton("📁 Jumlah File", callback_data="split_by_count"),
+             InlineKeyboardButton("👥 Per File", callback_data="split_by_size")],
+            [InlineKeyboardButton("💾 Ukuran (KB)", callback_data="split_by_bytes")],
+        ])
         await update.message.reply_text(
-            f"🧮 Masukkan jumlah file untuk split:\n"
-            f"📄 Total nomor: {total}",
-            parse_mode="Markdown"
+            f"✂️ Pilih cara split:\n"
+            f"📄 Total {self._unit(files)}: {total}",
+            parse_mode="Markdown",
+            reply_markup=kb
         )
 
     async def handle_text_input(self, update, context):
@@ -141,18 +287,26 @@ class SplitFilesHandler:
             except Exception:
                 await update.message.reply_text("❌ Masukkan angka valid (>0).")
                 return
-            context.user_data["split_target_count"] = n
+            mode = context.user_data.get("split_mode", SPLIT_BY_COUNT)
+            value = n * 1024 if mode == SPLIT_BY_BYTES else n
+            context.user_data["split_value"] = value
             context.user_data["waiting_for_split_count"] = False
 
-            total = sum(len(f["items"]) for f in context.user_data["split_files"])
-            perfile = math.ceil(total / n)
+            files = context.user_data["split_files"]
+            idx = SplitIndex(files)
+            parts = plan_parts(idx.cum, mode, value)
+            context.user_data["split_index"] = idx
+            context.user_data["split_parts"] = parts
+
+            unit = self._unit(files)
+            perfile = math.ceil(idx.total / max(len(parts), 1))
             kb = InlineKeyboardMarkup([[
                 InlineKeyboardButton("📝 Custom Name", callback_data="split_custom"),
                 InlineKeyboardButton("✅ Selesai", callback_data="split_done")
             ]])
             await update.message.reply_text(
-                f"✅ Siap split {total} nomor menjadi {n} file\n"
-                f"≈ {perfile} nomor per file.\n\n"
+                f"✅ Siap split {idx.total} {unit} menjadi {len(parts)} file\n"
+                f"≈ {perfile} {unit} per file.\n\n"
                 "Pilih opsi:",
                 parse_mode="Markdown",
                 reply_markup=kb
@@ -168,7 +322,12 @@ class SplitFilesHandler:
             return
 
     async def handle_callback(self, query, context):
-        if query.data == "split_done":
+        if query.data in ("split_by_count", "split_by_size", "split_by_bytes"):
+            mode = query.data[len("split_by_"):]
+            context.user_data["split_mode"] = mode
+            context.user_data["waiting_for_split_count"] = True
+            await query.edit_message_text(_MODE_PROMPT[mode], parse_mode="Markdown")
+        elif query.data == "split_done":
             await self._do_split(query, context, base_name=None)
         elif query.data == "split_custom":
             context.user_data["waiting_for_split_name"] = True
@@ -180,63 +339,35 @@ class SplitFilesHandler:
 
     async def _do_split(self, target, context, base_name: str | None):
         files = context.user_data.get("split_files", [])
-        if not files:
-            return
-        n = context.user_data.get("split_target_count", 0)
-        if n <= 0:
+        idx = context.user_data.get("split_index")
+        parts = context.user_data.get("split_parts") or []
+        if not files or not idx or not parts:
             return
 
-        items = files[0]["items"]
         ftype = files[0]["type"]
         fname = files[0]["filename"].rsplit(".", 1)[0]
+        n = len(parts)
 
-        batch_size = math.ceil(len(items) / n)
-        sent_files = 0
-        total_out = 0
         start_time = time.time()
+        msg_target = target.message if hasattr(target, "message") else target
+        progress_msg = await msg_target.reply_text("🔄 Memproses split…")
 
-        progress_msg = await (target.message.reply_text("🔄 Memproses split…") if hasattr(target, "message") else target.reply_text("🔄 Memproses split…"))
-
-        for i in range(n):
-            part = items[i*batch_size:(i+1)*batch_size]
-            if not part:
-                continue
+        def render(job):
+            i, (a, b) = job
+            # isi file = potongan byte asli
+            return split_output_name(i, ftype, fname, base_name), join_segments(idx.segments(a, b)), b - a
 
-            # nama file
-            if base_name:  
-                m = re.search(r'(.+?)(\d+)$', base_name)
-                if m:
-                    prefix, startnum = m.group(1), int(m.group(2))
-                    outname = f"{prefix}{startnum + i}.{ftype}"
-                else:
-                    outname = f"{base_name}{i+1}.{ftype}"
-            else:
-                outname = f"{fname}_{i+1}.{ftype}"
-
-            # isi file
-            if ftype == "txt":
-                content = "\n".join(part)
-            else:
-                content = ""
-                for ph in part:
-                    total_out += 1
-                    content += (
-                        "BEGIN:VCARD\nVERSION:3.0\n"
-                        f"FN:Kontak {total_out}\nTEL:{ph}\nEND:VCARD\n"
-                    )
-
-            bio = io.BytesIO(content.encode("utf-8"))
-            bio.name = outname
-            msg_target = target.message if hasattr(target, "message") else target
-            await msg_target.reply_document(InputFile(bio))
-            sent_files += 1
-
-            pct = int((sent_files / n) * 100)
+        async def on_progress(done):
+            pct = int((done / n) * 100)
             try:
-                await progress_msg.edit_text(f"📤 Output {sent_files}/{n} file ({pct}%)…")
+                await progress_msg.edit_text(f"📤 Output {done}/{n} file ({pct}%)…")
             except Exception:
                 pass
-            await asyncio.sleep(SLEEP_BETWEEN_FILES)
+
+        report = await run_output_pipeline(
+            enumerate(parts), render, reply_document_sender(msg_target), on_progress=on_progress
+        )
+        sent_files = len(report["sent"])
 
         dur = time.time() - start_time
         # tutup progress
@@ -246,16 +377,16 @@ class SplitFilesHandler:
             pass
 
         # kirim ringkasan baru
-        summary = (
-            "📊 *Ringkasan SPLIT*\n"
-            "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            f"📂 File berhasil: {sent_files}\n"
-            f"📄 Total nomor: {len(items)}\n"
-            f"⏱ Waktu proses: {dur:.2f} detik\n"
-            "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            "Gunakan /start untuk kembali ke menu utama."
-        )
-        msg_target = target.message if hasattr(target, "message") else target
+        summary = "\n".join([
+            "📊 *Ringkasan SPLIT*",
+            "━━━━━━━━━━━━━━━━━━━━━━━",
+            f"📂 File berhasil: {sent_files}",
+            f"📄 Total {self._unit(files)}: {idx.total}",
+            *format_failures(report["failed"]),
+            f"⏱ Waktu proses: {dur:.2f} detik",
+            "━━━━━━━━━━━━━━━━━━━━━━━",
+            "Gunakan /start untuk kembali ke menu utama.",
+        ])
         await msg_target.reply_text(summary, parse_mode="Markdown")
 
         context.user_data.clear()
@@ -2,7 +2,7 @@
 import logging
 import contextlib
 import asyncio
-from io import BytesIO
+from io import BytesIO, StringIO, TextIOWrapper
 from typing import Dict, List
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputFile
@@ -10,7 +10,7 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputFile
 from config import get_instruction, SLEEP_BETWEEN_FILES
 from utils import (
     # FORMAT
-    create_vcf_content,
+    build_vcf_from_format,
     # UTIL untuk INPUT
     extract_phone_numbers, clean_phone_number, normalize_phone,
     create_vcf_from_phones, clean_name_for_vcf
@@ -63,9 +63,11 @@ def _build_info_text(filename: str, contact_stats: Dict[str, int]) -> str:
     return "\n".join(lines)
 
 
-async def _send_vcf_then_info(update, filename: str, vcf_content: str, info_text: str):
+async def _send_vcf_then_info(update, filename: str, vcf_content, info_text: str):
     """Kirim FILE dulu (tanpa caption), lalu kirim keterangan terpisah."""
-    data = BytesIO(vcf_content.encode('utf-8'))
+    if isinstance(vcf_content, str):
+        vcf_content = vcf_content.encode('utf-8')
+    data = BytesIO(vcf_content)
     data.name = filename
     # 1) FILE tanpa caption
     await update.message.reply_document(
@@ -222,18 +224,7 @@ class TextToVCFHandler:
                     )
                     return
 
-                vcf_content, filename, contact_stats = create_vcf_content(text_input)
-                if not vcf_content or not filename or not contact_stats:
-                    await self._reply(update, self._format_error_help())
-                    context.user_data.clear()
-                    return
-
-                info_text = _build_info_text(filename, contact_stats)
-
-                # === Kirim FILE dulu, lalu INFO (tanpa caption) ===
-                await _send_vcf_then_info(update, filename, vcf_content, info_text)
-                await asyncio.sleep(SLEEP_BETWEEN_FILES)
-                context.user_data.clear()
+                await self._process_format(update, context, StringIO(text_input))
                 return
 
         except Exception as e:
@@ -245,6 +236,42 @@ class TextToVCFHandler:
                 )
             context.user_data.clear()
 
+    async def handle_document(self, update, context):
+        """MODE FORMAT lewat file .txt (isi sama seperti teks format)."""
+        try:
+            if not context.user_data.get('waiting_for_string'):
+                return
+            doc = update.message.document
+            if not doc or not (doc.file_name or "").lower().endswith('.txt'):
+                await update.message.reply_text("❌ Kirim format sebagai teks atau file .txt")
+                return
+
+            tg_file = await context.bot.get_file(doc.file_id)
+            data = await tg_file.download_as_bytearray()
+            stream = TextIOWrapper(BytesIO(bytes(data)), encoding='utf-8-sig', errors='ignore')
+            await self._process_format(update, context, stream)
+
+        except Exception as e:
+            logger.error(f"[TextToVCF] handle_document error: {e}")
+            with contextlib.suppress(Exception):
+                await self._reply(update, "❌ Gagal memproses file. Coba lagi.")
+            context.user_data.clear()
+
+    async def _process_format(self, update, context, stream):
+        """Parse format (streaming, di worker thread) → kirim FILE dulu, lalu INFO."""
+        vcf_content, filename, contact_stats = await asyncio.to_thread(build_vcf_from_format, stream)
+        if not vcf_content or not filename or not contact_stats:
+            await self._reply(update, self._format_error_help())
+            context.user_data.clear()
+            return
+
+        info_text = _build_info_text(filename, contact_stats)
+
+        # === Kirim FILE dulu, lalu INFO (tanpa caption) ===
+        await _send_vcf_then_info(update, filename, vcf_content, info_text)
+        await asyncio.sleep(SLEEP_BETWEEN_FILES)
+        context.user_data.clear()
+
     # =========================
     # INPUT — entry & choice
     # =========================
@@ -2,12 +2,14 @@ import asyncio
 import time
 import logging
 import contextlib
-from config import get_instruction, UPLOAD_TIMEOUT, MAX_FILES_V2, SLEEP_BETWEEN_FILES
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from config import get_instruction, UPLOAD_TIMEOUT, MAX_FILES_V2
 from utils import (
-    extract_phone_numbers, read_file_content, normalize_phone_list_format,
-    create_vcf_from_phones, send_vcf_file, generate_custom_filenames,
-    split_phones_into_batches
+    extract_phone_numbers, read_file_content, normalize_many,
+    create_vcf_from_phones, generate_custom_filenames,
+    iter_phone_batches
 )
+from output_pipeline import run_output_pipeline, reply_document_sender, format_failures
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +34,10 @@ class TxtToVCFHandler:
                 await self.setup_default_output(query, context)
             elif data == 'output_custom':
                 await self.setup_custom_output(query, context)
+            elif data == 'v1_dedup':
+                context.user_data['v1_dedup'] = not context.user_data.get('v1_dedup', False)
+                text, kb = self._build_files_preview(context, final=True)
+                await query.edit_message_text(text, reply_markup=kb, parse_mode='Markdown')
 
             # === V2: pilihan MODE setelah upload selesai ===
             elif data in ('v2_format', 'v2_input'):
@@ -200,13 +206,21 @@ class TxtToVCFHandler:
                     filename = f"{name_part}_{c}.{ext_part}"
                     c += 1
 
-                txt_files.append({
+                entry = {
                     'filename': filename,
                     'original_filename': original,
                     'phone_numbers': phone_numbers,
                     'file_size': document.file_size or 0,
                     'processed_at': time.time()
-                })
+                }
+                if cv_mode == 'v1':
+                    # dedup global antar file: set dibangun saat file masuk (tanpa pass kedua)
+                    seen = context.user_data.setdefault('v1_seen', set())
+                    normalized, _ = normalize_many(phone_numbers)
+                    unique = [p for p in normalized if not (p in seen or seen.add(p))]
+                    entry['phones_dedup'] = unique
+                    entry['dup_removed'] = len(normalized) - len(unique)
+                txt_files.append(entry)
 
                 context.user_data['chat_id'] = update.effective_chat.id
                 context.user_data['last_file_at'] = time.time()
@@ -237,50 +251,64 @@ class TxtToVCFHandler:
             return "✅ *Selesai membaca semua file.*"
         return "🔄 *Tunggu sebentar, bot sedang membaca file…*"
 
-    async def show_files_preview(self, update, context, final: bool = False):
-        try:
-            txt_files = context.user_data.get('txt_files_data', [])
-            cv_mode = context.user_data.get('cv_mode', 'v1')
-            if not txt_files:
-                return
+    def _build_files_preview(self, context, final: bool):
+        """Teks + keyboard ringkasan upload. Return (teks, keyboard|None)."""
+        txt_files = context.user_data.get('txt_files_data', [])
+        cv_mode = context.user_data.get('cv_mode', 'v1')
 
-            file_count = len(txt_files)
-            total_phones = sum(len(f['phone_numbers']) for f in txt_files)
+        file_count = len(txt_files)
+        total_phones = sum(len(f['phone_numbers']) for f in txt_files)
 
-            header = "📤 *Ringkasan Upload*\n━━━━━━━━━━━━━━━━━━━━━━━\n"
-            preview_text = header
-            preview_text += "📁 *Daftar File:*\n"
+        header = "📤 *Ringkasan Upload*\n━━━━━━━━━━━━━━━━━━━━━━━\n"
+        preview_text = header
+        preview_text += "📁 *Daftar File:*\n"
 
-            display_limit = 15
-            display_files = txt_files[-display_limit:] if file_count > display_limit else txt_files
-            start_idx = file_count - len(display_files) + 1
-            for idx, f in enumerate(display_files, start=start_idx):
-                preview_text += f"{idx}. `{f['filename']}` — 📞 {len(f['phone_numbers'])} nomor\n"
+        display_limit = 15
+        display_files = txt_files[-display_limit:] if file_count > display_limit else txt_files
+        start_idx = file_count - len(display_files) + 1
+        for idx, f in enumerate(display_files, start=start_idx):
+            preview_text += f"{idx}. `{f['filename']}` — 📞 {len(f['phone_numbers'])} nomor\n"
 
-            status_line = self._build_progress_line(cv_mode, file_count, final)
-            preview_text += f"{status_line}\n\n"
+        status_line = self._build_progress_line(cv_mode, file_count, final)
+        preview_text += f"{status_line}\n\n"
 
-            if not final:
-                pass
+        preview_text += "━━━━━━━━━━━━━━━━━━━━━━━\n"
+        preview_text += f"🧮 *Total:* {file_count} file · {total_phones} nomor"
 
-            preview_text += "━━━━━━━━━━━━━━━━━━━━━━━\n"
-            preview_text += f"🧮 *Total:* {file_count} file · {total_phones} nomor"
+        dedup_on = context.user_data.get('v1_dedup', False)
+        if cv_mode == 'v1':
+            dups = sum(f.get('dup_removed', 0) for f in txt_files)
+            if dups:
+                preview_text += f"\n♻️ *Duplikat antar file:* {dups} nomor"
+                if final:
+                    preview_text += " (dibuang)" if dedup_on else " (tetap)"
 
-            # === TOMBOL MUNCUL HANYA SAAT FINAL ===
-            keyboard = None
-            if final:
-                from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-                if cv_mode == 'v2':
-                    buttons = [[
-                        InlineKeyboardButton("📄 FORMAT", callback_data='v2_format'),
-                        InlineKeyboardButton("⌨️ INPUT",  callback_data='v2_input'),
-                    ]]
-                else:
-                    buttons = [[
-                        InlineKeyboardButton("🔹 Default", callback_data='output_default'),
-                        InlineKeyboardButton("🎨 Custom", callback_data='output_custom')
-                    ]]
-                keyboard = InlineKeyboardMarkup(buttons)
+        # === TOMBOL MUNCUL HANYA SAAT FINAL ===
+        keyboard = None
+        if final:
+            if cv_mode == 'v2':
+                buttons = [[
+                    InlineKeyboardButton("📄 FORMAT", callback_data='v2_format'),
+                    InlineKeyboardButton("⌨️ INPUT",  callback_data='v2_input'),
+                ]]
+            else:
+                buttons = [[
+                    InlineKeyboardButton("🔹 Default", callback_data='output_default'),
+                    InlineKeyboardButton("🎨 Custom", callback_data='output_custom')
+                ], [
+                    InlineKeyboardButton(
+                        f"♻️ Dedup antar file: {'ON' if dedup_on else 'OFF'}",
+                        callback_data='v1_dedup'
+                    )
+                ]]
+            keyboard = InlineKeyboardMarkup(buttons)
+        return preview_text, keyboard
+
+    async def show_files_preview(self, update, context, final: bool = False):
+        try:
+            if not context.user_data.get('txt_files_data'):
+                return
+            preview_text, keyboard = self._build_files_preview(context, final)
 
             key = 'preview_message'
             if key in context.user_data and context.user_data[key]:
@@ -377,8 +405,11 @@ class TxtToVCFHandler:
             if not txt_files:
                 await query.edit_message_text("❌ Tidak ada file yang diproses.")
                 return
-            context.user_data['merged_phones'] = txt_files[0]['phone_numbers']
-            await self._v2_next_step_after_prepare(query, context, len(txt_files[0]['phone_numbers']))
+            phones, stats = normalize_many(txt_files[0]['phone_numbers'])
+            if stats['invalid']:
+                logger.info(f"[V2] {stats['invalid']} baris tanpa digit dilewati")
+            context.user_data['merged_phones'] = phones
+            await self._v2_next_step_after_prepare(query, context, len(phones))
         except Exception as e:
             logger.error(f"Error in _v2_prepare_single: {e}")
 
@@ -388,18 +419,14 @@ class TxtToVCFHandler:
             context.user_data['waiting_for_txt_files'] = False
 
             txt_files = context.user_data.get('txt_files_data', [])
-            all_phones = []
-            for f in txt_files:
-                all_phones.extend(f['phone_numbers'])
-
-            # Normalisasi + dedup global
-            all_phones = normalize_phone_list_format(all_phones)
-            seen = set()
-            unique = []
-            for p in all_phones:
-                if p not in seen:
-                    seen.add(p)
-                    unique.append(p)
+
+            # Normalisasi (1x batch) + dedup global
+            all_phones, stats = normalize_many(
+                p for f in txt_files for p in f['phone_numbers']
+            )
+            if stats['invalid']:
+                logger.info(f"[V2] {stats['invalid']} baris tanpa digit dilewati")
+            unique = list(dict.fromkeys(all_phones))
 
             context.user_data['merged_phones'] = unique
             await self._v2_next_step_after_prepare(query, context, len(unique))
@@ -477,33 +504,10 @@ class TxtToVCFHandler:
                 )
                 return
 
-            # Bagi jadi batch
-            phone_batches = split_phones_into_batches(phones, contacts_per_file, total_files)
-
             start_time = time.time()
-            progress_msg = await update.message.reply_text("🔄 Menyiapkan file…")
-            successful_files = 0
-            total_processed = 0
-            global_idx = 1  # penomoran *nama kontak* global (1..N)
-
-            for i, batch in enumerate(phone_batches):
-                try:
-                    filename = f"{file_base}{start_num + i}.vcf"
-                    vcf_content = create_vcf_from_phones(batch, contact_name, start_index=global_idx)
-                    if vcf_content:
-                        await self._progress_edit(progress_msg, i + 1, len(phone_batches), "Mengirim file")
-                        await send_vcf_file(update, filename, vcf_content)
-                        successful_files += 1
-                        total_processed += len(batch)
-                        global_idx += len(batch)
-                        await asyncio.sleep(SLEEP_BETWEEN_FILES)
-                except Exception as e:
-                    logger.error(f"Batch {i} error: {e}")
-                    continue
-
-            with contextlib.suppress(Exception):
-                await progress_msg.delete()
-
+            successful_files, total_processed, failed = await self._v2_send_batches(
+                update, context, phones, contact_name, file_base, contacts_per_file, total_files, start_num
+            )
             dur = time.time() - start_time
             end_num = start_num + successful_files - 1
             parts = [
@@ -514,6 +518,7 @@ class TxtToVCFHandler:
                 f"📞 *Total kontak:* {total_processed}",
                 f"📝 *Range nama file:* {file_base}{start_num}.vcf … {file_base}{end_num}.vcf",
                 "▫️ Penomoran *nama kontak* global berurutan",
+                *format_failures(failed),
                 f"⏱ *Waktu proses:* {dur:.2f} detik",
                 "━━━━━━━━━━━━━━━━━━━━━━━",
                 "Gunakan /start untuk memulai baru."
@@ -652,6 +657,43 @@ class TxtToVCFHandler:
             logger.error(f"Error handling text input: {e}")
             await update.message.reply_text("❌ Terjadi kesalahan saat memproses input.")
 
+    async def _v2_send_batches(self, update, context, phones, contact_name,
+                               file_base, contacts_per_file, total_files, start_num):
+        """
+        Kirim batch V2 secara lazy lewat output pipeline: file k+1 dirender di
+        worker thread selama file k di-upload → memori puncak ±2 file.
+        Return (file_berhasil, total_kontak, gagal).
+        """
+        # lepas dari sesi; list tetap hidup lewat referensi lokal sampai selesai
+        context.user_data.pop('merged_phones', None)
+
+        def render(item):
+            filename, start_index, view = item
+            content = create_vcf_from_phones(view, contact_name, start_index=start_index)
+            return filename, content.encode('utf-8'), len(view)
+
+        return await self._run_vcf_pipeline(
+            update,
+            iter_phone_batches(phones, contacts_per_file, total_files, file_base, start_num),
+            render,
+            min(total_files, len(phones)),
+        )
+
+    async def _run_vcf_pipeline(self, update, jobs, render, n_files):
+        """Render+upload via output_pipeline dengan progress. Return (berhasil, kontak, gagal)."""
+        progress_msg = await update.message.reply_text("🔄 Menyiapkan file…")
+
+        async def on_progress(done):
+            await self._progress_edit(progress_msg, done, n_files, "Mengirim file")
+
+        report = await run_output_pipeline(
+            jobs, render, reply_document_sender(update.message), on_progress=on_progress
+        )
+        with contextlib.suppress(Exception):
+            await progress_msg.delete()
+        sent = report["sent"]
+        return len(sent), sum(r["meta"] for r in sent), report["failed"]
+
     async def _progress_edit(self, msg, cur, total, phase="Memproses"):
         try:
             pct = int((cur / max(total, 1)) * 100)
@@ -677,32 +719,10 @@ class TxtToVCFHandler:
                 )
                 return
 
-            phone_batches = split_phones_into_batches(phones, contacts_per_file, total_files)
-
             start_time = time.time()
-            progress_msg = await update.message.reply_text("🔄 Menyiapkan file…")
-            successful_files = 0
-            total_processed = 0
-            global_idx = 1  # penomoran *nama kontak* global mulai 1
-
-            for i, batch in enumerate(phone_batches):
-                try:
-                    filename = f"{file_base}{start_num + i}.vcf"
-                    vcf_content = create_vcf_from_phones(batch, contact_name, start_index=global_idx)
-                    if vcf_content:
-                        await self._progress_edit(progress_msg, i + 1, len(phone_batches), "Mengirim file")
-                        await send_vcf_file(update, filename, vcf_content)
-                        successful_files += 1
-                        total_processed += len(batch)
-                        global_idx += len(batch)
-                        await asyncio.sleep(SLEEP_BETWEEN_FILES)
-                except Exception as e:
-                    logger.error(f"Batch {i} error: {e}")
-                    continue
-
-            with contextlib.suppress(Exception):
-                await progress_msg.delete()
-
+            successful_files, total_processed, failed = await self._v2_send_batches(
+                update, context, phones, contact_name, file_base, contacts_per_file, total_files, start_num
+            )
             dur = time.time() - start_time
             end_num = start_num + successful_files - 1
             parts = [
@@ -713,6 +733,7 @@ class TxtToVCFHandler:
                 f"📞 *Total kontak:* {total_processed}",
                 f"📝 *Range nama file:* {file_base}{start_num}.vcf … {file_base}{end_num}.vcf",
                 "▫️ Penomoran *nama kontak* global berurutan",
+                *format_failures(failed),
                 f"⏱ *Waktu proses:* {dur:.2f} detik",
                 "━━━━━━━━━━━━━━━━━━━━━━━",
                 "Gunakan /start untuk memulai baru."
@@ -728,6 +749,42 @@ class TxtToVCFHandler:
     # =========================
     # V1: proses existing (tidak diubah)
     # =========================
+    @staticmethod
+    def _v1_jobs(txt_files, filenames, dedup: bool = False):
+        """
+        Job V1 lazy: (filename, nomor, start_index) dengan penomoran global lintas file.
+        dedup=True → pakai daftar hasil dedup antar file yang dibangun saat upload.
+        """
+        global_idx = 1
+        for f, filename in zip(txt_files, filenames):
+            if dedup and 'phones_dedup' in f:
+                normalized = f['phones_dedup']
+            else:
+                normalized, _ = normalize_many(f['phone_numbers'])
+            yield filename, normalized, global_idx
+            global_idx += len(normalized)
+
+    @staticmethod
+    def _v1_dedup_lines(txt_files, limit: int = 10) -> list:
+        """Baris ringkasan duplikat yang dibuang per file (dari hitungan saat upload)."""
+        hit = [f for f in txt_files if f.get('dup_removed')]
+        if not hit:
+            return []
+        lines = [f"♻️ *Duplikat dibuang:* {sum(f['dup_removed'] for f in hit)} nomor"]
+        for f in hit[:limit]:
+            lines.append(f"• `{f['filename']}` — {f['dup_removed']}")
+        if len(hit) > limit:
+            lines.append(f"_dan {len(hit) - limit} file lain_")
+        return lines
+
+    @staticmethod
+    def _v1_render(contact_name):
+        def render(job):
+            filename, phones, start_index = job
+            content = create_vcf_from_phones(phones, contact_name, start_index=start_index)
+            return filename, content.encode('utf-8'), len(phones)
+        return render
+
     async def process_default_mode(self, update, context, contact_name):
         from utils import clean_name_for_vcf
         try:
@@ -737,34 +794,14 @@ class TxtToVCFHandler:
                 return
 
             txt_files = context.user_data.get('txt_files_data', [])
-            successful_files = 0
-            total_processed = 0
-            failed = []
-            global_idx = 1
-
+            dedup = context.user_data.get('v1_dedup', False)
             start_time = time.time()
-            progress_msg = await update.message.reply_text("🔄 Menyiapkan file…")
-
-            for idx, f in enumerate(txt_files, 1):
-                try:
-                    filename = f['filename'].rsplit('.txt', 1)[0] + '.vcf'
-                    normalized = normalize_phone_list_format(f['phone_numbers'])
-                    await self._progress_edit(progress_msg, idx, len(txt_files), "Mengirim file")
-                    vcf_content = create_vcf_from_phones(normalized, contact_name, start_index=global_idx)
-                    if vcf_content:
-                        await send_vcf_file(update, filename, vcf_content)
-                        successful_files += 1
-                        total_processed += len(normalized)
-                        global_idx += len(normalized)
-                        await asyncio.sleep(SLEEP_BETWEEN_FILES)
-                    else:
-                        failed.append(f['filename'])
-                except Exception as e:
-                    logger.error(f"Error processing {f['filename']}: {e}")
-                    failed.append(f['filename'])
-
-            with contextlib.suppress(Exception):
-                await progress_msg.delete()
+            successful_files, total_processed, failed = await self._run_vcf_pipeline(
+                update,
+                self._v1_jobs(txt_files, [f['filename'].rsplit('.txt', 1)[0] + '.vcf' for f in txt_files], dedup),
+                self._v1_render(contact_name),
+                len(txt_files),
+            )
 
             dur = time.time() - start_time
             parts = [
@@ -774,8 +811,9 @@ class TxtToVCFHandler:
                 f"👤 *Nama kontak:* {contact_name}",
                 f"📞 *Total kontak:* {total_processed}",
             ]
-            if failed:
-                parts.append(f"❌ *Gagal:* {len(failed)} file")
+            if dedup:
+                parts.extend(self._v1_dedup_lines(txt_files))
+            parts.extend(format_failures(failed))
             parts.extend([
                 f"⏱ *Waktu proses:* {dur:.2f} detik",
                 "━━━━━━━━━━━━━━━━━━━━━━━",
@@ -837,36 +875,14 @@ class TxtToVCFHandler:
 
             txt_files = context.user_data.get('txt_files_data', [])
             custom = context.user_data.get('custom_filenames', [])
-
-            successful_files = 0
-            total_processed = 0
-            failed = []
-            global_idx = 1
-
+            dedup = context.user_data.get('v1_dedup', False)
             start_time = time.time()
-            progress_msg = await update.message.reply_text("🔄 Menyiapkan file…")
-
-            for i, f in enumerate(txt_files):
-                try:
-                    if i < len(custom):
-                        filename = custom[i]
-                        normalized = normalize_phone_list_format(f['phone_numbers'])
-                        await self._progress_edit(progress_msg, i + 1, len(txt_files), "Mengirim file")
-                        vcf_content = create_vcf_from_phones(normalized, contact_name, start_index=global_idx)
-                        if vcf_content:
-                            await send_vcf_file(update, filename, vcf_content)
-                            successful_files += 1
-                            total_processed += len(normalized)
-                            global_idx += len(normalized)
-                            await asyncio.sleep(SLEEP_BETWEEN_FILES)
-                        else:
-                            failed.append(f['filename'])
-                except Exception as e:
-                    logger.error(f"Error processing custom {f['filename']}: {e}")
-                    failed.append(f['filename'])
-
-            with contextlib.suppress(Exception):
-                await progress_msg.delete()
+            successful_files, total_processed, failed = await self._run_vcf_pipeline(
+                update,
+                self._v1_jobs(txt_files[:len(custom)], custom, dedup),
+                self._v1_render(contact_name),
+                min(len(txt_files), len(custom)),
+            )
 
             dur = time.time() - start_time
             parts = [
@@ -877,8 +893,9 @@ class TxtToVCFHandler:
                 f"📞 *Total kontak:* {total_processed}",
                 "🎨 *Pattern custom diterapkan (penomoran global)*",
             ]
-            if failed:
-                parts.append(f"❌ *Gagal:* {len(failed)} file")
+            if dedup:
+                parts.extend(self._v1_dedup_lines(txt_files[:len(custom)]))
+            parts.extend(format_failures(failed))
             parts.extend([
                 f"⏱ *Waktu proses:* {dur:.2f} detik",
                 "━━━━━━━━━━━━━━━━━━━━━━━",
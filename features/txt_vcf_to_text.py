@@ -1,14 +1,79 @@
 # features/txt_vcf_to_text.py
 import re
 import time
-from utils import read_file_content, clean_phone_number, normalize_phone
-from config import UPLOAD_TIMEOUT
+import contextlib
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from utils import read_file_content, normalize_many
+
+# batas karakter isi per halaman (pesan Telegram maks 4096, sisakan untuk header)
+PAGE_CHARS = 3500
+CB_PAGE_PREFIX = "t2t_page:"
+SESSION_BUCKET = "t2t_sessions"  # view per pesan halaman di chat_data (message_id → view)
+
+# TEL / itemN.TEL di awal baris (1x pass, tanpa findall per vcard)
+_TEL_RE = re.compile(r'^(?:[^:\r\n.]+\.)?TEL[^:\r\n]*:([^\r\n]+)', re.IGNORECASE | re.MULTILINE)
+
+
+def _extract_lines(text: str, is_txt: bool) -> list:
+    if is_txt:
+        return [ln for ln in text.splitlines() if ln.strip()]
+    out, _ = normalize_many(m.group(1) for m in _TEL_RE.finditer(text))
+    return out
+
+def _page_bounds(view: dict, page: int):
+    """
+    Index halaman dibangun lazy: view['starts'] = index baris awal tiap halaman.
+    Return (start, end) untuk halaman `page` (0-based) atau None jika lewat batas.
+    """
+    lines, starts = view["lines"], view["starts"]
+    while len(starts) < page + 2 and not view["done"]:
+        i, size = starts[-1], 0
+        while i < len(lines) and (size == 0 or size + len(lines[i]) + 1 <= PAGE_CHARS):
+            size += len(lines[i]) + 1
+            i += 1
+        if i >= len(lines):
+            view["done"] = True
+        else:
+            starts.append(i)
+    if page < 0 or page >= len(starts):
+        return None
+    end = starts[page + 1] if page + 1 < len(starts) else len(lines)
+    return starts[page], end
+
+def _render_page(view: dict, page: int):
+    bounds = _page_bounds(view, page)
+    if bounds is None:
+        return None, None
+    start, end = bounds
+    body = "\n".join(ln[:PAGE_CHARS] for ln in view["lines"][start:end])
+
+    total_pages = len(view["starts"]) if view["done"] else None
+    page_label = f"{page + 1}/{total_pages}" if total_pages else f"{page + 1}"
+    text = (
+        f"✅ *Isi file {view['fname']}* — hal. {page_label}\n"
+        f"_baris {start + 1}–{end} dari {len(view['lines'])}_\n"
+        "```\n"
+        f"{body}\n"
+        "```"
+    )
+
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"{CB_PAGE_PREFIX}{page - 1}"))
+    if not (view["done"] and page + 1 >= len(view["starts"])):
+        nav.append(InlineKeyboardButton("➡️ Next", callback_data=f"{CB_PAGE_PREFIX}{page + 1}"))
+    kb = InlineKeyboardMarkup([nav]) if nav else None
+    return text, kb
+
 
 class TxtVcfToTextHandler:
     """
     TXT/VCF → TEXT
     - Upload .txt → tampilkan isi file (as-is)
     - Upload .vcf → tampilkan hanya nomor (1 baris per nomor)
+    - Isi ditampilkan per halaman (Prev/Next); hasil parse di-cache di sesi
+      sehingga pindah halaman tidak parse ulang / join seluruh isi.
     """
 
     async def start_mode(self, query, context):
@@ -45,55 +110,63 @@ class TxtVcfToTextHandler:
             await status_msg.edit_text("❌ Tidak bisa membaca file.")
             return
 
-        if fname.endswith(".txt"):
-            lines = [ln for ln in text.splitlines() if ln.strip()]
-            preview = "\n".join(lines)
-            total = len(lines)
-            tipe = "baris"
-        else:
-            numbers = []
-            vcards = re.findall(r'BEGIN:VCARD.*?END:VCARD', text, re.DOTALL | re.IGNORECASE)
-            for v in vcards:
-                for m in re.findall(r'TEL[^:]*:([^\r\n]+)', v, re.IGNORECASE):
-                    cleaned = clean_phone_number(m)
-                    if cleaned:
-                        numbers.append(normalize_phone(cleaned))
-            preview = "\n".join(numbers)
-            total = len(numbers)
-            tipe = "nomor"
-
-        if not preview:
+        is_txt = fname.endswith(".txt")
+        lines = _extract_lines(text, is_txt)
+        tipe = "baris" if is_txt else "nomor"
+
+        if not lines:
             await status_msg.edit_text("❌ File kosong atau tidak ada nomor.")
             return
 
-        # batasi panjang supaya aman
-        if len(preview) > 4000:
-            preview = preview[:4000] + "\n… (dipotong)"
+        # cache hasil parse untuk navigasi halaman
+        view = {
+            "fname": doc.file_name,
+            "lines": lines,
+            "starts": [0],
+            "done": False,
+        }
+        context.user_data["waiting_for_txt_vcf_to_text"] = False
 
         # update status jadi selesai
-        try:
+        with contextlib.suppress(Exception):
             await status_msg.edit_text("✅ Selesai membaca file.")
-        except Exception:
-            pass
 
-        # kirim isi file
-        await update.message.reply_text(
-            f"✅ *Isi file {doc.file_name}:*\n"
-            "```\n"
-            f"{preview}\n"
-            "```",
-            parse_mode="Markdown"
-        )
+        # kirim halaman pertama
+        page_text, kb = _render_page(view, 0)
+        sent = await update.message.reply_text(page_text, parse_mode="Markdown", reply_markup=kb)
+        # Prev/Next tiap pesan halaman memakai view file-nya sendiri
+        view["ts"] = time.time()
+        context.chat_data.setdefault(SESSION_BUCKET, {})[sent.message_id] = view
 
         # kirim ringkasan
         await update.message.reply_text(
             f"📊 *Ringkasan TXT/VCF → TEXT*\n"
             "━━━━━━━━━━━━━━━━━━━━━━━\n"
             f"📂 File: `{doc.file_name}`\n"
-            f"📄 Total {tipe}: {total}\n"
+            f"📄 Total {tipe}: {len(lines)}\n"
             "━━━━━━━━━━━━━━━━━━━━━━━\n"
             "Gunakan /start untuk kembali ke menu utama.",
             parse_mode="Markdown"
         )
 
-        context.user_data.clear()
+    async def handle_callback(self, query, context):
+        msg = query.message
+        view = context.chat_data.get(SESSION_BUCKET, {}).get(msg.message_id) if msg else None
+        if not view:
+            with contextlib.suppress(Exception):
+                await query.edit_message_text("❌ Sesi sudah berakhir. Upload ulang lewat /start.")
+            return
+        try:
+            page = int(query.data[len(CB_PAGE_PREFIX):])
+        except ValueError:
+            return
+
+        page_text, kb = _render_page(view, page)
+        if page_text is None:
+            return
+        view["ts"] = time.time()
+        try:
+            await query.edit_message_text(page_text, parse_mode="Markdown", reply_markup=kb)
+        except BadRequest as e:
+            if "message is not modified" not in str(e).lower():
+                raise
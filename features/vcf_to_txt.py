@@ -3,7 +3,9 @@ import io
 import time
 import asyncio
 from telegram import InputFile, InlineKeyboardButton, InlineKeyboardMarkup
-from config import UPLOAD_TIMEOUT, SLEEP_BETWEEN_FILES
+from config import UPLOAD_TIMEOUT
+from output_pipeline import run_output_pipeline, reply_document_sender, format_failures
+from utils import count_vcf_bytes
 
 SESSION_BUCKET = "vcf_to_txt_sessions"  # key di chat_data
 
@@ -19,7 +21,7 @@ class VCFToTxtHandler:
         context.user_data.clear()
         context.user_data.update({
             "waiting_for_vcf_files": True,
-            "vcf_files": [],            # list[{"filename","content","count"}]
+            "vcf_files": [],            # list[{"filename","count","job"}]
             "vcf_last_ts": 0.0,
             "vcf_preview_msg": None,   # Message ringkasan
             "vcf_finalize_task": None,
@@ -46,17 +48,18 @@ class VCFToTxtHandler:
 
         try:
             tg = await context.bot.get_file(doc.file_id)
-            data = await tg.download_as_bytearray()
-            content = data.decode("utf-8", errors="ignore")
+            data = bytes(await tg.download_as_bytearray())
         except Exception:
             await update.message.reply_text(f"❌ Gagal membaca `{doc.file_name}`", parse_mode="Markdown")
             return
 
-        count = self._count_tel(content)
+        _, count = count_vcf_bytes(data)
+        # konversi ke TXT langsung di background selama jendela upload
+        job = asyncio.create_task(asyncio.to_thread(self._parse_vcf, data))
         context.user_data["vcf_files"].append({
             "filename": doc.file_name,
-            "content": content,
-            "count": count
+            "count": count,
+            "job": job,
         })
         context.user_data["vcf_last_ts"] = time.time()
 
@@ -183,19 +186,20 @@ class VCFToTxtHandler:
             await query.edit_message_text("❌ Tidak ada file untuk diproses.", parse_mode="Markdown")
             return
 
-        ok_count = 0
-        for f in files:
-            txt = self._vcf_to_txt(f["content"])
-            bio = io.BytesIO(txt.encode("utf-8"))
-            bio.name = f["filename"].replace(".vcf", ".txt")
-            await query.message.reply_document(InputFile(bio))
-            ok_count += 1
-            await asyncio.sleep(SLEEP_BETWEEN_FILES)
+        # hasil parse sudah disiapkan saat upload
+        parsed = await asyncio.gather(*(f["job"] for f in files))
+
+        def render(job):
+            f, (txt, _) = job
+            return f["filename"].replace(".vcf", ".txt"), txt.encode("utf-8"), None
+
+        report = await run_output_pipeline(zip(files, parsed), render, reply_document_sender(query.message))
 
         summary = "\n".join([
             "✅ *Konversi selesai!*",
             "━━━━━━━━━━━━━━━━━━━━━━━",
-            f"📁 *File diproses:* {ok_count}",
+            f"📁 *File diproses:* {len(report['sent'])}",
+            *format_failures(report["failed"]),
             "━━━━━━━━━━━━━━━━━━━━━━━",
             "Gunakan /start untuk kembali ke menu utama.",
         ])
@@ -227,12 +231,10 @@ class VCFToTxtHandler:
         session = sessions.get(msg_id, {})
         files = session.get("files") or context.user_data.get("vcf_files", [])
 
-        merged_lines = []
-        for f in files:
-            txt = self._vcf_to_txt(f["content"])
-            merged_lines.extend(txt.splitlines())
-
-        out_txt = "\n".join(merged_lines)
+        # hasil parse sudah disiapkan saat upload → tinggal disambung
+        parsed = await asyncio.gather(*(f["job"] for f in files))
+        out_txt = "\n".join(txt for txt, n in parsed if n)
+        total = sum(n for _, n in parsed)
         bio = io.BytesIO(out_txt.encode("utf-8"))
         bio.name = fname
         await update.message.reply_document(InputFile(bio))
@@ -241,7 +243,7 @@ class VCFToTxtHandler:
             "✅ *Konversi selesai!*\n"
             "━━━━━━━━━━━━━━━━━━━━━━━\n"
             f"📁 *File gabungan:* {fname}\n"
-            f"📄 *Total nomor:* {len(merged_lines)}\n"
+            f"📄 *Total nomor:* {total}\n"
             "━━━━━━━━━━━━━━━━━━━━━━━\n"
             "Gunakan /start untuk kembali ke menu utama.",
             parse_mode="Markdown"
@@ -256,16 +258,6 @@ class VCFToTxtHandler:
     # =========================
     # Helpers
     # =========================
-    @staticmethod
-    def _count_tel(content: str) -> int:
-        n = 0
-        for ln in (content or "").splitlines():
-            if ln.strip().upper().startswith("TEL") and ":" in ln:
-                right = ln.split(":", 1)[1].strip()
-                if right:
-                    n += 1
-        return n
-
     @staticmethod
     def _vcf_to_txt(content: str) -> str:
         out = []
@@ -276,3 +268,9 @@ class VCFToTxtHandler:
                 if len(parts) == 2:
                     out.append(parts[1].strip())
         return "\n".join(out)
+
+    @classmethod
+    def _parse_vcf(cls, data: bytes):
+        """Decode + ambil nomor 1 file (jalan di worker thread). Return (txt, jumlah_baris)."""
+        txt = cls._vcf_to_txt(data.decode("utf-8", errors="ignore"))
+        return txt, (txt.count("\n") + 1) if txt else 0
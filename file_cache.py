@@ -0,0 +1,107 @@
+# file_cache.py
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+from telegram.error import BadRequest
+
+from config import FILE_CACHE_MAX
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["content_key", "send_cached", "reply_cached", "get_stats"]
+
+# (sha256, filename) → file_id; LRU sederhana di memori proses
+_CACHE: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "bytes_saved": 0}
+
+Payload = Union[bytes, bytearray, memoryview, str]
+
+
+# =========================
+# Helpers
+# =========================
+def content_key(payload: Payload) -> Tuple[str, int]:
+    """sha256 isi (bytes, atau path file dibaca per blok) → (hexdigest, ukuran)."""
+    h = hashlib.sha256()
+    if isinstance(payload, str):
+        size = 0
+        with open(payload, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+                size += len(chunk)
+        return h.hexdigest(), size
+    h.update(payload)
+    return h.hexdigest(), len(payload)
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def _remember(key: Tuple[str, str], file_id: str) -> None:
+    _CACHE[key] = file_id
+    _CACHE.move_to_end(key)
+    while len(_CACHE) > FILE_CACHE_MAX:
+        _CACHE.popitem(last=False)
+
+
+# =========================
+# Kirim dokumen (upload sekali, berikutnya pakai file_id)
+# =========================
+async def send_cached(
+    bot,
+    chat_id: int,
+    payload: Payload,
+    filename: str,
+    caption: Optional[str] = None,
+    **kwargs,
+):
+    """
+    send_document dengan cache file_id berbasis hash isi.
+    - Isi + nama file sama yang pernah di-upload → kirim file_id (tanpa upload ulang).
+    - file_id ditolak Telegram → buang dari cache lalu upload biasa.
+    payload = bytes atau path file.
+    """
+    if isinstance(payload, str):
+        # file di disk (backup/export) dibaca + di-hash di worker thread, bukan di event loop
+        digest, size = await asyncio.to_thread(content_key, payload)
+    else:
+        digest, size = content_key(payload)
+    key = (digest, filename)
+
+    file_id = _CACHE.get(key)
+    if file_id:
+        try:
+            msg = await bot.send_document(chat_id=chat_id, document=file_id, caption=caption, **kwargs)
+            _CACHE.move_to_end(key)
+            _STATS["hits"] += 1
+            _STATS["bytes_saved"] += size
+            return msg
+        except BadRequest as e:
+            logger.info(f"[FileCache] file_id basi untuk {filename}: {e}")
+            _CACHE.pop(key, None)
+            _STATS["stale"] += 1
+
+    _STATS["misses"] += 1
+    if isinstance(payload, str):
+        # PTB membaca seluruh file saat upload → baca di worker thread, kirim sebagai bytes
+        document = await asyncio.to_thread(_read_file, payload)
+    else:
+        document = bytes(payload)
+    msg = await bot.send_document(
+        chat_id=chat_id, document=document, filename=filename, caption=caption, **kwargs
+    )
+    if msg and msg.document:
+        _remember(key, msg.document.file_id)
+    return msg
+
+async def reply_cached(message, payload: Payload, filename: str, caption: Optional[str] = None, **kwargs):
+    """Versi reply: kirim ke chat asal `message` lewat send_cached."""
+    return await send_cached(message.get_bot(), message.chat_id, payload, filename, caption, **kwargs)
+
+def get_stats() -> Dict[str, int]:
+    """Snapshot instrumentasi cache (hit/miss/byte hemat)."""
+    return {**_STATS, "entries": len(_CACHE)}
@@ -0,0 +1,70 @@
+# handler_registry.py
+import time
+import logging
+import importlib
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["HANDLERS", "lazy", "resolve", "preload", "load_times"]
+
+# nama kelas handler → modul; modul baru di-import saat handler pertama kali dipakai
+HANDLERS: Dict[str, str] = {
+    "TextToVCFHandler":       "features.text_to_vcf",
+    "TxtToVCFHandler":        "features.txt_to_vcf",
+    "VCFToTxtHandler":        "features.vcf_to_txt",
+    "MergeFilesHandler":      "features.merge_files",
+    "CountFilesHandler":      "features.count_files",
+    "CreateGroupNameHandler": "features.create_group_name",
+    "AddCtcVcfHandler":       "features.add_ctc_vcf",
+    "RemoveCtcVcfHandler":    "features.remove_ctc_vcf",
+    "EditCtcNameHandler":     "features.edit_ctc_name",
+    "GetNameFileHandler":     "features.get_name_file",
+    "SplitFilesHandler":      "features.split_files",
+    "TxtVcfToTextHandler":    "features.txt_vcf_to_text",
+    "InfoHandler":            "info",
+}
+
+_CLASSES: Dict[str, type] = {}
+_LOAD_MS: Dict[str, float] = {}
+
+
+def resolve(name: str) -> type:
+    """Kelas handler `name`; import modulnya sekali saat pertama diminta."""
+    cls = _CLASSES.get(name)
+    if cls is None:
+        t0 = time.perf_counter()
+        cls = getattr(importlib.import_module(HANDLERS[name]), name)
+        _LOAD_MS[name] = (time.perf_counter() - t0) * 1000
+        _CLASSES[name] = cls
+        logger.info(f"[Registry] {name} dimuat ({_LOAD_MS[name]:.1f} ms)")
+    return cls
+
+class LazyHandler:
+    """Pengganti kelas handler di main: `LazyHandler("X")()` → instance X (import saat dipanggil)."""
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        if name not in HANDLERS:
+            raise KeyError(f"Handler tidak terdaftar: {name}")
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        return resolve(self.name)(*args, **kwargs)
+
+    def __repr__(self):
+        state = "dimuat" if self.name in _CLASSES else "belum dimuat"
+        return f"<LazyHandler {self.name} ({state})>"
+
+def lazy(name: str) -> LazyHandler:
+    return LazyHandler(name)
+
+def preload() -> Dict[str, float]:
+    """Import semua handler yang belum dimuat (warm-up). Return waktu muat per handler (ms)."""
+    for name in HANDLERS:
+        resolve(name)
+    return load_times()
+
+def load_times() -> Dict[str, float]:
+    """Waktu import per handler yang sudah dimuat (ms)."""
+    return dict(_LOAD_MS)
@@ -5,7 +5,7 @@ from telegram.error import BadRequest
 from html import escape
 
 import storage
-from config import REQUIRED_CHANNEL, REQUIRED_GROUP, TRIAL_MINUTES, is_owner
+from config import REQUIRED_CHANNEL, REQUIRED_GROUP, TRIAL_MINUTES, is_owner, already_showing, is_not_modified
 
 logger = logging.getLogger(__name__)
 
@@ -74,12 +74,12 @@ def _fmt_info_text(user_id: int) -> str:
         f"• {foot}\n"
     )
 
-def _keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("👤 Owner", url="https://t.me/langrisown")],
-        [InlineKeyboardButton("🔁 Refresh", callback_data="info_refresh")],
-        [InlineKeyboardButton("🏠 Home", callback_data="back_to_main")],
-    ])
+# keyboard statis → dibangun sekali
+_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("👤 Owner", url="https://t.me/langrisown")],
+    [InlineKeyboardButton("🔁 Refresh", callback_data="info_refresh")],
+    [InlineKeyboardButton("🏠 Home", callback_data="back_to_main")],
+])
 
 class InfoHandler:
     """INFO — tampilkan status user (trial, habis, akses aktif) atau OWNER."""
@@ -105,9 +105,11 @@ class InfoHandler:
                 can_edit = False
 
             text = _fmt_info_text(user.id)
-            kb = _keyboard()
+            kb = _KEYBOARD
 
             if mode == "edit" and can_edit:
+                if already_showing(msg, text, kb, parse_mode="HTML"):
+                    return
                 try:
                     await target.edit_message_text(
                         text,
@@ -117,7 +119,7 @@ class InfoHandler:
                     )
                     return
                 except BadRequest as e:
-                    if "message is not modified" in str(e).lower():
+                    if is_not_modified(e):
                         return
             await msg.reply_text(
                 text,
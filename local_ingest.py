@@ -0,0 +1,410 @@
+# local_ingest.py
+import os
+import glob
+import mmap
+import shlex
+import hashlib
+import itertools
+import contextlib
+from datetime import datetime
+
+from config import LOCAL_INGEST_DIR, LOCAL_OUTPUT_DIR, LOCAL_CHUNK_LINES
+from utils import (
+    iter_buffer_lines, normalize_many, clean_name_for_vcf, count_nonblank_lines, count_vcf_bytes,
+    create_vcf_from_phones, generate_custom_filenames, plan_batch_sizes,
+)
+from features.split_files import (
+    SPLIT_BY_COUNT, SPLIT_BY_SIZE, SPLIT_BY_BYTES,
+    index_units, plan_parts, SplitIndex, split_output_name,
+)
+from features.merge_files import (
+    write_unique_lines, write_unique_cards, DIGEST_SIZE, DEDUP_PHONE, DEDUP_NAME_PHONE,
+)
+
+__all__ = [
+    "open_mapped", "dedupe_name", "count_files", "txt_to_vcf_v1", "txt_to_vcf_v2",
+    "split_files", "merge_files", "dispatch", "split_params", "run_ingest", "IngestError", "USAGE",
+]
+
+WRITE_BUFFER = 1 << 20
+
+USAGE = (
+    "Format: /ingest <perintah> <param, dipisah koma> | <file> <file> …\n"
+    f"File relatif ke folder {LOCAL_INGEST_DIR} (boleh glob, mis. *.txt).\n\n"
+    "count | a.txt b.vcf\n"
+    "v1 nama_kontak[, nama_dasar1][, dedup] | *.txt\n"
+    "v2 nama_kontak, nama_file, per_file, jumlah_file, start_num | a.txt\n"
+    "split count|size|bytes, angka[, nama_dasar1] | a.vcf   (bytes = KB)\n"
+    "merge nama_output[, name_phone] | a.vcf b.vcf"
+)
+
+
+class IngestError(ValueError):
+    """Parameter / input ingest tidak valid (pesan siap ditampilkan ke owner)."""
+
+
+# =========================
+# Mapping & iterasi baris
+# =========================
+@contextlib.contextmanager
+def open_mapped(path: str):
+    """
+    mmap read-only atas file di disk; halaman dibaca OS sesuai kebutuhan,
+    jadi RSS tidak ikut ukuran file. File 0 byte → b"" (mmap tidak bisa memetakan 0 byte).
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with contextlib.suppress(AttributeError, OSError):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield mm
+        finally:
+            mm.close()
+
+def _decode(line: bytes) -> str:
+    try:
+        return line.decode("utf-8")
+    except UnicodeDecodeError:
+        return line.decode("latin-1")
+
+def _digest(b: bytes) -> bytes:
+    return hashlib.blake2b(b, digest_size=DIGEST_SIZE).digest()
+
+def _seen_add(seen: set, key: str) -> bool:
+    """True jika `key` sudah pernah ada; kalau belum, dicatat (digest, hemat memori)."""
+    d = _digest(key.encode("utf-8"))
+    if d in seen:
+        return True
+    seen.add(d)
+    return False
+
+def _file_lines(buf):
+    """Baris non-kosong unik per file (sama dengan extract_phone_numbers), lazy dari mapping."""
+    seen = set()
+    for line in iter_buffer_lines(buf):
+        line = line.strip()
+        if not line:
+            continue
+        d = _digest(line)
+        if d in seen:
+            continue
+        seen.add(d)
+        yield _decode(line)
+
+def _chunks(it, n: int = LOCAL_CHUNK_LINES):
+    it = iter(it)
+    while True:
+        chunk = list(itertools.islice(it, n))
+        if not chunk:
+            return
+        yield chunk
+
+def dedupe_name(original: str, existing: set) -> str:
+    """Nama kembar diberi akhiran _1, _2, … (sama dengan penyimpanan upload di bot)."""
+    filename, c = original, 1
+    while filename in existing:
+        name_part, dot, ext_part = original.rpartition(".")
+        filename = f"{name_part}_{c}.{ext_part}" if dot else f"{original}_{c}"
+        c += 1
+    existing.add(filename)
+    return filename
+
+def _out_path(out_dir: str, name: str) -> str:
+    """Path output di dalam out_dir; nama dari parameter user tidak boleh memuat folder (`../`, `/`)."""
+    if not name or name in (".", "..") or "/" in name or "\\" in name or (os.altsep and os.altsep in name):
+        raise IngestError(f"Nama output tidak valid: {name}")
+    return os.path.join(out_dir, name)
+
+def _write_phones(phones, path: str, contact_name: str, start_index: int) -> int:
+    """Render nomor → kartu VCF ke `path` per LOCAL_CHUNK_LINES nomor. Return jumlah kartu."""
+    n = 0
+    with open(path, "w", encoding="utf-8", newline="\n", buffering=WRITE_BUFFER) as out:
+        for chunk in _chunks(phones):
+            out.write(create_vcf_from_phones(chunk, contact_name, start_index=start_index + n))
+            n += len(chunk)
+    return n
+
+
+# =========================
+# COUNT
+# =========================
+def count_files(paths: list) -> dict:
+    """
+    Hitung seperti COUNT VCF/TXT: TXT = baris non-kosong, VCF = kartu + baris TEL.
+    Return {"items": [{"filename","type","count","tels"}], "total_txt", "total_vcf", "total_vcf_tel"}.
+    """
+    items = []
+    for path in paths:
+        is_vcf = path.lower().endswith(".vcf")
+        with open_mapped(path) as buf:
+            if is_vcf:
+                count, tels = count_vcf_bytes(buf)
+            else:
+                count = tels = count_nonblank_lines(buf)
+        items.append({
+            "filename": os.path.basename(path), "type": "vcf" if is_vcf else "txt",
+            "count": count, "tels": tels if is_vcf else count,
+        })
+    return {
+        "items": items,
+        "total_txt": sum(i["count"] for i in items if i["type"] == "txt"),
+        "total_vcf": sum(i["count"] for i in items if i["type"] == "vcf"),
+        "total_vcf_tel": sum(i["tels"] for i in items if i["type"] == "vcf"),
+    }
+
+
+# =========================
+# TXT → VCF
+# =========================
+def txt_to_vcf_v1(paths: list, out_dir: str, contact_name: str,
+                  base_filename: str = None, dedup: bool = False) -> dict:
+    """
+    V1: 1 TXT → 1 VCF, penomoran nama kontak global lintas file.
+    Nama output = nama TXT (.vcf) atau pola generate_custom_filenames(base_filename).
+    dedup=True → nomor yang sudah muncul di file sebelumnya dibuang.
+    File tanpa baris isi dilewati (tidak memakai slot nama), sama seperti di bot.
+    """
+    contact_name = clean_name_for_vcf(contact_name)
+    if not contact_name:
+        raise IngestError("Nama kontak tidak valid!")
+    custom = generate_custom_filenames(base_filename, len(paths)) if base_filename else None
+    if base_filename and not custom:
+        raise IngestError("Nama dasar harus diakhiri angka. Contoh: kontak1")
+    for name in custom or ():
+        _out_path(out_dir, name)   # tolak sebelum ada file yang ditulis
+
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = os.path.join(out_dir, ".v1.part")
+    seen = set()
+    used, files, empty = set(), [], []
+    global_idx = 1
+    for path in paths:
+        stat = {"lines": 0, "dup_removed": 0}
+
+        def phones(buf):
+            for chunk in _chunks(_file_lines(buf)):
+                stat["lines"] += len(chunk)
+                normalized, _ = normalize_many(chunk)
+                for p in normalized:
+                    if dedup and _seen_add(seen, p):
+                        stat["dup_removed"] += 1
+                        continue
+                    yield p
+
+        with open_mapped(path) as buf:
+            n = _write_phones(phones(buf), tmp, contact_name, global_idx)
+        if not stat["lines"]:
+            continue
+        slot = len(files) + len(empty)
+        if custom:
+            name = custom[slot]
+        else:
+            name = dedupe_name(os.path.basename(path), used).rsplit(".txt", 1)[0] + ".vcf"
+        if not n:
+            empty.append(name)
+            continue
+        os.replace(tmp, _out_path(out_dir, name))
+        files.append({"filename": name, "source": os.path.basename(path),
+                      "contacts": n, "dup_removed": stat["dup_removed"]})
+        global_idx += n
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(tmp)
+    return {"files": files, "empty": empty, "contacts": global_idx - 1, "contact_name": contact_name}
+
+def _v2_phones(paths: list):
+    """
+    Urutan nomor V2 seperti di bot: 1 file = baris unik ter-normalisasi;
+    banyak file = gabungan + dedup global setelah normalisasi.
+    """
+    seen = set() if len(paths) > 1 else None
+    for path in paths:
+        with open_mapped(path) as buf:
+            for chunk in _chunks(_file_lines(buf)):
+                normalized, _ = normalize_many(chunk)
+                for p in normalized:
+                    if seen is not None and _seen_add(seen, p):
+                        continue
+                    yield p
+
+def txt_to_vcf_v2(paths: list, out_dir: str, contact_name: str, file_base: str,
+                  contacts_per_file: int, total_files: int, start_num: int = 1) -> dict:
+    """
+    V2: semua nomor dibagi ke `total_files` file (`{file_base}{start_num+i}.vcf`).
+    2 pass atas mapping: hitung nomor unik dulu (ukuran batch butuh total),
+    lalu tulis batch satu per satu — list nomor tidak pernah dibangun utuh.
+    """
+    contact_name = clean_name_for_vcf(contact_name)
+    if not contact_name or not file_base:
+        raise IngestError("Nama kontak / nama file tidak valid!")
+    if contacts_per_file <= 0 or total_files <= 0 or start_num <= 0:
+        raise IngestError("Semua angka harus > 0.")
+    _out_path(out_dir, f"{file_base}{start_num}.vcf")
+
+    total = sum(1 for _ in _v2_phones(paths))
+    needed = contacts_per_file * total_files
+    if total < needed:
+        raise IngestError(f"Tidak cukup nomor! Tersedia: {total} · Dibutuhkan: {needed}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    phones = _v2_phones(paths)
+    files = []
+    try:
+        for i, (start, size) in enumerate(plan_batch_sizes(total, contacts_per_file, total_files)):
+            name = f"{file_base}{start_num + i}.vcf"
+            n = _write_phones(itertools.islice(phones, size), _out_path(out_dir, name),
+                              contact_name, 1 + start)
+            files.append({"filename": name, "contacts": n})
+    finally:
+        phones.close()
+    return {"files": files, "contacts": sum(f["contacts"] for f in files),
+            "available": total, "contact_name": contact_name}
+
+
+# =========================
+# SPLIT & MERGE
+# =========================
+def _ftype_of(paths: list) -> str:
+    types = {p.rsplit(".", 1)[-1].lower() for p in paths}
+    if len(types) != 1 or not types <= {"txt", "vcf"}:
+        raise IngestError("Semua file harus sejenis: .txt atau .vcf")
+    return types.pop()
+
+def split_files(paths: list, out_dir: str, mode: str, value: int, base_name: str = None) -> dict:
+    """
+    SPLIT: index offset unit lewat iterasi baris mapping, tiap part ditulis
+    langsung dari slice mapping (isi asli, tanpa rebuild). value = byte untuk SPLIT_BY_BYTES.
+    """
+    ftype = _ftype_of(paths)
+    if base_name:
+        _out_path(out_dir, split_output_name(0, ftype, "", base_name))
+    os.makedirs(out_dir, exist_ok=True)
+    fname = os.path.basename(paths[0]).rsplit(".", 1)[0]
+    files = []
+    with contextlib.ExitStack() as stack:
+        mapped = []
+        for path in paths:
+            buf = stack.enter_context(open_mapped(path))
+            mapped.append({"data": buf, "offs": index_units(buf, ftype)})
+        idx = SplitIndex(mapped)
+        for i, (a, b) in enumerate(plan_parts(idx.cum, mode, value)):
+            name = split_output_name(i, ftype, fname, base_name)
+            segs = idx.segments(a, b)
+            with open(_out_path(out_dir, name), "wb", buffering=WRITE_BUFFER) as out:
+                for s in segs:
+                    out.write(s)
+                    if len(s) and s[-1:] != b"\n":
+                        out.write(b"\n")
+            for s in segs:
+                s.release()       # lepas view supaya mmap bisa ditutup
+            files.append({"filename": name, "units": b - a})
+        total = idx.total
+    return {"files": files, "total": total, "type": ftype}
+
+def merge_files(paths: list, out_path: str, mode: str = DEDUP_PHONE) -> dict:
+    """MERGE: baris unik (TXT) / kartu unik (VCF) semua file ke 1 output, urut input."""
+    ftype = _ftype_of(paths)
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    seen = set()
+    parts = []
+    with open(out_path, "wb", buffering=WRITE_BUFFER) as out:
+        for path in paths:
+            with open_mapped(path) as buf:
+                if ftype == "vcf":
+                    st = write_unique_cards(buf, seen, out, mode)
+                else:
+                    st = {"lines": write_unique_lines(buf, seen, out)}
+            parts.append({"filename": os.path.basename(path), **st})
+    return {"filename": os.path.basename(out_path), "type": ftype,
+            "files": parts, "total": sum(p["lines"] for p in parts)}
+
+
+# =========================
+# Perintah /ingest (owner)
+# =========================
+def resolve_inputs(patterns: list, root: str = LOCAL_INGEST_DIR) -> list:
+    """Pola/nama file relatif ke `root` (glob boleh) → path file; di luar root ditolak."""
+    root = os.path.realpath(root)
+    out = []
+    for pat in patterns:
+        hits = sorted(glob.glob(os.path.join(root, pat))) if glob.has_magic(pat) else [os.path.join(root, pat)]
+        for p in hits:
+            real = os.path.realpath(p)
+            if os.path.commonpath([root, real]) != root:
+                raise IngestError(f"Path di luar folder ingest: {pat}")
+            if not os.path.isfile(real):
+                raise IngestError(f"File tidak ditemukan: {pat}")
+            out.append(real)
+    if not out:
+        raise IngestError("Tidak ada file input.")
+    return out
+
+def _run_dir(out_root: str, cmd: str) -> str:
+    """Subfolder output per run: `<perintah>_<waktu>` (+ akhiran jika sudah ada)."""
+    base = os.path.join(out_root, f"{cmd}_{datetime.now():%Y%m%d_%H%M%S}")
+    path, c = base, 1
+    while os.path.exists(path):
+        path, c = f"{base}_{c}", c + 1
+    return path
+
+def _int(s: str) -> int:
+    try:
+        return int(s)
+    except ValueError:
+        raise IngestError(f"Parameter angka tidak valid: {s}")
+
+def dispatch(cmd: str, params: list, paths: list, out_dir: str) -> dict:
+    """Jalankan 1 perintah (count/v1/v2/split/merge) dengan param ala input bot → report."""
+    if cmd == "count":
+        return count_files(paths)
+    if cmd == "v1":
+        if not params or not params[0]:
+            raise IngestError("Format: v1 nama_kontak[, nama_dasar1][, dedup]")
+        dedup = "dedup" in (p.lower() for p in params[1:])
+        base = next((p for p in params[1:] if p.lower() != "dedup"), None)
+        return txt_to_vcf_v1(paths, out_dir, params[0], base, dedup)
+    if cmd == "v2":
+        if len(params) != 5:
+            raise IngestError("Format salah! Harus 5 parameter. Contoh: Admin, kontak, 50, 10, 5")
+        name, base, per, count, start = params
+        return txt_to_vcf_v2(paths, out_dir, name, base, _int(per), _int(count), _int(start))
+    if cmd == "split":
+        modes = (SPLIT_BY_COUNT, SPLIT_BY_SIZE, SPLIT_BY_BYTES)
+        if len(params) < 2 or params[0].lower() not in modes:
+            raise IngestError("Format: split count|size|bytes, angka[, nama_dasar1]")
+        mode, n = params[0].lower(), _int(params[1])
+        if n <= 0:
+            raise IngestError("Angka harus > 0.")
+        value = n * 1024 if mode == SPLIT_BY_BYTES else n
+        return split_files(paths, out_dir, mode, value, params[2] if len(params) > 2 else None)
+    if cmd == "merge":
+        if not params or not params[0]:
+            raise IngestError("Format: merge nama_output[, name_phone]")
+        ftype = _ftype_of(paths)
+        fname = os.path.basename(params[0])
+        if not fname.lower().endswith(f".{ftype}"):
+            fname += f".{ftype}"
+        mode = DEDUP_NAME_PHONE if len(params) > 1 and params[1].lower() == DEDUP_NAME_PHONE else DEDUP_PHONE
+        return merge_files(paths, os.path.join(out_dir, fname), mode)
+    raise IngestError(f"Perintah tidak dikenal: {cmd or '-'}")
+
+def split_params(raw: str) -> list:
+    """'Admin, kontak, 50' → ['Admin', 'kontak', '50'] (format koma seperti input bot)."""
+    return [p.strip() for p in raw.split(",")] if (raw or "").strip() else []
+
+def run_ingest(text: str, root: str = LOCAL_INGEST_DIR, out_root: str = LOCAL_OUTPUT_DIR):
+    """
+    Jalankan 1 perintah ingest (blocking; panggil via to_thread), format lihat USAGE.
+    File input relatif ke `root`, hasil ditulis ke subfolder baru di `out_root`.
+    Return (perintah, folder_output|None, report).
+    """
+    head, sep, tail = (text or "").partition("|")
+    cmd, _, raw = head.strip().partition(" ")
+    cmd = cmd.lower()
+    if not sep:
+        raise IngestError("Format: <perintah> <param> | <file> …")
+    paths = resolve_inputs(shlex.split(tail), root)
+    out_dir = None if cmd == "count" else _run_dir(out_root, cmd)
+    return cmd, out_dir, dispatch(cmd, split_params(raw), paths, out_dir)
@@ -1,32 +1,39 @@
 # main.py
 import logging
 import datetime
-from telegram import Update, InputFile
+from telegram import Update
 from telegram.ext import (
     Application, CommandHandler, CallbackQueryHandler, MessageHandler,
     ContextTypes, filters
 )
 
-from config import BOT_TOKEN, show_menu, OWNER_IDS
-from features.text_to_vcf import TextToVCFHandler
-from features.txt_to_vcf import TxtToVCFHandler
-from features.vcf_to_txt import VCFToTxtHandler
-from features.merge_files import MergeFilesHandler
-from features.count_files import CountFilesHandler
-from features.create_group_name import CreateGroupNameHandler
-from features.add_ctc_vcf import AddCtcVcfHandler
-from features.remove_ctc_vcf import RemoveCtcVcfHandler
-from features.edit_ctc_name import EditCtcNameHandler
-from features.get_name_file import GetNameFileHandler
-from features.split_files import SplitFilesHandler
-from features.txt_vcf_to_text import TxtVcfToTextHandler
-
-from admin_panel import AdminPanelHandler
-from info import InfoHandler
+from config import (
+    BOT_TOKEN, show_menu, OWNER_IDS, SESSION_GC_INTERVAL, BACKUP_COMPRESS,
+    HANDLER_PRELOAD_DELAY, is_owner,
+)
+from admin_panel import AdminPanelHandler, KEY_ADMIN_BROADCAST_WAIT
+import handler_registry as registry
 
 import storage
+import session_gc
+import db_backup
 from access_control import ensure_access_start, ensure_access_feature
 
+# handler fitur dimuat lazy (modul di-import saat tombol/fitur pertama kali dipakai)
+TextToVCFHandler = registry.lazy("TextToVCFHandler")
+TxtToVCFHandler = registry.lazy("TxtToVCFHandler")
+VCFToTxtHandler = registry.lazy("VCFToTxtHandler")
+MergeFilesHandler = registry.lazy("MergeFilesHandler")
+CountFilesHandler = registry.lazy("CountFilesHandler")
+CreateGroupNameHandler = registry.lazy("CreateGroupNameHandler")
+AddCtcVcfHandler = registry.lazy("AddCtcVcfHandler")
+RemoveCtcVcfHandler = registry.lazy("RemoveCtcVcfHandler")
+EditCtcNameHandler = registry.lazy("EditCtcNameHandler")
+GetNameFileHandler = registry.lazy("GetNameFileHandler")
+SplitFilesHandler = registry.lazy("SplitFilesHandler")
+TxtVcfToTextHandler = registry.lazy("TxtVcfToTextHandler")
+InfoHandler = registry.lazy("InfoHandler")
+
 # =========================
 # Logging
 # =========================
@@ -38,6 +45,8 @@ logger = logging.getLogger(__name__)
 
 class VCFGeneratorBot:
     def __init__(self):
+        if not BOT_TOKEN:
+            raise ValueError("BOT_TOKEN environment variable is required!")
         storage.init_db()
         self.app = Application.builder().token(BOT_TOKEN).build()
         self.admin_handler = AdminPanelHandler()
@@ -52,6 +61,7 @@ class VCFGeneratorBot:
         self.app.add_handler(CommandHandler("start", self.cmd_start))
         self.app.add_handler(CommandHandler("info", self.cmd_info))
         self.app.add_handler(CommandHandler("admin", self.cmd_admin))
+        self.app.add_handler(CommandHandler("ingest", self.admin_handler.handle_ingest_command))
 
         # Callback buttons
         self.app.add_handler(CallbackQueryHandler(self.on_callback))
@@ -69,7 +79,7 @@ class VCFGeneratorBot:
         self.app.add_error_handler(self.on_error)
 
     # =========================
-    # Jobs (auto-backup DB)
+    # Jobs (auto-backup DB, session GC)
     # =========================
     def _setup_jobs(self):
         # backup tiap hari jam 00:00
@@ -78,21 +88,38 @@ class VCFGeneratorBot:
             time=datetime.time(hour=0, minute=0, second=0),  # jam server
             name="daily_backup_db"
         )
+        # buang sesi idle / lewat budget secara berkala
+        self.app.job_queue.run_repeating(
+            session_gc.job_collect,
+            interval=SESSION_GC_INTERVAL,
+            first=SESSION_GC_INTERVAL,
+            name="session_gc"
+        )
+        # warm-up handler lazy setelah bot sudah polling
+        if HANDLER_PRELOAD_DELAY:
+            self.app.job_queue.run_once(
+                self.job_preload_handlers,
+                when=HANDLER_PRELOAD_DELAY,
+                name="preload_handlers"
+            )
+
+    async def job_preload_handlers(self, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            times = registry.preload()
+            logger.info(f"Handler siap ({len(times)}), total import {sum(times.values()):.1f} ms")
+        except Exception as e:
+            logger.error(f"Preload handler gagal: {e}")
 
     async def job_backup_db(self, context: ContextTypes.DEFAULT_TYPE):
         try:
-            fname = f"users_{datetime.date.today().isoformat()}.db"
-            with open(storage.DB_PATH, "rb") as f:
-                for oid in OWNER_IDS:
-                    try:
-                        await context.bot.send_document(
-                            chat_id=oid,
-                            document=InputFile(f, fname),
-                            caption="📂 Auto-backup DB harian"
-                        )
-                        f.seek(0)
-                    except Exception as e:
-                        logger.warning(f"Gagal kirim backup ke {oid}: {e}")
+            path = await db_backup.create_snapshot(compress=BACKUP_COMPRESS)
+            ext = ".db.gz" if BACKUP_COMPRESS else ".db"
+            fname = f"users_{datetime.date.today().isoformat()}{ext}"
+            await db_backup.send_snapshot(
+                context.bot, OWNER_IDS, path,
+                filename=fname,
+                caption="📂 Auto-backup DB harian"
+            )
         except Exception as e:
             logger.error(f"Job backup DB gagal: {e}")
 
@@ -122,6 +149,7 @@ class VCFGeneratorBot:
         query = update.callback_query
         data = (query.data or "").strip()
         await query.answer()
+        session_gc.touch(context)
 
         if data.startswith("admin:"):
             return await self.admin_handler.handle_callback(update, context)
@@ -161,7 +189,7 @@ class VCFGeneratorBot:
         if data in ("input_add_navy", "input_admin_only"):
             await TextToVCFHandler().handle_input_choice(query, context); return
 
-        if data in ("cv_v1", "cv_v2", "output_default", "output_custom", "v2_proceed", "v2_format", "v2_input"):
+        if data in ("cv_v1", "cv_v2", "output_default", "output_custom", "v1_dedup", "v2_proceed", "v2_format", "v2_input"):
             await TxtToVCFHandler().handle_callback(query, context); return
 
         if data == "cv_vcf_to_txt":
@@ -169,8 +197,8 @@ class VCFGeneratorBot:
         if data in ("vcf_separate", "vcf_merge"):
             await VCFToTxtHandler().handle_callback(query, context); return
 
-        if data in ("merge_txt", "merge_vcf"):
-            await MergeFilesHandler().handle_callback(update, context); return
+        if data in ("merge_txt", "merge_vcf", "merge_vcf_dedup"):
+            await MergeFilesHandler().handle_callback(query, context); return
 
         if data == "count_files":
             await CountFilesHandler().start_mode(query, context); return
@@ -186,16 +214,20 @@ class VCFGeneratorBot:
             await RemoveCtcVcfHandler().start_mode(query, context); return
         if data == "edit_ctc_name":
             await EditCtcNameHandler().start_mode(query, context); return
+        if data in ("editctc_num_file", "editctc_num_global"):
+            await EditCtcNameHandler().handle_callback(query, context); return
         if data == "get_name_file":
             await GetNameFileHandler().start_mode(query, context); return
 
         if data == "split_files":
             await SplitFilesHandler().start_mode(query, context); return
-        if data in ("split_done", "split_custom"):
+        if data in ("split_done", "split_custom", "split_by_count", "split_by_size", "split_by_bytes"):
             await SplitFilesHandler().handle_callback(query, context); return
 
         if data == "txt_vcf_to_text":
             await TxtVcfToTextHandler().start_mode(query, context); return
+        if data.startswith("t2t_page:"):
+            await TxtVcfToTextHandler().handle_callback(query, context); return
 
         await query.edit_message_text(
             "🚧 Fitur ini akan segera hadir!\n\nGunakan /start untuk kembali ke menu utama.",
@@ -209,7 +241,10 @@ class VCFGeneratorBot:
         allowed = await ensure_access_feature(update, context)
         if not allowed:
             return
+        session_gc.touch(context)
 
+        if context.user_data.get(KEY_ADMIN_BROADCAST_WAIT) and is_owner(update.effective_user.id):
+            await self.admin_handler.handle_broadcast_document(update, context); return
         if context.user_data.get("waiting_for_count_files"):
             await CountFilesHandler().handle_document(update, context); return
         if context.user_data.get("waiting_for_txt_files"):
@@ -222,7 +257,7 @@ class VCFGeneratorBot:
             await MergeFilesHandler().handle_document(update, context, "vcf"); return
         if context.user_data.get("waiting_for_add_vcf_file"):
             await AddCtcVcfHandler().handle_document(update, context); return
-        if context.user_data.get("waiting_for_remove_vcf_file"):
+        if context.user_data.get("waiting_for_remove_vcf_file") or context.user_data.get("waiting_for_phone_to_remove"):
             await RemoveCtcVcfHandler().handle_document(update, context); return
         if context.user_data.get("waiting_for_edit_vcf_files"):
             await EditCtcNameHandler().handle_document(update, context); return
@@ -230,6 +265,8 @@ class VCFGeneratorBot:
             await GetNameFileHandler().handle_document(update, context); return
         if context.user_data.get("waiting_for_split_files"):
             await SplitFilesHandler().handle_document(update, context); return
+        if context.user_data.get("waiting_for_string"):
+            await TextToVCFHandler().handle_document(update, context); return
         if context.user_data.get("waiting_for_txt_vcf_to_text"):
             await TxtVcfToTextHandler().handle_document(update, context); return
 
@@ -242,6 +279,7 @@ class VCFGeneratorBot:
         allowed = await ensure_access_feature(update, context)
         if not allowed:
             return
+        session_gc.touch(context)
 
         if any(key in context.user_data for key in ("waiting_for_group_basename", "waiting_for_group_count")):
             await CreateGroupNameHandler().handle_text(update, context); return
@@ -0,0 +1,185 @@
+# output_pipeline.py
+import io
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Iterable, Optional
+
+from telegram import InputFile
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+
+from config import (
+    SLEEP_BETWEEN_FILES, UPLOAD_WORKERS, UPLOAD_QUEUE_SIZE, UPLOAD_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["run_output_pipeline", "reply_document_sender", "format_failures"]
+
+# job hasil render: (filename, payload_bytes, meta) — None = lewati job ini,
+# payload kosong = dicatat gagal ("isi kosong")
+Rendered = Optional[tuple]
+
+_DONE = object()
+_MD_STRIP = str.maketrans("", "", "*_`[]")
+
+
+# =========================
+# Sender bawaan
+# =========================
+def reply_document_sender(message) -> Callable[[str, bytes], Awaitable]:
+    """Sender untuk reply_document di `message`; BytesIO dibuat ulang tiap percobaan."""
+    async def send(filename: str, payload: bytes):
+        bio = io.BytesIO(payload)
+        bio.name = filename
+        return await message.reply_document(InputFile(bio, filename=filename))
+    return send
+
+def format_failures(failed: list, limit: int = 10) -> list:
+    """Baris ringkasan file gagal (untuk disisipkan ke summary)."""
+    if not failed:
+        return []
+    lines = [f"❌ *Gagal:* {len(failed)} file"]
+    for f in failed[:limit]:
+        lines.append(f"• `{f['filename'].translate(_MD_STRIP)}` — {str(f['error']).translate(_MD_STRIP)[:80]}")
+    if len(failed) > limit:
+        lines.append(f"_dan {len(failed) - limit} file lain_")
+    return lines
+
+
+# =========================
+# Pipeline
+# =========================
+class _Limiter:
+    """Jarak minimal antar upload, dipakai bersama semua worker."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._last = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            delay = self._last + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last = time.monotonic()
+
+async def _send_with_retry(send, filename: str, payload: bytes, retries: int):
+    attempt = 0
+    while True:
+        try:
+            return await send(filename, payload)
+        except RetryAfter as e:
+            delay = getattr(e, "retry_after", 1) or 1
+            if hasattr(delay, "total_seconds"):
+                delay = delay.total_seconds()
+            delay = float(delay)
+        except BadRequest:
+            raise
+        except (TimedOut, NetworkError):
+            delay = 1.0 * (2 ** attempt)
+        attempt += 1
+        if attempt > retries:
+            raise
+        logger.warning(f"[Pipeline] retry {attempt}/{retries} {filename} dalam {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+async def run_output_pipeline(
+    jobs: Iterable,
+    render: Callable[[object], Rendered],
+    send: Callable[[str, bytes], Awaitable],
+    *,
+    workers: int = UPLOAD_WORKERS,
+    queue_size: int = UPLOAD_QUEUE_SIZE,
+    retries: int = UPLOAD_RETRIES,
+    min_interval: float = SLEEP_BETWEEN_FILES,
+    ordered: bool = True,
+    on_progress: Optional[Callable[[int], Awaitable]] = None,
+) -> dict:
+    """
+    Producer/consumer untuk output multi-file.
+    - Producer: ambil job dari `jobs` (lazy), `render(job)` di worker thread
+      → (filename, bytes, meta) → masuk queue ber-batas (maks `queue_size`).
+    - Consumer: `workers` uploader; file dikirim berurutan sesuai urutan job,
+      jarak antar upload ≥ `min_interval`, retry per file untuk timeout/flood.
+      ordered=True → upload bergiliran sesuai urutan job (urutan di chat terjaga);
+      ordered=False → `workers` upload benar-benar paralel.
+    Return report: {"sent": [...], "failed": [...], "total": n}
+      sent   = [{"index","filename","meta","result"}] urut index
+      failed = [{"index","filename","error"}] urut index
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(queue_size, 1))
+    limiter = _Limiter(min_interval)
+    turn = asyncio.Condition()
+    state = {"next": 0, "total": 0}
+    sent, failed = [], []
+
+    async def producer():
+        idx = 0
+        try:
+            for job in jobs:
+                try:
+                    item = await asyncio.to_thread(render, job)
+                    err = None
+                except Exception as e:
+                    logger.error(f"[Pipeline] render #{idx} gagal: {e}")
+                    item, err = None, f"render: {e}"
+                await queue.put((idx, item, err))
+                idx += 1
+        finally:
+            state["total"] = idx
+            for _ in range(max(workers, 1)):
+                await queue.put(_DONE)
+
+    async def consumer():
+        while True:
+            entry = await queue.get()
+            if entry is _DONE:
+                return
+            idx, item, err = entry
+
+            # tunggu giliran supaya urutan file di chat sama dengan urutan job
+            if ordered:
+                async with turn:
+                    await turn.wait_for(lambda: state["next"] == idx)
+
+            try:
+                if item is None:
+                    if err:
+                        failed.append({"index": idx, "filename": f"#{idx + 1}", "error": err})
+                    continue
+                filename, payload, meta = item
+                if not payload:
+                    failed.append({"index": idx, "filename": filename, "error": "isi kosong"})
+                    continue
+                await limiter.wait()
+                try:
+                    result = await _send_with_retry(send, filename, payload, retries)
+                    sent.append({"index": idx, "filename": filename, "meta": meta, "result": result})
+                except Exception as e:
+                    logger.error(f"[Pipeline] upload {filename} gagal: {e}")
+                    failed.append({"index": idx, "filename": filename, "error": str(e) or type(e).__name__})
+                if on_progress:
+                    try:
+                        await on_progress(len(sent) + len(failed))
+                    except Exception:
+                        pass
+            finally:
+                if ordered:
+                    async with turn:
+                        state["next"] = idx + 1
+                        turn.notify_all()
+
+    prod = asyncio.create_task(producer())
+    cons = [asyncio.create_task(consumer()) for _ in range(max(workers, 1))]
+    try:
+        await asyncio.gather(prod, *cons)
+    finally:
+        for t in (prod, *cons):
+            if not t.done():
+                t.cancel()
+
+    sent.sort(key=lambda r: r["index"])
+    failed.sort(key=lambda r: r["index"])
+    return {"sent": sent, "failed": failed, "total": state["total"]}
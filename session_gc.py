@@ -0,0 +1,176 @@
+# session_gc.py
+import sys
+import time
+import asyncio
+import logging
+from typing import Dict
+
+from config import SESSION_IDLE_TTL, SESSION_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["touch", "approx_size", "collect", "job_collect", "get_stats"]
+
+# key timestamp aktivitas terakhir di user_data
+KEY_LAST_ACTIVE = "_last_active_ts"
+
+# bucket sesi per-pesan di chat_data (lihat SESSION_BUCKET di features/*)
+SESSION_BUCKETS = (
+    "merge_files_sessions",
+    "edit_ctc_sessions",
+    "vcf_to_txt_sessions",
+    "t2t_sessions",
+)
+
+# Instrumentasi GC terakhir + akumulasi sejak start
+_STATS: Dict[str, int] = {
+    "runs": 0,
+    "last_run_ts": 0,
+    "users_tracked": 0,
+    "user_bytes": 0,
+    "chat_bytes": 0,
+    "evicted_users_idle": 0,
+    "evicted_users_budget": 0,
+    "evicted_chat_sessions": 0,
+    "freed_bytes": 0,
+}
+
+
+# =========================
+# Helpers
+# =========================
+def touch(context) -> None:
+    """Tandai user aktif (dipanggil di setiap update)."""
+    try:
+        context.user_data[KEY_LAST_ACTIVE] = time.time()
+    except Exception:
+        pass
+
+def approx_size(obj) -> int:
+    """
+    Perkiraan ukuran objek (byte), rekursif untuk dict/list/tuple/set.
+    Objek lain (Message, Task, dll) dihitung dangkal saja.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        o = stack.pop()
+        oid = id(o)
+        if oid in seen:
+            continue
+        seen.add(oid)
+        try:
+            total += sys.getsizeof(o)
+        except Exception:
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+    return total
+
+def _cancel_tasks(data: dict) -> None:
+    """Batalkan task debounce yang masih jalan sebelum sesi dibuang."""
+    for v in list(data.values()):
+        if isinstance(v, asyncio.Task) and not v.done():
+            v.cancel()
+
+
+# =========================
+# GC
+# =========================
+def _collect_users(application, now: float) -> None:
+    for uid, data in list(application.user_data.items()):
+        if not data:
+            continue
+        size = approx_size(data)
+        last = float(data.get(KEY_LAST_ACTIVE) or 0)
+
+        reason = None
+        if last and now - last > SESSION_IDLE_TTL:
+            reason = "evicted_users_idle"
+        elif size > SESSION_MAX_BYTES:
+            reason = "evicted_users_budget"
+
+        if reason:
+            _cancel_tasks(data)
+            data.clear()
+            application.drop_user_data(uid)
+            _STATS[reason] += 1
+            _STATS["freed_bytes"] += size
+            logger.info(f"[SessionGC] user {uid} dibuang ({reason}, ~{size} B)")
+            continue
+
+        # user lama tanpa timestamp → mulai dihitung dari sekarang
+        if not last:
+            data[KEY_LAST_ACTIVE] = now
+        _STATS["users_tracked"] += 1
+        _STATS["user_bytes"] += size
+
+def _collect_chats(application, now: float) -> None:
+    for cid, data in list(application.chat_data.items()):
+        for bucket_key in SESSION_BUCKETS:
+            bucket = data.get(bucket_key)
+            if not bucket:
+                continue
+
+            sizes = {}
+            for msg_id, sess in list(bucket.items()):
+                ts = float((sess or {}).get("ts") or 0)
+                if now - ts > SESSION_IDLE_TTL:
+                    freed = approx_size(sess)
+                    bucket.pop(msg_id, None)
+                    _STATS["evicted_chat_sessions"] += 1
+                    _STATS["freed_bytes"] += freed
+                else:
+                    sizes[msg_id] = approx_size(sess)
+
+            # lewat budget → buang sesi paling lama dulu
+            total = sum(sizes.values())
+            if total > SESSION_MAX_BYTES:
+                oldest = sorted(sizes, key=lambda m: float(bucket[m].get("ts") or 0))
+                for msg_id in oldest:
+                    if total <= SESSION_MAX_BYTES:
+                        break
+                    bucket.pop(msg_id, None)
+                    total -= sizes[msg_id]
+                    _STATS["evicted_chat_sessions"] += 1
+                    _STATS["freed_bytes"] += sizes[msg_id]
+
+            if not bucket:
+                data.pop(bucket_key, None)
+            _STATS["chat_bytes"] += total
+
+def collect(application) -> Dict[str, int]:
+    """Satu putaran GC: buang sesi idle / lewat budget. Return snapshot stats."""
+    now = time.time()
+    _STATS["users_tracked"] = 0
+    _STATS["user_bytes"] = 0
+    _STATS["chat_bytes"] = 0
+
+    _collect_users(application, now)
+    _collect_chats(application, now)
+
+    _STATS["runs"] += 1
+    _STATS["last_run_ts"] = int(now)
+    return get_stats()
+
+async def job_collect(context) -> None:
+    """Callback job_queue (run_repeating)."""
+    try:
+        stats = collect(context.application)
+        logger.info(
+            "[SessionGC] users=%d user_bytes=%d chat_bytes=%d evicted_idle=%d "
+            "evicted_budget=%d evicted_chat=%d freed=%d",
+            stats["users_tracked"], stats["user_bytes"], stats["chat_bytes"],
+            stats["evicted_users_idle"], stats["evicted_users_budget"],
+            stats["evicted_chat_sessions"], stats["freed_bytes"],
+        )
+    except Exception as e:
+        logger.error(f"[SessionGC] gagal: {e}")
+
+def get_stats() -> Dict[str, int]:
+    """Snapshot instrumentasi GC (untuk log / panel admin)."""
+    return dict(_STATS)
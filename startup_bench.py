@@ -0,0 +1,131 @@
+# startup_bench.py
+"""
+Ukur cold start bot tanpa koneksi ke Telegram (token dummy, DB sementara).
+
+  python -m startup_bench [--runs 5]              # import main + build VCFGeneratorBot, proses baru tiap run
+  python -m startup_bench --importtime [--top 20] # ringkasan `python -X importtime -c "import main"`
+
+Tambah --json untuk output mesin.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# dijalankan di proses baru: fase import / build Application / preload handler lazy
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+out = {"import_ms": (t1 - t0) * 1000}
+try:
+    main.VCFGeneratorBot()
+    out["build_ms"] = (time.perf_counter() - t1) * 1000
+except Exception as e:   # mis. extra job-queue belum terpasang
+    out["build_error"] = f"{type(e).__name__}: {e}"
+t2 = time.perf_counter()
+import handler_registry
+handler_registry.preload()
+out["preload_ms"] = (time.perf_counter() - t2) * 1000
+print(json.dumps(out))
+"""
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env(db_path: str) -> dict:
+    env = dict(os.environ)
+    env["BOT_TOKEN"] = "0:startup-bench"   # jangan pakai token asli; tidak ada request ke API
+    env["DB_PATH"] = db_path               # users.db asli tidak disentuh
+    return env
+
+def _run(args: list, env: dict) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True)
+
+def bench(runs: int) -> dict:
+    """Cold start `runs` kali (tiap run proses Python baru). Return statistik ms per fase."""
+    samples, errors = defaultdict(list), set()
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        env = _env(os.path.join(tmp, "bench.db"))
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            proc = _run(["-c", _PROBE], env)
+            wall = (time.perf_counter() - t0) * 1000
+            if proc.returncode != 0:
+                raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "probe gagal")
+            probe = json.loads(proc.stdout.strip().splitlines()[-1])
+            errors.add(probe.pop("build_error", None))
+            for k, v in probe.items():
+                samples[k].append(v)
+            samples["process_ms"].append(wall)
+    result = {
+        k: {"min": min(v), "median": statistics.median(v), "max": max(v)}
+        for k, v in samples.items()
+    }
+    errors.discard(None)
+    if errors:
+        result["build_error"] = sorted(errors)
+    return result
+
+def importtime(top: int) -> dict:
+    """Parse `-X importtime` → total, modul terlama (self), dan agregat per paket top-level."""
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        proc = _run(["-X", "importtime", "-c", "import main"], _env(os.path.join(tmp, "bench.db")))
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    per_pkg = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        per_pkg[name.split(".")[0]] += self_us
+    main_row = next((r for r in rows if r[0] == "main" and r[3] == 0), None)
+    return {
+        "total_ms": (main_row[2] if main_row else sum(r[1] for r in rows)) / 1000,
+        "modules": len(rows),
+        "top_self": [{"module": n, "self_ms": s / 1000, "cumulative_ms": c / 1000}
+                     for n, s, c, _ in sorted(rows, key=lambda r: r[1], reverse=True)[:top]],
+        "by_package": [{"package": p, "self_ms": us / 1000}
+                       for p, us in sorted(per_pkg.items(), key=lambda kv: kv[1], reverse=True)[:top]],
+    }
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m startup_bench", description="Benchmark cold start bot.")
+    ap.add_argument("--runs", type=int, default=5, help="jumlah run cold start (default 5)")
+    ap.add_argument("--importtime", action="store_true", help="ringkasan -X importtime")
+    ap.add_argument("--top", type=int, default=15, help="jumlah baris teratas (mode importtime)")
+    ap.add_argument("--json", action="store_true", help="output JSON")
+    args = ap.parse_args(argv)
+
+    result = importtime(args.top) if args.importtime else bench(max(args.runs, 1))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    if args.importtime:
+        print(f"import main: {result['total_ms']:.1f} ms · {result['modules']} modul")
+        print("\nSelf time terbesar:")
+        for r in result["top_self"]:
+            print(f"  {r['self_ms']:8.2f} ms  (kum. {r['cumulative_ms']:8.2f})  {r['module']}")
+        print("\nPer paket:")
+        for r in result["by_package"]:
+            print(f"  {r['self_ms']:8.2f} ms  {r['package']}")
+    else:
+        print(f"Cold start ({args.runs} run)        min      median   max")
+        for err in result.pop("build_error", []):
+            print(f"  ⚠️ build VCFGeneratorBot gagal: {err}")
+        for k, v in result.items():
+            print(f"  {k:<16} {v['min']:9.1f} {v['median']:9.1f} {v['max']:9.1f}  ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
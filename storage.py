@@ -3,7 +3,7 @@ import sqlite3
 import os
 import logging
 import time
-from typing import Optional, List, Tuple, Dict
+from typing import Optional, Iterator, List, Tuple, Dict
 from config import TRIAL_MINUTES, OWNER_IDS
 
 DB_PATH = os.getenv("DB_PATH", "users.db")
@@ -23,8 +23,42 @@ def _conn():
     conn.row_factory = sqlite3.Row
     return conn
 
+# ==========================================
+# Migrasi skema (PRAGMA user_version)
+# ==========================================
+# (versi, [sql...]) — hanya TAMBAH di akhir, jangan ubah yang sudah ada
+MIGRATIONS = [
+    (1, [
+        "CREATE INDEX IF NOT EXISTS idx_subs_plan_exp ON subscriptions(plan, expires_at)",
+    ]),
+    (2, [
+        "CREATE INDEX IF NOT EXISTS idx_subs_name_nocase ON subscriptions(name COLLATE NOCASE)",
+    ]),
+    # NOCASE hanya melipat ASCII; find_by_name kini pakai lower() Python → index v2 tidak terpakai
+    (3, [
+        "DROP INDEX IF EXISTS idx_subs_name_nocase",
+    ]),
+]
+
+# DB_PATH yang skemanya sudah dicek di proses ini (hindari init ulang tiap query)
+_schema_ready_for: Optional[str] = None
+
+def _migrate(c) -> None:
+    current = c.execute("PRAGMA user_version").fetchone()[0]
+    for version, stmts in MIGRATIONS:
+        if version <= current:
+            continue
+        for sql in stmts:
+            c.execute(sql)
+        c.execute(f"PRAGMA user_version = {int(version)}")
+        logger.info(f"DB migrasi ke versi {version}")
+    c.commit()
+
 def init_db():
-    """Buat tabel jika belum ada."""
+    """Buat tabel jika belum ada + jalankan migrasi yang belum diterapkan."""
+    global _schema_ready_for
+    if _schema_ready_for == DB_PATH:
+        return
     with _conn() as c:
         c.execute("""
         CREATE TABLE IF NOT EXISTS subscriptions (
@@ -42,6 +76,17 @@ def init_db():
         )
         """)
         c.commit()
+        _migrate(c)
+    _schema_ready_for = DB_PATH
+
+def reload() -> None:
+    """
+    Dipanggil setelah file DB diganti (import).
+    Koneksi dibuka per-panggilan (_conn); reset cache skema lalu cek/migrasi ulang.
+    """
+    global _schema_ready_for
+    _schema_ready_for = None
+    init_db()
 
 # ==========================================
 # User / Trial table
@@ -111,6 +156,43 @@ def get_all_subscribers() -> List[Tuple[int, Optional[str], str, Optional[int]]]
         cur = c.execute("SELECT user_id, name, plan, expires_at FROM subscriptions ORDER BY user_id ASC")
         return [(r["user_id"], r["name"], r["plan"], r["expires_at"]) for r in cur.fetchall()]
 
+def iter_subscribers_with_status(now: Optional[int] = None) -> Iterator[Tuple[int, Optional[str], str, Optional[int], str]]:
+    """
+    Semua subscription + status (sama dengan get_user_status) dalam 1 query, dibaca per baris.
+    Yield (user_id, name, plan, expires_at, status) — untuk export besar tanpa query per user.
+    """
+    now = int(time.time()) if now is None else now
+    owners = sorted(OWNER_IDS)
+    owner_in = ",".join("?" * len(owners))
+    # alias paket lama (mis. monthly → 1bulan) dipetakan di SQL lewat PLAN_MAP, sama seperti get_user_status
+    aliases = [(k, v) for k, v in PLAN_MAP.items() if k != v]
+    plan_case = "CASE plan " + " ".join("WHEN ? THEN ?" for _ in aliases) + " ELSE plan END" if aliases else "plan"
+    init_db()
+    c = _conn()
+    try:
+        cur = c.execute(f"""
+        WITH s AS (
+            SELECT user_id, name, plan, expires_at, {plan_case} AS norm_plan
+            FROM subscriptions
+        )
+        SELECT s.user_id, s.name, s.plan, s.expires_at,
+               CASE
+                   WHEN s.user_id IN ({owner_in}) THEN 'owner'
+                   WHEN s.norm_plan = 'permanent' THEN 'permanent'
+                   WHEN s.norm_plan IN ('1hari','1minggu','1bulan') AND COALESCE(s.expires_at, 0) > ? THEN s.norm_plan
+                   WHEN s.norm_plan IN ('1hari','1minggu','1bulan') THEN 'expired'
+                   WHEN COALESCE(u.trial_end, 0) > ? THEN 'trial'
+                   ELSE 'expired'
+               END AS status
+        FROM s
+        LEFT JOIN users u ON u.user_id = s.user_id
+        ORDER BY s.user_id ASC
+        """, (*(x for pair in aliases for x in pair), *owners, now, now))
+        for r in cur:
+            yield r["user_id"], r["name"], r["plan"], r["expires_at"], r["status"]
+    finally:
+        c.close()
+
 def delete_user(user_id: int) -> None:
     """Hapus subscription user (tidak hapus trial)."""
     init_db()
@@ -118,6 +200,49 @@ def delete_user(user_id: int) -> None:
         c.execute("DELETE FROM subscriptions WHERE user_id=?", (user_id,))
         c.commit()
 
+def delete_by_plan(plan: Optional[str] = None) -> int:
+    """Hapus semua subscription dengan plan tertentu (None = semua). Return jumlah terhapus."""
+    init_db()
+    with _conn() as c:
+        if plan is None:
+            cur = c.execute("DELETE FROM subscriptions")
+        else:
+            cur = c.execute("DELETE FROM subscriptions WHERE plan=?", (PLAN_MAP.get(plan, plan),))
+        deleted = cur.rowcount
+        c.commit()
+    return deleted
+
+def delete_many(user_ids: List[int]) -> int:
+    """Hapus subscription banyak user sekaligus (1 transaksi). Return jumlah terhapus."""
+    ids = [(int(u),) for u in user_ids or []]
+    if not ids:
+        return 0
+    init_db()
+    with _conn() as c:
+        before = c.total_changes
+        c.executemany("DELETE FROM subscriptions WHERE user_id=?", ids)
+        deleted = c.total_changes - before
+        c.commit()
+    return deleted
+
+def _py_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+def find_by_name(name: str) -> List[Dict]:
+    """
+    Cari subscription berdasarkan nama (case-insensitive, exact match).
+    Pakai str.lower() Python (Unicode: Élise == élise), bukan COLLATE NOCASE yang hanya ASCII.
+    """
+    init_db()
+    with _conn() as c:
+        c.create_function("py_lower", 1, _py_lower, deterministic=True)
+        cur = c.execute(
+            "SELECT user_id, name, plan, expires_at FROM subscriptions "
+            "WHERE py_lower(name) = ? ORDER BY user_id ASC",
+            ((name or "").strip().lower(),)
+        )
+        return [dict(r) for r in cur.fetchall()]
+
 # ==========================================
 # Status & helpers
 # ==========================================
@@ -157,24 +282,40 @@ def get_user_status(user_id: int) -> Dict:
 def get_active_subscribers() -> List[Dict]:
     """Ambil semua user dengan plan aktif atau permanent."""
     now = int(time.time())
-    rows = get_all_subscribers()
-    active = []
-    for uid, name, plan, exp in rows:
-        if plan == "permanent":
-            active.append({"user_id": uid, "name": name, "plan": plan, "expires_at": None})
-        elif plan in ("1hari", "1minggu", "1bulan") and exp and exp > now:
-            active.append({"user_id": uid, "name": name, "plan": plan, "expires_at": exp})
-    return active
+    init_db()
+    with _conn() as c:
+        cur = c.execute("""
+        SELECT user_id, name, plan,
+               CASE WHEN plan = 'permanent' THEN NULL ELSE expires_at END AS expires_at
+        FROM subscriptions
+        WHERE plan = 'permanent'
+           OR (plan IN ('1hari','1minggu','1bulan') AND expires_at > ?)
+        ORDER BY user_id ASC
+        """, (now,))
+        return [dict(r) for r in cur.fetchall()]
 
 def get_expired_subscribers() -> List[Dict]:
     """Ambil semua user expired (bukan permanent)."""
     now = int(time.time())
-    rows = get_all_subscribers()
-    expired = []
-    for uid, name, plan, exp in rows:
-        if plan != "permanent" and (not exp or exp <= now):
-            expired.append({"user_id": uid, "name": name, "plan": plan, "expires_at": exp})
-    return expired
+    init_db()
+    with _conn() as c:
+        cur = c.execute("""
+        SELECT user_id, name, plan, expires_at
+        FROM subscriptions
+        WHERE plan != 'permanent' AND (expires_at IS NULL OR expires_at <= ?)
+        ORDER BY user_id ASC
+        """, (now,))
+        return [dict(r) for r in cur.fetchall()]
+
+def count_by_plan() -> Dict[str, int]:
+    """Jumlah subscription per plan (GROUP BY), plus key 'total'."""
+    init_db()
+    counts = {"permanent": 0, "1hari": 0, "1minggu": 0, "1bulan": 0}
+    with _conn() as c:
+        for r in c.execute("SELECT plan, COUNT(*) AS n FROM subscriptions GROUP BY plan"):
+            counts[r["plan"]] = r["n"]
+    counts["total"] = sum(counts.values())
+    return counts
 
 def get_user_detail(user_id: int) -> Dict:
     """Ambil detail user (gabungan subscription + status)."""
@@ -1,7 +1,10 @@
 import re
 import io
+import codecs
+import zipfile
 import asyncio
 import time
+import unicodedata
 from typing import Optional
 
 # =========================
@@ -38,20 +41,168 @@ def normalize_phone(phone: str) -> str:
 
 def normalize_phone_for_txt_output(phone: str) -> str:
     """Untuk output TXT (fitur VCF->TXT): tambah + kalau belum ada."""
-    phone = str(phone).strip()
-    return phone if phone.startswith('+') else '+' + phone
+    return normalize_phone(phone)
 
 def normalize_phone_list_format(phone_list: list) -> list:
     """Normalisasi list nomor: pastikan semua diawali '+' (dipakai TXT->VCF)."""
     if not phone_list:
         return []
+    return [normalize_phone(p) for p in phone_list]
+
+# =========================
+# Batch normalizer (translate table + 1 regex)
+# =========================
+class _PhoneCharTable(dict):
+    """
+    Tabel str.translate: digit (termasuk digit unicode) → digit ASCII, '+' tetap,
+    karakter lain dibuang. Diisi lazy & di-cache per code point.
+    """
+    def __missing__(self, cp):
+        ch = chr(cp)
+        if ch == '+':
+            val = '+'
+        elif ch.isdecimal():
+            val = str(unicodedata.decimal(ch))
+        else:
+            val = None
+        self[cp] = val
+        return val
+
+_PHONE_TABLE = _PhoneCharTable()
+
+# setelah translate: '+' di depan (boleh ganda), sisanya digit & '+' nyasar
+_PHONE_SHAPE = re.compile(r'(\+*)([\d+]*)')
+
+def _local_prefix_re(local_prefixes: tuple):
+    """Regex prefix lokal (terpanjang dulu), mis. ('0',) → ^(?:0)."""
+    alts = sorted(local_prefixes, key=len, reverse=True)
+    return re.compile('^(?:' + '|'.join(re.escape(p) for p in alts) + ')')
+
+_LOCAL_PREFIX_CACHE = {}
+
+def normalize_many(
+    phones,
+    country_code: Optional[str] = None,
+    local_prefixes: tuple = ('0',),
+    min_digits: int = 0,
+    add_plus: bool = True,
+):
+    """
+    Normalisasi banyak nomor sekaligus.
+    - Buang semua karakter selain digit dan '+' (1x translate per nomor),
+      '+' hanya dipertahankan di depan.
+    - country_code (mis. '62'): nomor tanpa '+' yang diawali prefix lokal
+      ('0812…') diganti jadi '+62812…'. None = tidak asumsi kode negara.
+    - min_digits > 0: nomor dengan digit lebih sedikit dibuang (too_short).
+    Return (list_nomor, stats) dengan stats = {total, valid, invalid, too_short, converted}.
+    """
+    stats = {"total": 0, "valid": 0, "invalid": 0, "too_short": 0, "converted": 0}
     out = []
-    for p in phone_list:
-        p = str(p).strip()
-        if not p.startswith('+'):
-            p = '+' + p
-        out.append(p)
-    return out
+    table = _PHONE_TABLE
+    shape = _PHONE_SHAPE.match
+
+    local_re = None
+    if country_code:
+        country_code = country_code.lstrip('+')
+        local_re = _LOCAL_PREFIX_CACHE.get(local_prefixes)
+        if local_re is None:
+            local_re = _LOCAL_PREFIX_CACHE[local_prefixes] = _local_prefix_re(local_prefixes)
+
+    for raw in phones:
+        stats["total"] += 1
+        m = shape(str(raw).translate(table))
+        plus, digits = m.group(1), m.group(2).replace('+', '')
+        if not digits:
+            stats["invalid"] += 1
+            continue
+        if min_digits and len(digits) < min_digits:
+            stats["too_short"] += 1
+            continue
+        if not plus and local_re is not None:
+            lm = local_re.match(digits)
+            if lm:
+                digits = country_code + digits[lm.end():]
+                plus = '+'
+                stats["converted"] += 1
+        out.append('+' + digits if (plus or add_plus) else digits)
+    stats["valid"] = len(out)
+    return out, stats
+
+# =========================
+# Count-only scanner (bytes, tanpa decode)
+# =========================
+# Buffer dipindai per jendela tetap (bytes/bytearray/mmap): tiap langkah hanya menyalin
+# ≤ _SCAN_WINDOW byte, tidak pernah seluruh buffer, dan tidak ada objek per baris.
+_SCAN_WINDOW = 1 << 20
+
+# baris → 1 byte penanda: line-break ala str.splitlines() jadi '\n', isi lain jadi 'a';
+# spasi/tab/\x1f dihapus → baris non-kosong = kemunculan "\na" (tidak bisa tumpang tindih)
+_LINE_MARKS = bytes(
+    0x0A if b in b"\n\r\x0b\x0c\x1c\x1d\x1e" else 0x61 for b in range(256)
+)
+_BLANK_BYTES = b" \t\x1f"
+
+def count_nonblank_lines(data) -> int:
+    """
+    Jumlah baris non-kosong langsung dari bytes/bytearray/mmap (tanpa decode/splitlines).
+    Dipindai per jendela: translate → penanda baris, lalu count(b"\\na") di C.
+    Catatan: spasi non-ASCII (mis. NBSP) dianggap isi, bukan kosong.
+    """
+    n, in_line = 0, False
+    for a in range(0, len(data or b""), _SCAN_WINDOW):
+        w = data[a:a + _SCAN_WINDOW].translate(_LINE_MARKS, _BLANK_BYTES)
+        if not w:
+            continue
+        # baris yang terpotong batas jendela tidak dihitung dua kali
+        n += w.count(b"\na") + (w[0] == 0x61 and not in_line)
+        in_line = w[-1] == 0x61
+    return n
+
+def iter_buffer_lines(buf):
+    """
+    Iterasi baris (bytes, newline ikut) dari bytes/bytearray/mmap tanpa decode.
+    mmap dibaca lewat readline dari awal (tanpa salinan seluruh isi);
+    BOM UTF-8 di baris pertama dibuang.
+    """
+    if hasattr(buf, "readline"):
+        buf.seek(0)
+        lines = iter(buf.readline, b"")
+    else:
+        lines = io.BytesIO(buf)
+    first = next(lines, None)
+    if first is None:
+        return
+    if first.startswith(codecs.BOM_UTF8):
+        first = first[len(codecs.BOM_UTF8):]
+    yield first
+    yield from lines
+
+# baris kartu/TEL yang tidak berada tepat di awal baris: diawali spasi/tab dan/atau prefix grup (item1.TEL)
+_VCF_IRREGULAR = re.compile(rb"\n(?:[ \t]+(BEGIN:VCARD)|[ \t]*[A-Z0-9-]+\.TEL[;:]|[ \t]+TEL[;:])")
+
+def count_vcf_bytes(data) -> tuple:
+    """
+    Hitung (jumlah_kartu, jumlah_TEL) dari bytes/bytearray/mmap VCF.
+    Kartu = baris BEGIN:VCARD, TEL = baris TEL;/TEL: (case-insensitive, boleh diawali spasi
+    dan/atau prefix grup `item1.`). Dipindai per jendela yang dipotong di batas baris.
+    """
+    cards = tels = 0
+    end = len(data or b"")
+    a = len(codecs.BOM_UTF8) if end and data[:3] == codecs.BOM_UTF8 else 0
+    while a < end:
+        b = data.find(b"\n", min(a + _SCAN_WINDOW, end))
+        b = end if b < 0 else b
+        w = b"\n" + data[a:b].upper()   # jendela selalu mulai di awal baris
+        cards += w.count(b"\nBEGIN:VCARD")
+        tels += w.count(b"\nTEL;") + w.count(b"\nTEL:")
+        if b"\n " in w or b"\n\t" in w or b".TEL" in w:
+            for m in _VCF_IRREGULAR.finditer(w):
+                if m.group(1):
+                    cards += 1
+                else:
+                    tels += 1
+        a = b
+    return cards, tels
 
 # =========================
 # VCF parsing/creation
@@ -78,78 +229,100 @@ def clean_phone_number(phone: str) -> str:
     """Bersihkan nomor: sisakan digit dan +; rapikan tanda + ganda."""
     if not phone:
         return phone
-    cleaned = re.sub(r'[^\d+]', '', str(phone).strip())
-    if cleaned.startswith('+'):
-        cleaned = '+' + re.sub(r'\+', '', cleaned[1:])
-    else:
-        cleaned = re.sub(r'\+', '', cleaned)
-    return cleaned
+    m = _PHONE_SHAPE.match(str(phone).translate(_PHONE_TABLE))
+    digits = m.group(2).replace('+', '')
+    return ('+' + digits) if m.group(1) else digits
 
-def create_vcf_content(text_input: str):
+# =========================
+# Mode FORMAT (/string): tokenizer streaming + writer buffer
+# =========================
+def read_format_header(lines) -> Optional[str]:
     """
-    Konversi format string (mode /string) ke VCF.
-    Return: (vcf_content, filename, contact_stats) atau (None, None, None) jika invalid.
+    Konsumsi 2 baris pertama iterator format: baris-1 nama file, baris-2 KOSONG.
+    Return nama file (.vcf) atau None jika format salah.
     """
-    if not isinstance(text_input, str):
-        return None, None, None
+    first = next(lines, None)
+    second = next(lines, None)
+    if first is None or second is None or second.strip():
+        return None
+    filename = first.strip()
+    if not filename:
+        return None
+    return filename if filename.endswith('.vcf') else filename + '.vcf'
 
-    lines = text_input.split('\n')
+def iter_format_blocks(lines):
+    """
+    Tokenizer blok (dipisah baris kosong), baris dibaca satu per satu.
+    Yield (nama, [nomor_mentah, ...]); blok tanpa nomor dilewati.
+    """
+    cur = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            cur.append(line)
+            continue
+        if len(cur) >= 2:
+            yield cur[0], cur[1:]
+        cur = []
+    if len(cur) >= 2:
+        yield cur[0], cur[1:]
 
-    # buang trailing empty lines
-    while lines and not lines[-1].strip():
-        lines.pop()
+def write_format_vcf(blocks, out):
+    """
+    Tulis kartu tiap blok langsung ke `out` (file-like teks, di-buffer pemanggil).
+    Yield (nama, jumlah_nomor) setelah tiap blok selesai ditulis → stats incremental.
+    """
+    for raw_name, raw_phones in blocks:
+        name_base = clean_name_for_vcf(raw_name)
+        phones, _ = normalize_many(raw_phones)
+        if not phones:
+            continue
+        numbered = len(phones) > 1
+        out.writelines(
+            "BEGIN:VCARD\nVERSION:3.0\n"
+            f"FN:{name_base} {i}\nTEL:{phone}\nEND:VCARD\n" if numbered else
+            "BEGIN:VCARD\nVERSION:3.0\n"
+            f"FN:{name_base}\nTEL:{phone}\nEND:VCARD\n"
+            for i, phone in enumerate(phones, 1)
+        )
+        yield name_base, len(phones)
 
-    if len(lines) < 4:  # minimal: filename, blank line, name, phone
+def build_vcf_from_format(stream):
+    """
+    Proses format dari file-like teks (StringIO / TextIOWrapper) → bytes VCF.
+    Baris dibaca lazy dan output ditulis lewat writer ber-buffer ke BytesIO,
+    jadi file format 100rb+ baris tetap linear.
+    Return (vcf_bytes, filename, contact_stats) atau (None, None, None) jika invalid.
+    """
+    lines = (ln.rstrip('\r\n') for ln in stream)
+    filename = read_format_header(lines)
+    if not filename:
         return None, None, None
 
-    filename = lines[0].strip()
-    if not filename.endswith('.vcf'):
-        filename += '.vcf'
+    raw = io.BytesIO()
+    out = io.TextIOWrapper(raw, encoding='utf-8', newline='\n')
+    stats = {}
+    for name, count in write_format_vcf(iter_format_blocks(lines), out):
+        stats[name] = stats.get(name, 0) + count
+    out.flush()
+    data = raw.getvalue()
+    out.close()
 
-    # baris kedua harus kosong
-    if lines[1].strip():
+    if not stats:
         return None, None, None
+    return data, filename, stats
 
-    # mulai blok kontak dari baris ke-3
-    contact_lines = lines[2:]
-
-    # split per blok (dipisah baris kosong)
-    blocks = []
-    cur = []
-    for line in contact_lines:
-        if line.strip():
-            cur.append(line.strip())
-        else:
-            if cur:
-                blocks.append(cur)
-                cur = []
-    if cur:
-        blocks.append(cur)
-
-    if not blocks:
+def create_vcf_content(text_input: str):
+    """
+    Konversi format string (mode /string) ke VCF.
+    Return: (vcf_content, filename, contact_stats) atau (None, None, None) jika invalid.
+    """
+    if not isinstance(text_input, str):
         return None, None, None
-
-    vcf_content = ""
-    stats = {}
-
-    for block in blocks:
-        if len(block) < 2:
-            continue
-        name_base = clean_name_for_vcf(block[0])
-        phones = block[1:]
-        stats[name_base] = len(phones)
-
-        for i, phone in enumerate(phones, 1):
-            clean_phone = clean_phone_number(phone)
-            if clean_phone and not clean_phone.startswith('+'):
-                clean_phone = '+' + clean_phone
-            name = f"{name_base} {i}" if len(phones) > 1 else name_base
-            vcf_content += (
-                "BEGIN:VCARD\nVERSION:3.0\n"
-                f"FN:{name}\nTEL:{clean_phone}\nEND:VCARD\n"
-            )
-
-    return vcf_content, filename, stats
+    data, filename, stats = build_vcf_from_format(io.StringIO(text_input.rstrip('\n')))
+    if data is None:
+        return None, None, None
+    return data.decode('utf-8'), filename, stats
 
 def create_vcf_from_phones(
     phone_numbers: list,
@@ -167,7 +340,6 @@ def create_vcf_from_phones(
       -> selalu beri akhiran 1..N untuk list ini saja (local numbering).
     """
     contact_name = clean_name_for_vcf(contact_name)
-    vcf = ""
 
     # Normalisasi nomor dulu (pastikan ada '+')
     normalized = normalize_phone_list_format(phone_numbers)
@@ -175,26 +347,19 @@ def create_vcf_from_phones(
     # Mode global numbering: selalu pakai akhiran index absolut
     if start_index is not None:
         idx = int(start_index)
-        for phone in normalized:
-            name = f"{contact_name} {idx}"
-            vcf += (
-                "BEGIN:VCARD\nVERSION:3.0\n"
-                f"FN:{name}\nTEL:{phone}\nEND:VCARD\n"
-            )
-            idx += 1
-        return vcf
-
-    # Mode lama / local numbering
-    for i, phone in enumerate(normalized, 1):
-        if force_numbering or len(normalized) > 1:
-            name = f"{contact_name} {i}"
-        else:
-            name = contact_name
-        vcf += (
+        return "".join(
             "BEGIN:VCARD\nVERSION:3.0\n"
-            f"FN:{name}\nTEL:{phone}\nEND:VCARD\n"
+            f"FN:{contact_name} {i}\nTEL:{phone}\nEND:VCARD\n"
+            for i, phone in enumerate(normalized, idx)
         )
-    return vcf
+
+    # Mode lama / local numbering
+    numbered = force_numbering or len(normalized) > 1
+    return "".join(
+        "BEGIN:VCARD\nVERSION:3.0\n"
+        f"FN:{contact_name + ' ' + str(i) if numbered else contact_name}\nTEL:{phone}\nEND:VCARD\n"
+        for i, phone in enumerate(normalized, 1)
+    )
 
 def create_vcf_from_contacts(contacts: list) -> str:
     """Buat VCF dari list dict contacts."""
@@ -228,27 +393,58 @@ def generate_custom_filenames(base_name: str, total_files: int) -> list:
     base_part, start_num = m.group(1), int(m.group(2))
     return [f"{base_part}{start_num + i}.vcf" for i in range(total_files or 0)]
 
-def split_phones_into_batches(phones: list, contacts_per_file: int, total_files: int) -> list:
-    """
-    Bagi list nomor menjadi beberapa batch.
-    (Dipakai V2 TXT->VCF)
-    """
-    batches = []
-    if not phones or contacts_per_file <= 0 or total_files <= 0:
-        return batches
+class SliceView:
+    """View read-only [start:stop] atas list tanpa menyalin isinya."""
+    __slots__ = ("_seq", "start", "stop")
+
+    def __init__(self, seq, start: int, stop: int):
+        self._seq, self.start, self.stop = seq, start, stop
 
-    phones_per_batch = len(phones) // total_files
-    remainder = len(phones) % total_files
+    def __len__(self):
+        return self.stop - self.start
 
+    def __iter__(self):
+        seq = self._seq
+        for i in range(self.start, self.stop):
+            yield seq[i]
+
+def plan_batch_sizes(total: int, contacts_per_file: int, total_files: int):
+    """Ukuran tiap batch: rata ke total_files file, maksimal contacts_per_file."""
+    if total <= 0 or contacts_per_file <= 0 or total_files <= 0:
+        return
+    per_batch, remainder = divmod(total, total_files)
     start = 0
     for i in range(total_files):
-        batch_size = min(contacts_per_file, phones_per_batch + (1 if i < remainder else 0))
-        end = min(start + batch_size, len(phones))
-        batches.append(phones[start:end])
-        start = end
-        if start >= len(phones):
+        size = min(contacts_per_file, per_batch + (1 if i < remainder else 0), total - start)
+        if size <= 0:
             break
-    return [b for b in batches if b]
+        yield start, size
+        start += size
+
+def iter_phone_batches(
+    phones: list,
+    contacts_per_file: int,
+    total_files: int,
+    file_base: str,
+    start_num: int = 1,
+    start_index: int = 1,
+):
+    """
+    Generator batch V2 (lazy): yield (filename, start_index, SliceView) per file.
+    start_index = nomor urut nama kontak pertama di file tsb (global lintas file).
+    """
+    for i, (start, size) in enumerate(plan_batch_sizes(len(phones or []), contacts_per_file, total_files)):
+        yield f"{file_base}{start_num + i}.vcf", start_index + start, SliceView(phones, start, start + size)
+
+def split_phones_into_batches(phones: list, contacts_per_file: int, total_files: int) -> list:
+    """
+    Bagi list nomor menjadi beberapa batch.
+    (Dipakai V2 TXT->VCF; versi lazy: iter_phone_batches)
+    """
+    return [
+        phones[start:start + size]
+        for start, size in plan_batch_sizes(len(phones or []), contacts_per_file, total_files)
+    ]
 
 # =========================
 # MERGE helpers (TXT/VCF)
@@ -311,6 +507,24 @@ async def send_txt_file(update, filename: str, txt_content: str, stats_msg: str
         parse_mode='Markdown' if stats_msg else None
     )
 
+def build_zip(files: list) -> bytes:
+    """
+    Bungkus banyak output jadi 1 ZIP. files: [(filename, bytes|str), ...]
+    Nama file kembar diberi akhiran _1, _2, … agar tidak saling timpa.
+    """
+    buf = io.BytesIO()
+    used = set()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in files:
+            stem, dot, ext = str(name).rpartition(".")
+            out, c = str(name), 1
+            while out in used:
+                out = f"{stem}_{c}.{ext}" if dot else f"{name}_{c}"
+                c += 1
+            used.add(out)
+            z.writestr(out, data)
+    return buf.getvalue()
+
 def read_file_content(file_content: bytearray) -> str:
     """
     Baca konten file dengan beberapa fallback encoding.